@@ -1,15 +1,167 @@
 from pathlib import Path
+from typing import Dict, List, Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+BASE_DIR = Path(__file__).resolve().parent.parent
+
 class Settings(BaseSettings):
-    pinecone_api_key: str
-    pinecone_environment: str
-    pinecone_index_name: str
+    # Vector index: "pinecone", or "local" for the in-process index (no network needed)
+    vector_backend: str = "pinecone"
+    pinecone_api_key: Optional[str] = None  # required when vector_backend is "pinecone"
+    pinecone_environment: Optional[str] = None
+    pinecone_index_name: Optional[str] = None
+    # Upserts are split into batches under the index's request limits (vectors and
+    # payload bytes) and sent in parallel, retrying failed batches with backoff
+    vector_upsert_batch_size: int = 100
+    vector_upsert_max_bytes: int = 2 * 1024 * 1024
+    vector_upsert_parallelism: int = 4
+    vector_upsert_max_retries: int = 3
+    vector_upsert_backoff_base: float = 0.5
+    # Local index: memory-mapped files in local_vector_index_dir (default cache_dir/vector_index);
+    # exact search below local_vector_ivf_threshold vectors, IVF above it ("auto"), or
+    # always "flat" / "ivf". IVF lists default to about sqrt(vector count).
+    local_vector_index_dir: Optional[str] = None
+    local_vector_index_kind: str = "auto"
+    local_vector_ivf_threshold: int = 50000
+    local_vector_ivf_lists: int = 0
+    local_vector_ivf_probes: int = 8
     duckduckgo_result_count: int = 2
-    gemini_api_key:str
+    gemini_api_key: Optional[str] = None  # required when llm_backend is "gemini"
+
+    # LLM backend: "gemini", or "stub" for offline load tests and benchmarks
+    llm_backend: str = "gemini"
+    # Stub backend: log-normal time to first token, fixed output throughput and
+    # canned/templated outputs (JSON list of {"match": regex, "response": template})
+    llm_stub_latency_median_ms: float = 400.0
+    llm_stub_latency_sigma: float = 0.6
+    llm_stub_tokens_per_second: float = 150.0  # 0 for instant output
+    llm_stub_output_tokens: int = 400
+    llm_stub_responses_file: Optional[str] = None
+    llm_stub_seed: int = 0
+
+    # Gemini model settings
+    gemini_model: str = "gemini-2.0-flash"
+    gemini_transport: Optional[str] = None  # "grpc" or "rest"; None uses the SDK default
+
+    # Process-wide LLM governor: in-flight calls, tokens per minute (0 = unlimited)
+    # and retries of transient errors (429/5xx/deadline) with exponential backoff
+    llm_max_concurrency: int = 16
+    llm_tokens_per_minute: int = 1000000
+    llm_max_retries: int = 4
+    llm_backoff_base: float = 1.0  # seconds before the first retry
+    llm_backoff_max: float = 60.0  # upper bound for a single retry delay
+
+    # Tail latency: hedge calls of these prompt types once they run longer than the
+    # recent latency percentile, and start the fallback model when a stage's
+    # deadline (seconds) gets close. Applies to non-streaming async calls.
+    llm_hedge_prompt_types: List[str] = ["currency_check", "extraction", "refine"]
+    llm_hedge_percentile: float = 95.0
+    llm_hedge_min_samples: int = 20  # samples needed before hedging starts
+    llm_latency_window: int = 200  # recent latencies kept per prompt type
+    llm_stage_deadlines: Dict[str, float] = {
+        "currency_check": 8.0,
+        "extraction": 30.0,
+        "final_mdx": 90.0,
+        "refine": 45.0,
+    }
+    gemini_fallback_model: Optional[str] = "gemini-2.0-flash-lite"
+
+    # LLM usage accounting (GET /metrics/llm): per-request summaries kept in memory
+    llm_metrics_recent_requests: int = 100
+
+    # Maximum concurrent LLM calls while building a multi-topic MDX document
+    llm_concurrency_limit: int = 8
+    # "per_page": one extraction call per crawled page covering all subtopics
+    # "per_subtopic": one extraction call per (subtopic, page) pair
+    extraction_mode: str = "per_page"
+
+    # Prompt context packing (token estimates): crawled pages are split into passages,
+    # ranked against the topic/question and packed into this budget
+    prompt_context_token_budget: int = 12000
+    prompt_source_token_cap: int = 5000
+    prompt_passage_tokens: int = 300
+
+    # Map-reduce for oversized sources: above the threshold, crawled pages are condensed
+    # in parallel into topic-focused notes with a cheaper model before the final MDX call
+    map_reduce_enabled: bool = True
+    map_reduce_threshold_tokens: int = 12000
+    map_reduce_model: Optional[str] = "gemini-2.0-flash-lite"
+    map_reduce_page_tokens: int = 30000  # maximum input per page
+    map_reduce_note_tokens: int = 1024  # maximum notes per page
+
+    # Local cache/index files (crawl corpus index, etc.)
+    cache_dir: str = str(BASE_DIR / ".cache")
+
+    # Exact-match LLM response cache (memory LRU over a SQLite file in cache_dir).
+    # Prompt types: topic_hierarchy, currency_check, extraction, final_mdx,
+    # fallback_mdx, llm_only, refine, condense
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600
+    llm_cache_memory_entries: int = 512
+    llm_cache_disk_entries: int = 10000
+    # Currency answers are memoized for currency_cache_ttl_seconds by the currency check
+    # itself; caching them here for llm_cache_ttl_seconds would outlive that TTL
+    llm_cache_disabled_prompt_types: List[str] = ["currency_check"]
+
+    # Semantic cache: reuse responses for near-identical request intents
+    semantic_cache_enabled: bool = True
+    semantic_cache_prompt_types: List[str] = ["topic_hierarchy", "llm_only"]
+    semantic_cache_threshold: float = 0.9  # main-topic similarity for a hit; the selected topic must have the same terms
+    semantic_cache_max_entries: int = 1000
+
+    # Embeddings: "openai" (any OpenAI-compatible API), "local" (sentence-transformers
+    # model at embedding_model_path, CPU) or "hashing" (deterministic, for tests)
+    embedding_backend: str = "openai"
+    embedding_model: str = "text-embedding-ada-002"
+    embedding_dimensions: int = 1536  # also the hashing backend's vector size
+    embedding_base_url: Optional[str] = None
+    embedding_api_key: Optional[str] = None  # defaults to OPENAI_API_KEY
+    embedding_model_path: Optional[str] = None
+    embedding_batch_size: int = 128
+    embedding_batch_wait_ms: float = 5.0  # how long concurrent requests wait to share a batch
+
+    # Embedding cache keyed by (model, normalized chunk text): memory LRU over a SQLite
+    # file in cache_dir, vectors stored as float16 (or float32) blobs
+    embedding_cache_enabled: bool = True
+    embedding_cache_dtype: str = "float16"
+    embedding_cache_memory_entries: int = 20000
+    embedding_cache_disk_entries: int = 1000000
+
+    # Identical in-flight /single-topic and /generate-mdx-llm-only requests share one
+    # computation; successful results are kept briefly (0 = in-flight sharing only)
+    coalescing_enabled: bool = True
+    coalescing_result_ttl_seconds: float = 30.0
+    coalescing_cache_entries: int = 256
+
+    # Parsed /search-topics hierarchies, cached by normalized query
+    topic_hierarchy_cache_ttl_seconds: int = 24 * 3600
+    topic_hierarchy_cache_entries: int = 1024
+
+    # Currency check for /single-topic: heuristics decide obvious cases without an
+    # LLM call, and decisions are memoized per (topic, main_topic)
+    currency_heuristics_enabled: bool = True
+    currency_cache_ttl_seconds: int = 24 * 3600
+    currency_cache_entries: int = 2048
+    # Start searching and crawling while the LLM currency check runs; the crawled pages
+    # are used as sources even if the LLM turns out to have current information
+    speculative_crawl_enabled: bool = True
+
+    # Context cache for refinement: large MDX documents/crawled sources are cached
+    # provider-side and repeat refinements only send the new question.
+    # Backends: "gemini", "local" (in-process stand-in) or "none"
+    context_cache_backend: str = "gemini"
+    context_cache_model: Optional[str] = "gemini-2.0-flash-001"  # explicit caching needs a versioned model
+    context_cache_min_tokens: int = 4096  # smaller contexts are sent in full
+    context_cache_ttl_seconds: int = 1800
+
+    # Local BM25 search over previously crawled pages
+    local_search_enabled: bool = True
+    local_search_min_coverage: float = 0.75  # fraction of query terms a page must contain
+    # Pages crawled longer ago than this are ignored and evicted (0 keeps them forever)
+    local_search_max_age_days: float = 30
 
     model_config = SettingsConfigDict(
-        env_file=Path(__file__).resolve().parent.parent / ".env",
+        env_file=BASE_DIR / ".env",
         extra="allow"  # 👈 this tells Pydantic to ignore unrelated variables
     )
 
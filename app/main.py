@@ -1,8 +1,11 @@
+import json
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import rag
-from app.services.vectorstore import init_pinecone
+from app.routers import rag, metrics
+from app.services.llm_metrics import get_llm_metrics
+from app.services.embeddings import get_embedder
+from app.services.vectorstore import init_vector_index, close_vector_index
 from app.utils.response import error_response  # Make sure this file exists
 
 app = FastAPI(title="Lesson Plan RAG Backend")
@@ -16,9 +19,36 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+# Attribute LLM calls to the request that made them; the usage summary is returned
+# in the X-LLM-Usage header (for streaming responses it covers the work done before
+# the stream started; the full summary is available from /metrics/llm/requests)
+@app.middleware("http")
+async def llm_usage_middleware(request: Request, call_next):
+    metrics_store = get_llm_metrics()
+    request_metrics, token = metrics_store.start_request(request.url.path)
+    try:
+        response = await call_next(request)
+    finally:
+        metrics_store.end_request(token)
+    if request_metrics.calls:
+        summary = request_metrics.summary()
+        response.headers["X-LLM-Usage"] = json.dumps({
+            "calls": summary["llm_calls"],
+            "prompt_tokens": summary["prompt_tokens"],
+            "output_tokens": summary["output_tokens"],
+            "llm_seconds": summary["llm_seconds"],
+        })
+    return response
+
+# Create the long-lived embedding and vector index handles once, up front
 @app.on_event("startup")
 async def startup_event():
-    init_pinecone()
+    get_embedder()
+    init_vector_index()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    close_vector_index()
 
 
 # '/' ROUTE
@@ -30,6 +60,9 @@ async def root():
 # Include RAG routes
 app.include_router(rag.router, prefix="/rag", tags=["RAG"])
 
+# Include metrics routes
+app.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
+
 
 # ✅ Global exception handlers
 
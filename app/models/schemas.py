@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 class QueryRequest(BaseModel):
     query: str
@@ -25,6 +25,8 @@ class RefineRequest(BaseModel):
 
 class RefineResponse(BaseModel):
     answer: str
+    mdx: Optional[str] = None  # The full updated document (patch mode)
+    patch: Optional[dict] = None  # The applied patch (patch mode)
 
 # Enhanced refine request with selected text and topic
 class RefineWithSelectionRequest(BaseModel):
@@ -34,6 +36,12 @@ class RefineWithSelectionRequest(BaseModel):
     main_topic: str
     question: str
     topic: str = None  # For backward compatibility
+    # "snippet": return a rewritten snippet; "patch": rewrite only the selected span and
+    # return the patched document
+    response_mode: str = "snippet"
+    # 0-based index of the selected occurrence when selected_text appears more than once
+    # in the MDX (patch mode only patches an unambiguous selection)
+    selection_occurrence: Optional[int] = None
 
 # Refine with crawling request
 class RefineWithCrawlingRequest(BaseModel):
@@ -44,6 +52,8 @@ class RefineWithCrawlingRequest(BaseModel):
     question: str
     num_results: int = 2
     topic: str = None  # For backward compatibility
+    response_mode: str = "snippet"  # or "patch"
+    selection_occurrence: Optional[int] = None  # for a repeated selected_text (patch mode)
 
 # Refine with specific URLs request
 class RefineWithURLsRequest(BaseModel):
@@ -54,6 +64,8 @@ class RefineWithURLsRequest(BaseModel):
     question: str
     urls: List[str]
     topic: str = None  # For backward compatibility
+    response_mode: str = "snippet"  # or "patch"
+    selection_occurrence: Optional[int] = None  # for a repeated selected_text (patch mode)
 
 class TopicItem(BaseModel):
     topic: str
@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+from app.utils.response import success_response
+from app.services.llm_metrics import get_llm_metrics
+
+router = APIRouter()
+
+
+@router.get("/llm")
+async def llm_metrics():
+    """
+    LLM usage aggregated per prompt type and per route: call counts, errors,
+    prompt/output tokens, latency (average, p50, p95) and cache hits.
+    """
+    return success_response(data=get_llm_metrics().snapshot())
+
+
+@router.get("/llm/requests")
+async def llm_request_metrics():
+    """
+    Summary of the LLM calls made by each recent request, most recent first.
+    """
+    return success_response(data=get_llm_metrics().recent_requests())
+
+
+@router.delete("/llm")
+async def reset_llm_metrics():
+    """
+    Clear all LLM usage aggregates and per-request summaries.
+    """
+    get_llm_metrics().reset()
+    return success_response(message="LLM metrics reset")
@@ -1,3 +1,4 @@
+import asyncio
 import fastapi
 from fastapi import APIRouter
 from app.models.schemas import (
@@ -6,18 +7,30 @@ from app.models.schemas import (
     GenerateMDXFromURLsRequest,
     RefineWithSelectionRequest, RefineWithCrawlingRequest, RefineWithURLsRequest
 )
-from app.utils.response import success_response, error_response
-from app.services.gemini_llm import generate_content, refine_content_with_gemini
+from app.utils.response import success_response, error_response, sse_response, raw_stream_response
+from app.services.gemini_llm import generate_with_context_async
 from googlesearch import search
 from app.services.crawler import (
     generate_single_topic_mdx_async, generate_mdx_document_async,
-    generate_mdx_from_urls_async,
-    find_relevant_websites, crawl_urls_async
+    generate_mdx_from_urls_async, generate_llm_only_mdx_async,
+    find_relevant_websites, crawl_urls_async, combine_crawled_content
+)
+from app.services.topic_hierarchy import generate_topic_hierarchy_async
+from app.services.mdx_patch import refine_with_patch_async
+from app.services.coalescer import coalesce
+from app.utils.keys import make_key
+from app.services.mdx_stream import (
+    stream_single_topic_mdx, stream_mdx_from_urls, stream_llm_only_mdx
 )
 
 router = APIRouter()
 
 
+async def _search_async(query: str, num_results: int) -> list:
+    """Run a blocking Google search in a worker thread so it does not stall the event loop."""
+    return await asyncio.to_thread(lambda: list(search(query, num_results=num_results)))
+
+
 @router.post(
     "/search-topics",
 )
@@ -27,27 +40,14 @@ async def search_topics(request: QueryRequest):
         return error_response("Query cannot be empty", status_code=400)
 
     try:
-        prompt = f"""
-        Given the following query: "{request.query}", generate a structured list of main topics and their respective subtopics suitable for a lesson plan.
-
-        Format the response as a JSON list of objects like:
-        [
-        {{
-        "topic": "Main Topic",
-        "subtopics": ["Subtopic 1", "Subtopic 2"]
-        }},
-        ...
-        ]
-        """
-        hierarchy = generate_content(prompt)
-        # print("Generated hierarchy:", hierarchy)
+        # Schema-constrained JSON, parsed and cached by normalized query
+        hierarchy = await generate_topic_hierarchy_async(request.query)
+    except ValueError as e:
+        return error_response("LLM returned an invalid topic hierarchy", status_code=502, details=str(e))
     except Exception as e:
         return error_response("LLM error", status_code=500, details=str(e))
 
-    if not hierarchy:
-        return error_response("No topics returned from LLM", status_code=404)
-
-    return success_response({"topics": hierarchy})
+    return success_response(hierarchy.model_dump())
 
 # @router.post(
 #     "/generate-mdx",
@@ -111,7 +111,7 @@ async def generate_mdx_endpoint(query: SearchRequest):
 
             # Search for main topic - this is critical for proper context
             main_topic_query = f"{main_topic} official documentation OR guide"
-            for url in search(main_topic_query, num_results=query.top_k):
+            for url in await _search_async(main_topic_query, query.top_k):
                 all_urls.add(url)
 
             # Search for each subtopic with the main topic for context
@@ -119,18 +119,18 @@ async def generate_mdx_endpoint(query: SearchRequest):
                 # Create a more targeted search query that combines subtopic with main topic
                 # The main_topic provides essential context for understanding the subtopic
                 combined_query = f"{subtopic} in {main_topic} tutorial OR guide"
-                for url in search(combined_query, num_results=query.top_k):
+                for url in await _search_async(combined_query, query.top_k):
                     all_urls.add(url)
 
                 # Also search for the relationship between the subtopic and main topic
                 # This relationship is critical for accurate content generation
                 relationship_query = f"{subtopic} {main_topic} relationship OR examples"
-                for url in search(relationship_query, num_results=query.top_k):
+                for url in await _search_async(relationship_query, query.top_k):
                     all_urls.add(url)
 
                 # Add a more specific search for how the subtopic fits within the main topic context
                 context_query = f"{subtopic} in context of {main_topic} explanation OR importance"
-                for url in search(context_query, num_results=query.top_k):
+                for url in await _search_async(context_query, query.top_k):
                     all_urls.add(url)
 
         # Convert topics to list of dictionaries (required by generate_mdx_from_links)
@@ -156,6 +156,89 @@ async def generate_mdx_endpoint(query: SearchRequest):
 
 
 
+def _refine_context(topic: str, main_topic: str, mdx: str, crawled_content: str = None,
+                    source_label: str = "relevant websites") -> str:
+    """
+    Build the part of a refinement prompt that stays the same across turns on one
+    document (the MDX and any sources fixed for the session, like user-provided URLs),
+    so it can be served from the context cache.
+    """
+    context = f"""
+        Here is MDX content about the selected topic "{topic}" which is part of the main topic "{main_topic}":
+
+        {mdx}
+        """
+    if crawled_content:
+        context += f"""
+        I've gathered additional information from {source_label}:
+
+        {crawled_content}
+        """
+    return context
+
+def _refine_question(topic: str, main_topic: str, selected_text: str, question: str,
+                     with_sources: bool = False, crawled_content: str = None,
+                     source_label: str = "relevant websites") -> str:
+    """
+    Build the per-turn part of a refinement prompt. Sources that change from turn
+    to turn (e.g. crawled for each question) go here rather than into the context.
+    """
+    if with_sources:
+        instructions = """Using this additional information, please return an updated MDX snippet that addresses
+        the user's question or request, focusing specifically on improving or modifying the selected text."""
+        emphasis = """ The main topic provides essential context that
+        should guide your response."""
+    else:
+        instructions = """Please return an updated MDX snippet that addresses the user's question or request,
+        focusing specifically on improving or modifying the selected text."""
+        emphasis = ""
+    sources = ""
+    if crawled_content:
+        sources = f"""
+        I've gathered additional information from {source_label}:
+
+        {crawled_content}
+        """
+    return f"""{sources}
+        The user has selected this specific text:
+        "{selected_text}"
+
+        User asks: {question}
+
+        {instructions}
+
+        IMPORTANT: Make sure to emphasize how the selected topic "{topic}" relates to and fits within
+        the context of the main topic "{main_topic}". This relationship is critical for providing
+        accurate and contextually relevant information.{emphasis}
+
+        Make sure to maintain proper MDX formatting in your response.
+        """
+
+
+async def _refine_patch(request, topic: str, crawled_content: str = None):
+    """
+    Patch-mode refinement: rewrite only the selected span of the document.
+    Returns None if the selection cannot be located unambiguously or the LLM does
+    not return a usable patch, so the caller can fall back to snippet refinement.
+    """
+    try:
+        patched = await refine_with_patch_async(
+            request.mdx,
+            request.selected_text,
+            request.question,
+            topic,
+            request.main_topic,
+            reference_content=crawled_content,
+            occurrence=request.selection_occurrence
+        )
+    except ValueError as e:
+        print(f"Invalid patch from the LLM ({e}); falling back to snippet refinement")
+        return None
+    if patched is None:
+        print("Selected text not found in the MDX (or ambiguous); falling back to snippet refinement")
+    return patched
+
+
 @router.post("/refine-with-selection", response_model=RefineResponse)
 async def refine_with_selection(request: RefineWithSelectionRequest):
     """
@@ -170,29 +253,21 @@ async def refine_with_selection(request: RefineWithSelectionRequest):
         # For backward compatibility, use topic if selected_topic is not provided
         topic = request.selected_topic if request.selected_topic else request.topic
 
-        # Create a more detailed prompt that includes the selected text and topic
-        prompt = f"""
-        Here is MDX content about the selected topic "{topic}" which is part of the main topic "{request.main_topic}":
-
-        {request.mdx}
-
-        The user has selected this specific text:
-        "{request.selected_text}"
-
-        User asks: {request.question}
-
-        Please return an updated MDX snippet that addresses the user's question or request,
-        focusing specifically on improving or modifying the selected text.
-
-        IMPORTANT: Make sure to emphasize how the selected topic "{topic}" relates to and fits within
-        the context of the main topic "{request.main_topic}". This relationship is critical for providing
-        accurate and contextually relevant information.
+        if request.response_mode == "patch":
+            patched = await _refine_patch(request, topic)
+            if patched is not None:
+                return success_response({
+                    "answer": patched["patch"]["replacement"],
+                    "mdx": patched["mdx"],
+                    "patch": patched["patch"]
+                })
 
-        Make sure to maintain proper MDX formatting in your response.
-        """
+        # The document is the reusable context; only the selection and question change per turn
+        context = _refine_context(topic, request.main_topic, request.mdx)
+        prompt = _refine_question(topic, request.main_topic, request.selected_text, request.question)
 
         # Generate the refined content
-        refined_content = generate_content(prompt)
+        refined_content = await generate_with_context_async(context, prompt, prompt_type="refine")
 
         return success_response({"answer": refined_content})
     except Exception as e:
@@ -214,7 +289,9 @@ async def refine_with_crawling(request: RefineWithCrawlingRequest):
         topic = request.selected_topic if request.selected_topic else request.topic
 
         # Find relevant websites based on the topic, main_topic, and question
-        relevant_websites = find_relevant_websites(
+        # (the search blocks, so it runs in a worker thread)
+        relevant_websites = await asyncio.to_thread(
+            find_relevant_websites,
             topic=topic,
             main_topic=request.main_topic,
             question=request.question,
@@ -228,40 +305,29 @@ async def refine_with_crawling(request: RefineWithCrawlingRequest):
         print(f"Crawling websites for refinement: {relevant_websites}")
         scraped_data = await crawl_urls_async(relevant_websites)
 
-        # Combine the crawled content
-        crawled_content = ""
-        for url, content in scraped_data.items():
-            if isinstance(content, str) and not content.startswith("Error scraping"):
-                crawled_content += f"Content from {url}:\n{content}\n\n"
-
-        # Create a prompt that includes the crawled content
-        prompt = f"""
-        Here is MDX content about the selected topic "{topic}" which is part of the main topic "{request.main_topic}":
-
-        {request.mdx}
-
-        The user has selected this specific text:
-        "{request.selected_text}"
-
-        User asks: {request.question}
-
-        I've gathered additional information from relevant websites:
-
-        {crawled_content}
-
-        Using this additional information, please return an updated MDX snippet that addresses
-        the user's question or request, focusing specifically on improving or modifying the selected text.
-
-        IMPORTANT: Make sure to emphasize how the selected topic "{topic}" relates to and fits within
-        the context of the main topic "{request.main_topic}". This relationship is critical for providing
-        accurate and contextually relevant information. The main topic provides essential context that
-        should guide your response.
+        # Combine the crawled content, keeping the passages most relevant to the question
+        crawled_content = combine_crawled_content(
+            scraped_data, f"{request.question} {request.selected_text} {topic} {request.main_topic}"
+        )
 
-        Make sure to maintain proper MDX formatting in your response.
-        """
+        if request.response_mode == "patch":
+            patched = await _refine_patch(request, topic, crawled_content)
+            if patched is not None:
+                return success_response({
+                    "answer": patched["patch"]["replacement"],
+                    "mdx": patched["mdx"],
+                    "patch": patched["patch"],
+                    "crawled_websites": relevant_websites
+                })
+
+        # Only the document is reusable context: the websites are searched for each question,
+        # so their passages go into the per-turn prompt instead of a new cached context per turn
+        context = _refine_context(topic, request.main_topic, request.mdx)
+        prompt = _refine_question(topic, request.main_topic, request.selected_text, request.question,
+                                  with_sources=True, crawled_content=crawled_content)
 
         # Generate the refined content
-        refined_content = generate_content(prompt)
+        refined_content = await generate_with_context_async(context, prompt, prompt_type="refine")
 
         return success_response({
             "answer": refined_content,
@@ -292,45 +358,34 @@ async def refine_with_urls(request: RefineWithURLsRequest):
         print(f"Crawling user-provided URLs for refinement: {request.urls}")
         scraped_data = await crawl_urls_async(request.urls)
 
-        # Combine the crawled content
-        crawled_content = ""
-        successful_urls = []
-        for url, content in scraped_data.items():
-            if isinstance(content, str) and not content.startswith("Error scraping"):
-                crawled_content += f"Content from {url}:\n{content}\n\n"
-                successful_urls.append(url)
+        # Combine the crawled content, keeping the passages most relevant to the topic; the
+        # sources then stay identical across refinement turns and can be context-cached
+        successful_urls = [
+            url for url, content in scraped_data.items()
+            if isinstance(content, str) and not content.startswith("Error scraping")
+        ]
+        crawled_content = combine_crawled_content(scraped_data, f"{topic} {request.main_topic}")
 
         if not crawled_content.strip():
             return error_response("Could not extract valid content from any of the provided URLs", status_code=404)
 
-        # Create a prompt that includes the crawled content
-        prompt = f"""
-        Here is MDX content about the selected topic "{topic}" which is part of the main topic "{request.main_topic}":
-
-        {request.mdx}
-
-        The user has selected this specific text:
-        "{request.selected_text}"
-
-        User asks: {request.question}
-
-        I've gathered additional information from the URLs provided by the user:
-
-        {crawled_content}
-
-        Using this additional information, please return an updated MDX snippet that addresses
-        the user's question or request, focusing specifically on improving or modifying the selected text.
-
-        IMPORTANT: Make sure to emphasize how the selected topic "{topic}" relates to and fits within
-        the context of the main topic "{request.main_topic}". This relationship is critical for providing
-        accurate and contextually relevant information. The main topic provides essential context that
-        should guide your response.
-
-        Make sure to maintain proper MDX formatting in your response.
-        """
+        if request.response_mode == "patch":
+            patched = await _refine_patch(request, topic, crawled_content)
+            if patched is not None:
+                return success_response({
+                    "answer": patched["patch"]["replacement"],
+                    "mdx": patched["mdx"],
+                    "patch": patched["patch"],
+                    "crawled_websites": successful_urls
+                })
+
+        # The document and crawled sources are the reusable context; only the selection
+        # and question change per turn
+        context = _refine_context(topic, request.main_topic, request.mdx, crawled_content, "the URLs provided by the user")
+        prompt = _refine_question(topic, request.main_topic, request.selected_text, request.question, with_sources=True)
 
         # Generate the refined content
-        refined_content = generate_content(prompt)
+        refined_content = await generate_with_context_async(context, prompt, prompt_type="refine")
 
         return success_response({
             "answer": refined_content,
@@ -354,29 +409,18 @@ async def refine_with_selection_raw(request: RefineWithSelectionRequest):
         # For backward compatibility, use topic if selected_topic is not provided
         topic = request.selected_topic if request.selected_topic else request.topic
 
-        # Create a more detailed prompt that includes the selected text and topic
-        prompt = f"""
-        Here is MDX content about the selected topic "{topic}" which is part of the main topic "{request.main_topic}":
-
-        {request.mdx}
-
-        The user has selected this specific text:
-        "{request.selected_text}"
+        if request.response_mode == "patch":
+            patched = await _refine_patch(request, topic)
+            if patched is not None:
+                # Return the patched document as plain text
+                return patched["mdx"]
 
-        User asks: {request.question}
-
-        Please return an updated MDX snippet that addresses the user's question or request,
-        focusing specifically on improving or modifying the selected text.
-
-        IMPORTANT: Make sure to emphasize how the selected topic "{topic}" relates to and fits within
-        the context of the main topic "{request.main_topic}". This relationship is critical for providing
-        accurate and contextually relevant information.
-
-        Make sure to maintain proper MDX formatting in your response.
-        """
+        # The document is the reusable context; only the selection and question change per turn
+        context = _refine_context(topic, request.main_topic, request.mdx)
+        prompt = _refine_question(topic, request.main_topic, request.selected_text, request.question)
 
         # Generate the refined content
-        refined_content = generate_content(prompt)
+        refined_content = await generate_with_context_async(context, prompt, prompt_type="refine")
 
         # Return the raw MDX content as plain text
         return refined_content
@@ -400,7 +444,9 @@ async def refine_with_crawling_raw(request: RefineWithCrawlingRequest):
         topic = request.selected_topic if request.selected_topic else request.topic
 
         # Find relevant websites based on the topic, main_topic, and question
-        relevant_websites = find_relevant_websites(
+        # (the search blocks, so it runs in a worker thread)
+        relevant_websites = await asyncio.to_thread(
+            find_relevant_websites,
             topic=topic,
             main_topic=request.main_topic,
             question=request.question,
@@ -414,40 +460,25 @@ async def refine_with_crawling_raw(request: RefineWithCrawlingRequest):
         print(f"Crawling websites for refinement: {relevant_websites}")
         scraped_data = await crawl_urls_async(relevant_websites)
 
-        # Combine the crawled content
-        crawled_content = ""
-        for url, content in scraped_data.items():
-            if isinstance(content, str) and not content.startswith("Error scraping"):
-                crawled_content += f"Content from {url}:\n{content}\n\n"
-
-        # Create a prompt that includes the crawled content
-        prompt = f"""
-        Here is MDX content about the selected topic "{topic}" which is part of the main topic "{request.main_topic}":
-
-        {request.mdx}
-
-        The user has selected this specific text:
-        "{request.selected_text}"
-
-        User asks: {request.question}
-
-        I've gathered additional information from relevant websites:
-
-        {crawled_content}
+        # Combine the crawled content, keeping the passages most relevant to the question
+        crawled_content = combine_crawled_content(
+            scraped_data, f"{request.question} {request.selected_text} {topic} {request.main_topic}"
+        )
 
-        Using this additional information, please return an updated MDX snippet that addresses
-        the user's question or request, focusing specifically on improving or modifying the selected text.
+        if request.response_mode == "patch":
+            patched = await _refine_patch(request, topic, crawled_content)
+            if patched is not None:
+                # Return the patched document as plain text
+                return patched["mdx"]
 
-        IMPORTANT: Make sure to emphasize how the selected topic "{topic}" relates to and fits within
-        the context of the main topic "{request.main_topic}". This relationship is critical for providing
-        accurate and contextually relevant information. The main topic provides essential context that
-        should guide your response.
-
-        Make sure to maintain proper MDX formatting in your response.
-        """
+        # Only the document is reusable context: the websites are searched for each question,
+        # so their passages go into the per-turn prompt instead of a new cached context per turn
+        context = _refine_context(topic, request.main_topic, request.mdx)
+        prompt = _refine_question(topic, request.main_topic, request.selected_text, request.question,
+                                  with_sources=True, crawled_content=crawled_content)
 
         # Generate the refined content
-        refined_content = generate_content(prompt)
+        refined_content = await generate_with_context_async(context, prompt, prompt_type="refine")
 
         # Return the raw MDX content as plain text
         return refined_content
@@ -477,49 +508,51 @@ async def refine_with_urls_raw(request: RefineWithURLsRequest):
         print(f"Crawling user-provided URLs for refinement: {request.urls}")
         scraped_data = await crawl_urls_async(request.urls)
 
-        # Combine the crawled content
-        crawled_content = ""
-        for url, content in scraped_data.items():
-            if isinstance(content, str) and not content.startswith("Error scraping"):
-                crawled_content += f"Content from {url}:\n{content}\n\n"
+        # Combine the crawled content, keeping the passages most relevant to the topic; the
+        # sources then stay identical across refinement turns and can be context-cached
+        crawled_content = combine_crawled_content(scraped_data, f"{topic} {request.main_topic}")
 
         if not crawled_content.strip():
             return "Error: Could not extract valid content from any of the provided URLs"
 
-        # Create a prompt that includes the crawled content
-        prompt = f"""
-        Here is MDX content about the selected topic "{topic}" which is part of the main topic "{request.main_topic}":
-
-        {request.mdx}
-
-        The user has selected this specific text:
-        "{request.selected_text}"
-
-        User asks: {request.question}
-
-        I've gathered additional information from the URLs provided by the user:
+        if request.response_mode == "patch":
+            patched = await _refine_patch(request, topic, crawled_content)
+            if patched is not None:
+                # Return the patched document as plain text
+                return patched["mdx"]
 
-        {crawled_content}
-
-        Using this additional information, please return an updated MDX snippet that addresses
-        the user's question or request, focusing specifically on improving or modifying the selected text.
-
-        IMPORTANT: Make sure to emphasize how the selected topic "{topic}" relates to and fits within
-        the context of the main topic "{request.main_topic}". This relationship is critical for providing
-        accurate and contextually relevant information. The main topic provides essential context that
-        should guide your response.
-
-        Make sure to maintain proper MDX formatting in your response.
-        """
+        # The document and crawled sources are the reusable context; only the selection
+        # and question change per turn
+        context = _refine_context(topic, request.main_topic, request.mdx, crawled_content, "the URLs provided by the user")
+        prompt = _refine_question(topic, request.main_topic, request.selected_text, request.question, with_sources=True)
 
         # Generate the refined content
-        refined_content = generate_content(prompt)
+        refined_content = await generate_with_context_async(context, prompt, prompt_type="refine")
 
         # Return the raw MDX content as plain text
         return refined_content
     except Exception as e:
         return f"Error: Failed to refine content with provided URLs - {str(e)}"
 
+def _single_topic_async(topic: str, request: SingleTopicRequest):
+    """Generate single-topic MDX, sharing the work between identical concurrent requests."""
+    return coalesce(
+        make_key("single_topic", topic, request.main_topic, request.num_results),
+        lambda: generate_single_topic_mdx_async(
+            topic=topic,
+            main_topic=request.main_topic,
+            num_results=request.num_results
+        ),
+        cache_result=lambda result: "error" not in result
+    )
+
+def _llm_only_async(request: LLMOnlyRequest):
+    """Generate LLM-only MDX, sharing the work between identical concurrent requests."""
+    return coalesce(
+        make_key("llm_only", request.selected_topic, request.main_topic),
+        lambda: generate_llm_only_mdx_async(request.selected_topic, request.main_topic)
+    )
+
 @router.post("/single-topic")
 async def generate_single_topic(request: SingleTopicRequest):
     """
@@ -541,12 +574,8 @@ async def generate_single_topic(request: SingleTopicRequest):
         if not topic or not topic.strip():
             return error_response("Selected topic or topic cannot be empty", status_code=400)
 
-        # Generate MDX for the single topic using the async version directly
-        result = await generate_single_topic_mdx_async(
-            topic=topic,
-            main_topic=request.main_topic,
-            num_results=request.num_results
-        )
+        # Generate MDX for the single topic (identical in-flight requests share one run)
+        result = await _single_topic_async(topic, request)
 
         # Check if there was an error
         if "error" in result:
@@ -598,12 +627,8 @@ async def generate_single_topic_raw(request: SingleTopicRequest):
         if not topic or not topic.strip():
             return "Error: Selected topic or topic cannot be empty"
 
-        # Generate MDX for the single topic using the async version directly
-        result = await generate_single_topic_mdx_async(
-            topic=topic,
-            main_topic=request.main_topic,
-            num_results=request.num_results
-        )
+        # Generate MDX for the single topic (identical in-flight requests share one run)
+        result = await _single_topic_async(topic, request)
 
         # Check if there was an error
         if "error" in result:
@@ -687,55 +712,8 @@ async def generate_mdx_llm_only(request: LLMOnlyRequest):
         if not request.main_topic.strip():
             return error_response("Main topic cannot be empty", status_code=400)
 
-        # Generate MDX using Gemini
-        import datetime
-        current_date = datetime.datetime.now().strftime('%Y-%m-%d')
-
-        prompt = f"""
-        You are a documentation writer specializing in MDX format. Create a comprehensive MDX document about the selected topic: {request.selected_topic}, which is part of the main topic: {request.main_topic}.
-
-        Use your knowledge to create content about this topic. Do not make up information.
-
-        IMPORTANT: DO NOT wrap your response in ```mdx code blocks. I need the raw MDX content directly.
-
-        Your response MUST be valid MDX format starting with:
-        ---
-        title: "{request.selected_topic}"
-        description: "Comprehensive guide about {request.selected_topic} in {request.main_topic}"
-        date: "{current_date}"
-        ---
-
-        # {request.selected_topic}
-
-        Then continue with well-structured content about the topic. Include:
-        - Clear explanations
-        - Examples where appropriate
-        - Code snippets if relevant
-        - Proper headings and subheadings
-        - Lists and tables where they help organize information
-
-        Make sure the content is comprehensive, accurate, and well-organized.
-        """
-
-        # Generate the MDX content
-        from app.services.gemini_llm import generate_content
-        from app.services.crawler import clean_markdown
-
-        mdx_content = generate_content(prompt)
-        mdx_content = clean_markdown(mdx_content)
-
-        # Ensure the content has proper front matter
-        if not mdx_content.startswith("---"):
-            mdx_content = f"""---
-title: "{request.selected_topic}"
-description: "Comprehensive guide about {request.selected_topic} in {request.main_topic}"
-date: "{current_date}"
----
-
-# {request.selected_topic}
-
-{mdx_content}
-"""
+        # Generate MDX using only the LLM's knowledge
+        mdx_content = await _llm_only_async(request)
 
         return {
             "status": "success",
@@ -769,55 +747,8 @@ async def generate_mdx_llm_only_raw(request: LLMOnlyRequest):
         if not request.main_topic.strip():
             return "Error: Main topic cannot be empty"
 
-        # Generate MDX using Gemini
-        import datetime
-        current_date = datetime.datetime.now().strftime('%Y-%m-%d')
-
-        prompt = f"""
-        You are a documentation writer specializing in MDX format. Create a comprehensive MDX document about the selected topic: {request.selected_topic}, which is part of the main topic: {request.main_topic}.
-
-        Use your knowledge to create content about this topic. Do not make up information.
-
-        IMPORTANT: DO NOT wrap your response in ```mdx code blocks. I need the raw MDX content directly.
-
-        Your response MUST be valid MDX format starting with:
-        ---
-        title: "{request.selected_topic}"
-        description: "Comprehensive guide about {request.selected_topic} in {request.main_topic}"
-        date: "{current_date}"
-        ---
-
-        # {request.selected_topic}
-
-        Then continue with well-structured content about the topic. Include:
-        - Clear explanations
-        - Examples where appropriate
-        - Code snippets if relevant
-        - Proper headings and subheadings
-        - Lists and tables where they help organize information
-
-        Make sure the content is comprehensive, accurate, and well-organized.
-        """
-
-        # Generate the MDX content
-        from app.services.gemini_llm import generate_content
-        from app.services.crawler import clean_markdown
-
-        mdx_content = generate_content(prompt)
-        mdx_content = clean_markdown(mdx_content)
-
-        # Ensure the content has proper front matter
-        if not mdx_content.startswith("---"):
-            mdx_content = f"""---
-title: "{request.selected_topic}"
-description: "Comprehensive guide about {request.selected_topic} in {request.main_topic}"
-date: "{current_date}"
----
-
-# {request.selected_topic}
-
-{mdx_content}
-"""
+        # Generate MDX using only the LLM's knowledge
+        mdx_content = await _llm_only_async(request)
 
         # Return the raw MDX content
         return mdx_content
@@ -858,4 +789,93 @@ async def generate_mdx_from_urls_raw_endpoint(request: GenerateMDXFromURLsReques
 
     except Exception as e:
         # Since we're returning plain text, we'll format the error as text
-        return f"Error: Failed to generate MDX from URLs - {str(e)}"
\ No newline at end of file
+        return f"Error: Failed to generate MDX from URLs - {str(e)}"
+
+# Streaming variants
+#
+# The -stream endpoints send Server-Sent Events: "progress" events as each stage
+# finishes (currency check, search, crawl), "token" events with cleaned MDX as
+# Gemini streams it, then a "done" event with the final cleaned document (or an
+# "error" event). The -raw-stream endpoints stream only the MDX text.
+
+@router.post("/single-topic-stream")
+async def generate_single_topic_stream(request: SingleTopicRequest):
+    """
+    Stream MDX content for a single topic as Server-Sent Events.
+    """
+    # For backward compatibility, use topic if selected_topic is not provided
+    topic = request.selected_topic if request.selected_topic else request.topic
+
+    if not topic or not topic.strip():
+        return error_response("Selected topic or topic cannot be empty", status_code=400)
+
+    return sse_response(stream_single_topic_mdx(topic, request.main_topic, request.num_results))
+
+@router.post("/single-topic-raw-stream")
+async def generate_single_topic_raw_stream(request: SingleTopicRequest):
+    """
+    Stream raw MDX content for a single topic as plain text.
+    """
+    # For backward compatibility, use topic if selected_topic is not provided
+    topic = request.selected_topic if request.selected_topic else request.topic
+
+    if not topic or not topic.strip():
+        return fastapi.responses.PlainTextResponse("Error: Selected topic or topic cannot be empty")
+
+    return raw_stream_response(stream_single_topic_mdx(topic, request.main_topic, request.num_results))
+
+@router.post("/generate-mdx-from-urls-stream")
+async def generate_mdx_from_urls_stream(request: GenerateMDXFromURLsRequest):
+    """
+    Stream MDX content generated from multiple URLs as Server-Sent Events.
+    """
+    if len(request.urls) > 5:
+        return error_response("Too many URLs provided", status_code=400, details="Maximum 5 URLs are allowed")
+
+    return sse_response(stream_mdx_from_urls(
+        request.urls,
+        request.selected_topic,
+        request.main_topic,
+        request.use_llm_knowledge
+    ))
+
+@router.post("/generate-mdx-from-urls-raw-stream")
+async def generate_mdx_from_urls_raw_stream(request: GenerateMDXFromURLsRequest):
+    """
+    Stream raw MDX content generated from multiple URLs as plain text.
+    """
+    if len(request.urls) > 5:
+        return fastapi.responses.PlainTextResponse("Error: Too many URLs provided. Maximum 5 URLs are allowed.")
+
+    return raw_stream_response(stream_mdx_from_urls(
+        request.urls,
+        request.selected_topic,
+        request.main_topic,
+        request.use_llm_knowledge
+    ))
+
+@router.post("/generate-mdx-llm-only-stream")
+async def generate_mdx_llm_only_stream(request: LLMOnlyRequest):
+    """
+    Stream MDX content generated from the LLM's knowledge as Server-Sent Events.
+    """
+    if not request.selected_topic.strip():
+        return error_response("Selected topic cannot be empty", status_code=400)
+
+    if not request.main_topic.strip():
+        return error_response("Main topic cannot be empty", status_code=400)
+
+    return sse_response(stream_llm_only_mdx(request.selected_topic, request.main_topic))
+
+@router.post("/generate-mdx-llm-only-raw-stream")
+async def generate_mdx_llm_only_raw_stream(request: LLMOnlyRequest):
+    """
+    Stream raw MDX content generated from the LLM's knowledge as plain text.
+    """
+    if not request.selected_topic.strip():
+        return fastapi.responses.PlainTextResponse("Error: Selected topic cannot be empty")
+
+    if not request.main_topic.strip():
+        return fastapi.responses.PlainTextResponse("Error: Main topic cannot be empty")
+
+    return raw_stream_response(stream_llm_only_mdx(request.selected_topic, request.main_topic))
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Request coalescing for expensive generation endpoints.
+
+Identical requests (same endpoint family and normalized payload) that arrive
+while one is already being computed wait on that computation instead of
+starting their own search/crawl/LLM pipeline; the result is fanned out to all
+waiters. Successful results can also be kept for a few seconds so requests that
+arrive just after it finishes (e.g. a class opening a shared lesson link) are
+answered immediately.
+"""
+
+import asyncio
+from app.config import settings
+from app.utils.lru_cache import TTLCache
+
+
+class RequestCoalescer:
+    """
+    Share one in-flight computation between identical requests.
+
+    Args:
+        result_ttl: Seconds to keep successful results (0 to only share in-flight work)
+        max_entries: Maximum number of results kept
+    """
+
+    def __init__(self, result_ttl: float = 0, max_entries: int = 256):
+        self._inflight = {}
+        self._results = TTLCache(maxsize=max_entries, ttl=result_ttl) if result_ttl > 0 else None
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key, factory, cache_result=None):
+        """
+        Return the result of factory() for key, sharing it with identical concurrent calls.
+
+        The shared computation runs as its own task, shielded from the callers: a
+        client disconnecting cancels only its own wait, not the work other clients
+        are waiting on. Exceptions are propagated to every waiter and never cached.
+
+        Args:
+            key: Coalescing key (see app.utils.keys.make_key)
+            factory: Zero-argument callable returning the coroutine to run
+            cache_result: Optional predicate deciding whether a result may be kept
+                for result_ttl (e.g. to skip error payloads)
+
+        Returns:
+            The computation's result
+        """
+        if self._results is not None:
+            cached = self._results.get(key)
+            if cached is not None:
+                self.coalesced += 1
+                return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done, cache_result))
+        else:
+            self.coalesced += 1
+            print(f"🔗 Coalescing request onto in-flight computation: {key[0]}")
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task, cache_result):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if task.cancelled() or task.exception() is not None or self._results is None:
+            return
+        result = task.result()
+        if cache_result is None or cache_result(result):
+            self._results.set(key, result)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "started": self.started, "coalesced": self.coalesced}
+
+
+_coalescer = None
+
+
+def get_coalescer() -> RequestCoalescer:
+    """Return the process-wide request coalescer."""
+    global _coalescer
+    if _coalescer is None:
+        _coalescer = RequestCoalescer(
+            result_ttl=settings.coalescing_result_ttl_seconds,
+            max_entries=settings.coalescing_cache_entries
+        )
+    return _coalescer
+
+
+async def coalesce(key, factory, cache_result=None):
+    """Run factory() through the process-wide coalescer (or directly if coalescing is disabled)."""
+    if not settings.coalescing_enabled:
+        return await factory()
+    return await get_coalescer().run(key, factory, cache_result)
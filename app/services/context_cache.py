@@ -0,0 +1,134 @@
+"""
+Provider-side caching of large, reusable prompt contexts.
+
+Refinement sessions send the same MDX document (and crawled sources) with every
+question. With a context cache the document is uploaded once, keyed by a hash of
+the model and the context text, and later calls only send the new question.
+
+Backends:
+
+- "gemini": Gemini explicit context caching (google.generativeai.caching). Only
+  worth it above the provider's minimum cacheable size (context_cache_min_tokens).
+- "local": in-process stand-in for tests and development. It remembers contexts
+  the same way but sends the context with every call, so behaviour matches the
+  uncached path.
+- "none": disabled.
+"""
+
+import asyncio
+import datetime
+import hashlib
+from google.generativeai import caching
+import google.generativeai as genai
+from app.config import settings
+from app.services.llm_backends import get_llm_backend
+from app.utils.context_packer import estimate_tokens
+from app.utils.lru_cache import TTLCache
+
+
+def context_key(model_name: str, context: str) -> str:
+    """Return the cache key for a context sent to a model."""
+    digest = hashlib.sha256(f"{model_name}\n{context}".encode("utf-8")).hexdigest()
+    return f"ctx-{digest[:40]}"
+
+
+class GeminiContextCacheBackend:
+    """
+    Gemini explicit context caching.
+
+    Args:
+        ttl: Lifetime of a cached context in seconds
+        max_entries: Maximum number of contexts tracked locally
+    """
+
+    name = "gemini"
+
+    def __init__(self, ttl: int = 1800, max_entries: int = 256):
+        self.ttl = ttl
+        # Expire local handles a little before the server does
+        self._handles = TTLCache(maxsize=max_entries, ttl=max(1, ttl - 60))
+
+    async def ensure_async(self, key: str, context: str, model_name: str):
+        """Return the cached context for key, uploading it first if needed."""
+        handle = self._handles.get(key)
+        if handle is not None:
+            return handle
+
+        get_llm_backend().ensure_configured()
+        handle = await asyncio.to_thread(
+            caching.CachedContent.create,
+            model=f"models/{model_name}",
+            display_name=key,
+            contents=[context],
+            ttl=datetime.timedelta(seconds=self.ttl)
+        )
+        print(f"📦 Created Gemini context cache {handle.name} (~{estimate_tokens(context)} tokens)")
+        self._handles.set(key, handle)
+        return handle
+
+    async def generate_async(self, handle, prompt: str, model_name: str, generation_config: dict = None):
+        """Generate a response to prompt following the cached context."""
+        model = genai.GenerativeModel.from_cached_content(cached_content=handle, generation_config=generation_config)
+        return await model.generate_content_async(prompt)
+
+    def invalidate(self, key: str):
+        """Forget a cached context (e.g. after it expired on the server)."""
+        self._handles.pop(key)
+
+
+class LocalContextCacheBackend:
+    """
+    In-process stand-in for the Gemini context cache.
+
+    Args:
+        ttl: Lifetime of a cached context in seconds
+        max_entries: Maximum number of contexts kept
+    """
+
+    name = "local"
+
+    def __init__(self, ttl: int = 1800, max_entries: int = 256):
+        self._contexts = TTLCache(maxsize=max_entries, ttl=ttl)
+        self.created = 0
+        self.hits = 0
+
+    async def ensure_async(self, key: str, context: str, model_name: str):
+        if self._contexts.get(key) is not None:
+            self.hits += 1
+        else:
+            self.created += 1
+            self._contexts.set(key, context)
+        return key
+
+    async def generate_async(self, handle, prompt: str, model_name: str, generation_config: dict = None):
+        # Imported here to avoid a circular import with gemini_llm
+        from app.services.gemini_llm import get_model
+        context = self._contexts.get(handle)
+        if context is None:
+            raise KeyError(f"Context {handle} has expired")
+        return await get_model(model_name, generation_config).generate_content_async(context + prompt)
+
+    def invalidate(self, key: str):
+        self._contexts.pop(key)
+
+
+_backend = None
+
+
+def get_context_cache():
+    """Return the configured context cache backend, or None if disabled."""
+    global _backend
+    if _backend is None and settings.context_cache_backend != "none":
+        if settings.context_cache_backend == "gemini" and settings.llm_backend == "gemini":
+            _backend = GeminiContextCacheBackend(ttl=settings.context_cache_ttl_seconds)
+        elif settings.context_cache_backend in ("gemini", "local"):
+            # Non-Gemini LLM backends use the in-process stand-in
+            _backend = LocalContextCacheBackend(ttl=settings.context_cache_ttl_seconds)
+        else:
+            raise ValueError(f"Unknown context cache backend: {settings.context_cache_backend}")
+    return _backend
+
+
+def uses_context_cache(context: str) -> bool:
+    """Whether a context is large enough to be worth caching."""
+    return settings.context_cache_backend != "none" and estimate_tokens(context) >= settings.context_cache_min_tokens
@@ -1,9 +1,14 @@
 import asyncio
+import json
 import re
 import os
 from crawl4ai import AsyncWebCrawler, CacheMode
-from app.services.gemini_llm import generate_content
+from app.config import settings
+from app.services.gemini_llm import generate_content_async
 from app.services.crawler_config import get_browser_config, get_crawler_config
+from app.services.local_search import index_crawled_pages, search_local
+from app.services.currency import check_currency_async, peek_currency
+from app.utils.context_packer import estimate_tokens, pack_context, select_passages
 
 # Disable Node.js debugger
 os.environ["NODE_OPTIONS"] = "--no-warnings --no-deprecation"
@@ -44,7 +49,15 @@ async def crawl_urls_async(urls: list) -> dict:
     """
     tasks = [crawl_url_with_crawl4ai(url) for url in urls]
     results = await asyncio.gather(*tasks)
-    return {url: result for url, result in zip(urls, results)}
+    scraped_data = {url: result for url, result in zip(urls, results)}
+
+    # Keep the local search index up to date with every page we crawl
+    try:
+        await asyncio.to_thread(index_crawled_pages, scraped_data)
+    except Exception as e:
+        print(f"Error updating local search index: {e}")
+
+    return scraped_data
 
 def crawl_urls(urls: list) -> dict:
     """
@@ -110,6 +123,87 @@ def clean_markdown(text):
 
     return text.strip()
 
+class MDXStreamCleaner:
+    """
+    Incrementally clean MDX text while it is streamed from the LLM.
+
+    Applies the line-level parts of clean_markdown on the fly: unescaping
+    newlines and quotes, dropping a wrapping ```mdx code block, collapsing runs
+    of blank lines and keeping a blank line before headings. Text is emitted one
+    complete line at a time; the final document should still be passed through
+    clean_markdown once the stream has finished.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._started = False
+        self._wrapped = False
+        self._in_code = False
+        self._finished = False
+        self._blank_lines = 0
+        self._has_output = False
+
+    def feed(self, chunk: str) -> str:
+        """
+        Add a streamed chunk and return the cleaned text that is ready to emit.
+        """
+        if self._finished or not chunk:
+            return ""
+        self._buffer += chunk
+
+        # Hold back a trailing backslash in case it starts an escape sequence
+        held = ""
+        if self._buffer.endswith("\\"):
+            self._buffer, held = self._buffer[:-1], "\\"
+
+        text = self._buffer.replace('\\n', '\n').replace('\\"', '"')
+        lines = text.split("\n")
+        self._buffer = lines.pop() + held
+
+        return "".join(self._process_line(line) for line in lines)
+
+    def finish(self) -> str:
+        """Flush any remaining buffered text at the end of the stream."""
+        remaining, self._buffer = self._buffer, ""
+        if self._finished or not remaining:
+            return ""
+        text = remaining.replace('\\n', '\n').replace('\\"', '"')
+        output = "".join(self._process_line(line) for line in text.split("\n"))
+        return output.rstrip("\n")
+
+    def _process_line(self, line: str) -> str:
+        if self._finished:
+            return ""
+        stripped = line.strip()
+
+        # Skip leading blank lines and a wrapping ```mdx fence
+        if not self._started:
+            if not stripped:
+                return ""
+            self._started = True
+            if stripped in ("```mdx", "```markdown", "```md"):
+                self._wrapped = True
+                return ""
+
+        if stripped.startswith("```"):
+            if self._wrapped and not self._in_code and stripped == "```":
+                # Closing fence of the wrapping block: nothing after it is content
+                self._finished = True
+                return ""
+            self._in_code = not self._in_code
+        elif not stripped and not self._in_code:
+            self._blank_lines += 1
+            return ""
+
+        blanks = 0
+        if self._has_output:
+            blanks = min(self._blank_lines, 1)
+            if not self._in_code and re.match(r'#{1,6} ', stripped):
+                blanks = 1
+        self._blank_lines = 0
+        self._has_output = True
+        return "\n" * blanks + line + "\n"
+
 def create_mdx_prompt(topic: str, subtopic: str, relevant_content: str) -> str:
     """
     Generates a refined prompt that ensures a single valid MDX code block,
@@ -158,63 +252,141 @@ Relevant content to use:
 {relevant_content}
 """
 
-async def generate_mdx_document_async(urls: list, topics_data: list) -> str:
+async def _extract_subtopic_content_async(url: str, content: str, topic: str, sub: str, semaphore: asyncio.Semaphore) -> str:
     """
-    Crawl the given list of URLs using crawl4ai, extract content relevant to each subtopic in topics_data,
-    and convert it to a well-formatted MDX string using the generate_content function.
-    This is the async version of the function.
+    Use the LLM to extract content relevant to a subtopic from one crawled page.
+    Returns an empty string if extraction fails.
+    """
+    try:
+        content = select_passages(content, f"{sub} {topic}", settings.prompt_source_token_cap, settings.prompt_passage_tokens)
+
+        # Use Gemini LLM to extract relevant content for the subtopic, considering the main topic
+        prompt = f"""Extract content relevant to the subtopic '{sub}' which is part of the main topic '{topic}'
+                        from the following markdown. Focus on content that explains the relationship between '{sub}' and '{topic}':\n\n{content}"""
+
+        print(f"Extracting content for subtopic '{sub}' from {url[:50]}...")
+        async with semaphore:
+            relevant_content = await generate_content_async(prompt, prompt_type="extraction")
+        return clean_markdown(relevant_content) + "\n"
+    except Exception as e:
+        print(f"Error extracting content for {url}: {e}")
+        return ""
+
+def _parse_json_response(text: str):
+    """Parse a JSON LLM response, tolerating a surrounding ```json code block."""
+    text = text.strip()
+    match = re.search(r'```(?:json)?\s*\n(.*?)\n```', text, re.DOTALL)
+    if match:
+        text = match.group(1)
+    return json.loads(text)
+
+async def _extract_page_for_all_subtopics_async(url: str, content: str, subtopics: list, semaphore: asyncio.Semaphore):
+    """
+    Extract passages for every subtopic from one crawled page in a single LLM call.
 
     Args:
-        urls: List of URLs to crawl
-        topics_data: List of dictionaries containing main topics and their subtopics
+        url: The page URL
+        content: The page markdown
+        subtopics: List of (topic, subtopic) pairs
+        semaphore: Semaphore limiting the number of concurrent LLM calls
 
     Returns:
-        A well-formatted MDX string
+        Dictionary mapping (topic, subtopic) to the extracted markdown, or None if
+        the response could not be used (callers then fall back to per-subtopic extraction)
     """
-    mdx_output = "# Lesson Plan\n\n"
-    # Crawl all URLs at once using crawl4ai
-    scraped_data = await crawl_urls_async(urls)
+    query = " ".join(f"{sub} {topic}" for topic, sub in subtopics)
+    content = select_passages(content, query, settings.prompt_source_token_cap, settings.prompt_passage_tokens)
+    subtopic_list = "\n".join(
+        f'{number}. "{sub}" (main topic: "{topic}")'
+        for number, (topic, sub) in enumerate(subtopics, start=1)
+    )
+    prompt = f"""Extract content relevant to each of the following subtopics from the markdown below.
+Each subtopic is part of a main topic; focus on content that explains the relationship between the subtopic and its main topic.
 
-    for topic_block in topics_data:
-        # The main topic
-        topic = topic_block["topic"]
-        subtopics = topic_block["subtopics"]
-        mdx_output += f"## {topic}\n\n"
+Subtopics:
+{subtopic_list}
 
-        for sub in subtopics:
-            print(f"Processing subtopic: {sub} in main topic: {topic}")
-            all_relevant_content = ""
+Respond with a JSON object that maps each subtopic number (as a string, e.g. "1") to a list of
+extracted passages in markdown. Use an empty list for subtopics the page has nothing relevant about.
 
-            # Gather relevant content from each crawled page using Gemini LLM
-            for url, content in scraped_data.items():
-                if isinstance(content, str) and not content.startswith("Error scraping"):
-                    try:
-                        # Use Gemini LLM to extract relevant content for the subtopic, considering the main topic
-                        prompt = f"""Extract content relevant to the subtopic '{sub}' which is part of the main topic '{topic}'
-                        from the following markdown. Focus on content that explains the relationship between '{sub}' and '{topic}':\n\n{content}"""
+Markdown:
 
-                        print(f"Extracting content for subtopic '{sub}' from {url[:50]}...")
-                        relevant_content = generate_content(prompt)
-                        all_relevant_content += clean_markdown(relevant_content) + "\n"
-                    except Exception as e:
-                        print(f"Error extracting content for {url}: {e}")
-
-            # If we found something, call generate_content; else note no content found
-            if all_relevant_content.strip():
-                try:
-                    prompt = create_mdx_prompt(topic, sub, all_relevant_content)
-                    print(f"Generating MDX for subtopic '{sub}' in main topic '{topic}'...")
-                    generated_mdx = generate_content(prompt)
-                    mdx_output += clean_markdown(generated_mdx) + "\n\n"
-                except Exception as e:
-                    mdx_output += f"*Error generating content for subtopic '{sub}' in main topic '{topic}': {e}.*\n\n"
-            else:
-                # If no content was found, try to generate content using the LLM's knowledge
-                try:
-                    import datetime
-                    current_date = datetime.datetime.now().strftime('%Y-%m-%d')
+{content}"""
+
+    try:
+        print(f"Extracting content for {len(subtopics)} subtopics from {url[:50]}...")
+        async with semaphore:
+            response = await generate_content_async(
+                prompt,
+                generation_config={"response_mime_type": "application/json"},
+                prompt_type="extraction"
+            )
+        data = _parse_json_response(response)
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+    except Exception as e:
+        print(f"Error extracting subtopics from {url} in a single pass: {e}")
+        return None
+
+    extracted = {}
+    for number, key in enumerate(subtopics, start=1):
+        passages = data.get(str(number)) or []
+        if isinstance(passages, str):
+            passages = [passages]
+        text = "\n\n".join(str(passage) for passage in passages if passage)
+        extracted[key] = clean_markdown(text) + "\n" if text.strip() else ""
+    return extracted
+
+async def _generate_subtopic_mdx_async(topic: str, sub: str, scraped_data: dict, semaphore: asyncio.Semaphore,
+                                       page_extractions: dict = None) -> str:
+    """
+    Generate the MDX section for one subtopic of a lesson plan.
 
-                    fallback_prompt = f"""
+    Args:
+        topic: The main topic
+        sub: The subtopic
+        scraped_data: Dictionary mapping crawled URLs to their markdown content
+        semaphore: Semaphore limiting the number of concurrent LLM calls
+        page_extractions: Optional results of single-pass extraction, mapping each URL to
+            {(topic, subtopic): content} (or None where that page has to be extracted per subtopic)
+
+    Returns:
+        The MDX for the subtopic (or an error note), followed by a blank line
+    """
+    print(f"Processing subtopic: {sub} in main topic: {topic}")
+    page_extractions = page_extractions or {}
+
+    async def extract(url, content):
+        extracted = page_extractions.get(url)
+        if extracted is not None:
+            return extracted.get((topic, sub), "")
+        return await _extract_subtopic_content_async(url, content, topic, sub, semaphore)
+
+    # Gather relevant content from each crawled page using Gemini LLM
+    extractions = await asyncio.gather(*[
+        extract(url, content)
+        for url, content in scraped_data.items()
+        if isinstance(content, str) and not content.startswith("Error scraping")
+    ])
+    all_relevant_content = "".join(extractions)
+
+    # If we found something, call generate_content_async; else note no content found
+    if all_relevant_content.strip():
+        try:
+            prompt = create_mdx_prompt(topic, sub, all_relevant_content)
+            print(f"Generating MDX for subtopic '{sub}' in main topic '{topic}'...")
+            async with semaphore:
+                generated_mdx = await generate_content_async(prompt, prompt_type="final_mdx")
+            return clean_markdown(generated_mdx) + "\n\n"
+        except Exception as e:
+            return f"*Error generating content for subtopic '{sub}' in main topic '{topic}': {e}.*\n\n"
+
+    # If no content was found, try to generate content using the LLM's knowledge
+    try:
+        import datetime
+        current_date = datetime.datetime.now().strftime('%Y-%m-%d')
+
+        fallback_prompt = f"""
                     You are a documentation writer specializing in MDX format.
                     Create a comprehensive MDX document about the selected topic: {sub}, which is part of the main topic: {topic}.
 
@@ -243,11 +415,64 @@ async def generate_mdx_document_async(urls: list, topics_data: list) -> str:
                     Make sure the content is comprehensive, accurate, and well-organized.
                     """
 
-                    print(f"No content found for subtopic '{sub}', using LLM knowledge...")
-                    fallback_content = generate_content(fallback_prompt)
-                    mdx_output += clean_markdown(fallback_content) + "\n\n"
-                except Exception as e:
-                    mdx_output += f"*Content not found for subtopic '{sub}' in main topic '{topic}', and fallback generation failed: {e}.*\n\n"
+        print(f"No content found for subtopic '{sub}', using LLM knowledge...")
+        async with semaphore:
+            fallback_content = await generate_content_async(fallback_prompt, prompt_type="fallback_mdx")
+        return clean_markdown(fallback_content) + "\n\n"
+    except Exception as e:
+        return f"*Content not found for subtopic '{sub}' in main topic '{topic}', and fallback generation failed: {e}.*\n\n"
+
+async def generate_mdx_document_async(urls: list, topics_data: list) -> str:
+    """
+    Crawl the given list of URLs using crawl4ai, extract content relevant to each subtopic in topics_data,
+    and convert it to a well-formatted MDX string using the generate_content_async function.
+    This is the async version of the function.
+
+    Subtopics are processed concurrently, with at most settings.llm_concurrency_limit
+    LLM calls in flight; the sections are assembled in the original topic order.
+
+    With settings.extraction_mode set to "per_page" (the default), each crawled page is
+    sent to the LLM once with the full list of subtopics instead of once per subtopic.
+
+    Args:
+        urls: List of URLs to crawl
+        topics_data: List of dictionaries containing main topics and their subtopics
+
+    Returns:
+        A well-formatted MDX string
+    """
+    mdx_output = "# Lesson Plan\n\n"
+    # Crawl all URLs at once using crawl4ai
+    scraped_data = await crawl_urls_async(urls)
+
+    semaphore = asyncio.Semaphore(max(1, settings.llm_concurrency_limit))
+
+    page_extractions = None
+    if settings.extraction_mode == "per_page":
+        subtopics = [(block["topic"], sub) for block in topics_data for sub in block["subtopics"]]
+        valid_pages = {
+            url: content for url, content in scraped_data.items()
+            if isinstance(content, str) and not content.startswith("Error scraping")
+        }
+        if subtopics and valid_pages:
+            results = await asyncio.gather(*[
+                _extract_page_for_all_subtopics_async(url, content, subtopics, semaphore)
+                for url, content in valid_pages.items()
+            ])
+            page_extractions = dict(zip(valid_pages, results))
+
+    sections = await asyncio.gather(*[
+        asyncio.gather(*[
+            _generate_subtopic_mdx_async(topic_block["topic"], sub, scraped_data, semaphore, page_extractions)
+            for sub in topic_block["subtopics"]
+        ])
+        for topic_block in topics_data
+    ])
+
+    for topic_block, subtopic_sections in zip(topics_data, sections):
+        # The main topic
+        mdx_output += f"## {topic_block['topic']}\n\n"
+        mdx_output += "".join(subtopic_sections)
 
     return mdx_output
 
@@ -263,6 +488,9 @@ def find_relevant_websites(topic: str, main_topic: str = None, question: str = N
     """
     Find relevant websites for a given topic, emphasizing the importance of main_topic when available.
 
+    Previously crawled pages are searched first using the local BM25 index; the web
+    search is only used when the local index does not have enough matching pages.
+
     Args:
         topic: The selected topic (subtopic) to find websites for
         main_topic: The main topic that the selected topic belongs to (important for context)
@@ -272,6 +500,16 @@ def find_relevant_websites(topic: str, main_topic: str = None, question: str = N
     Returns:
         List of relevant website URLs
     """
+    try:
+        # Try the local index over previously crawled pages first
+        local_query = " ".join(part for part in (topic, main_topic, question) if part)
+        local_results = search_local(local_query, limit=num_results)
+        if len(local_results) >= num_results:
+            print(f"Found {len(local_results)} previously crawled pages for '{local_query}' in the local index")
+            return local_results
+    except Exception as e:
+        print(f"Error searching local index: {e}")
+
     try:
         # Use Google search to find relevant websites
         from googlesearch import search
@@ -329,65 +567,234 @@ def find_relevant_websites(topic: str, main_topic: str = None, question: str = N
         print(f"Error finding relevant websites: {e}")
         return []
 
-async def generate_single_topic_mdx_async(topic: str, main_topic: str = None, num_results: int = 2) -> dict:
+async def _notify(on_progress, stage: str, **data):
+    """Report a progress event to an optional async callback."""
+    if on_progress is not None:
+        await on_progress(stage, data)
+
+def build_front_matter(title: str, description: str, current_date: str, main_topic: str = None) -> str:
     """
-    Generate MDX content for a single topic, checking if the LLM has up-to-date information first.
-    If not, find and crawl relevant websites for the latest information.
-    This is the async version of the function.
+    Build the MDX front matter block used when the LLM omits it.
 
     Args:
-        topic: The selected topic (subtopic) to generate content for
-        main_topic: The main topic that the selected topic belongs to (critical for proper context)
-        num_results: Number of search results to use
+        title: The document title
+        description: The document description
+        current_date: The date string to include
+        main_topic: Optional main topic to include
 
     Returns:
-        Dictionary with MDX formatted content and metadata
+        The front matter followed by a blank line
     """
-    # Disable debugger for this operation
-    os.environ["NODE_OPTIONS"] = "--no-warnings --no-deprecation"
-    # First, check if the LLM has up-to-date information on the topic
-    currency_check_prompt = f"""
-    Do you have up-to-date information about the topic: "{topic}"?
-    {f"This topic is part of the broader subject: {main_topic} (this context is critical for accurate information)" if main_topic else ""}
+    front_matter = f"""---
+title: "{title}"
+description: "{description}"
+date: "{current_date}"
+"""
+    if main_topic:
+        front_matter += f'main_topic: "{main_topic}"\n'
+    front_matter += "---\n\n"
+    return front_matter
+
+def finalize_mdx(mdx_content: str, front_matter: str) -> str:
+    """
+    Clean LLM output and make sure it is a complete MDX document.
+
+    Args:
+        mdx_content: The raw MDX returned by the LLM
+        front_matter: Front matter to prepend if the output has none
+
+    Returns:
+        The cleaned MDX content
+    """
+    # Clean and format the content
+    mdx_content = clean_markdown(mdx_content)
+
+    # Ensure the content has proper front matter
+    if not mdx_content.startswith("---"):
+        mdx_content = front_matter + mdx_content
+
+    # Add a newline after the front matter if needed
+    if "---\n---" in mdx_content:
+        mdx_content = mdx_content.replace("---\n---", "---\n\n---")
+
+    # Ensure there's a newline after the front matter section
+    if "---\n#" in mdx_content:
+        mdx_content = mdx_content.replace("---\n#", "---\n\n#")
+
+    # Ensure there's a double newline after the front matter closing
+    mdx_content = re.sub(r'---\n([^-\n])', r'---\n\n\1', mdx_content)
 
-    Please respond with only "YES" if you have current information (from the last 6 months),
-    or "NO" if your information might be outdated or incomplete.
+    return mdx_content
+
+def combine_crawled_content(scraped_data: dict, query: str) -> str:
     """
+    Combine crawled pages into prompt context, keeping the passages most relevant to
+    the query within the configured token budget and per-source cap.
+
+    Args:
+        scraped_data: Dictionary mapping URLs to their crawled markdown content
+        query: The topic/question used to rank passages
 
+    Returns:
+        The combined content as "Content from {url}:" blocks
+    """
+    sources = {
+        url: content for url, content in scraped_data.items()
+        if isinstance(content, str) and not content.startswith("Error scraping")
+    }
+    return pack_context(
+        sources,
+        query,
+        budget_tokens=settings.prompt_context_token_budget,
+        source_cap_tokens=settings.prompt_source_token_cap,
+        passage_tokens=settings.prompt_passage_tokens
+    )
+
+async def _condense_page_async(url: str, content: str, topic: str, main_topic: str, semaphore: asyncio.Semaphore) -> str:
+    """
+    Map step: condense one crawled page into notes focused on the topic.
+    Falls back to the page's most relevant passages if the LLM call fails.
+    """
+    query = f"{topic} {main_topic or ''}"
+    page = select_passages(content, query, settings.map_reduce_page_tokens, settings.prompt_passage_tokens)
+    prompt = f"""Condense the following page into detailed notes about '{topic}'{f" in the context of '{main_topic}'" if main_topic else ""}.
+Keep every fact, definition, code example and caveat that is relevant to the topic; drop navigation, ads and unrelated material.
+Return the notes as concise markdown.
+
+Page ({url}):
+{page}"""
     try:
-        currency_response = generate_content(currency_check_prompt).strip().upper()
-        has_current_info = "YES" in currency_response
-        print(f"LLM has current info on {topic}: {has_current_info}")
+        async with semaphore:
+            return await generate_content_async(
+                prompt,
+                model_name=settings.map_reduce_model,
+                generation_config={"temperature": 0.2, "max_output_tokens": settings.map_reduce_note_tokens},
+                prompt_type="condense"
+            )
     except Exception as e:
-        print(f"Error checking currency: {e}")
-        has_current_info = False
+        print(f"Error condensing {url}: {e}")
+        return select_passages(content, query, settings.prompt_source_token_cap, settings.prompt_passage_tokens)
+
+async def prepare_source_content_async(scraped_data: dict, topic: str, main_topic: str = None) -> str:
+    """
+    Turn crawled pages into the reference content of the final MDX prompt.
+
+    Small inputs are packed directly (combine_crawled_content). When the pages
+    together exceed settings.map_reduce_threshold_tokens, each page is first
+    condensed into topic-focused notes in parallel with a cheaper model, and the
+    notes are packed instead.
+
+    Args:
+        scraped_data: Dictionary mapping URLs to their crawled markdown content
+        topic: The topic the MDX is about
+        main_topic: The main topic that the topic belongs to
+
+    Returns:
+        The combined content as "Content from {url}:" blocks
+    """
+    query = f"{topic} {main_topic or ''}"
+    sources = {
+        url: content for url, content in scraped_data.items()
+        if isinstance(content, str) and not content.startswith("Error scraping")
+    }
+    total_tokens = sum(estimate_tokens(content) for content in sources.values())
+    if not settings.map_reduce_enabled or total_tokens <= settings.map_reduce_threshold_tokens:
+        return combine_crawled_content(sources, query)
+
+    print(f"Condensing {len(sources)} pages (~{total_tokens} tokens) for {topic}")
+    semaphore = asyncio.Semaphore(max(1, settings.llm_concurrency_limit))
+    urls = list(sources)
+    notes = await asyncio.gather(*[
+        _condense_page_async(url, sources[url], topic, main_topic, semaphore) for url in urls
+    ])
+    # Reduce step: the final prompt is built from the notes
+    return combine_crawled_content(dict(zip(urls, notes)), query)
+
+async def _search_and_crawl_async(topic: str, main_topic: str = None) -> tuple:
+    """
+    Find relevant websites for a topic and crawl them, running the blocking website
+    search in a worker thread so it overlaps with other work on the event loop.
+
+    Returns:
+        Tuple of (relevant_websites, scraped_data)
+    """
+    relevant_websites = await asyncio.to_thread(find_relevant_websites, topic=topic, main_topic=main_topic, num_results=2)
+
+    scraped_data = {}
+    if relevant_websites:
+        print(f"Speculatively crawling relevant websites for {topic}: {relevant_websites}")
+        scraped_data = await crawl_urls_async(relevant_websites)
+    return relevant_websites, scraped_data
+
+async def gather_single_topic_content_async(topic: str, main_topic: str = None, num_results: int = 2, on_progress=None) -> dict:
+    """
+    Check whether the LLM has up-to-date information on a topic and, if not,
+    search for and crawl relevant websites.
+
+    Args:
+        topic: The selected topic (subtopic) to gather content for
+        main_topic: The main topic that the selected topic belongs to
+        num_results: Number of search results to use
+        on_progress: Optional async callback called as on_progress(stage, data)
+            after the currency check, the search and each crawl
+
+    Returns:
+        Dictionary with all_content (packed into the prompt budget), sources (the raw
+        crawled pages by URL), crawled_websites and has_current_info
+    """
+    # Disable debugger for this operation
+    os.environ["NODE_OPTIONS"] = "--no-warnings --no-deprecation"
+    # Speculatively search and crawl while the LLM decides whether it is needed
+    speculative = None
+    if settings.speculative_crawl_enabled and peek_currency(topic, main_topic) is None:
+        speculative = asyncio.create_task(_search_and_crawl_async(topic, main_topic))
+
+    # First, check if the LLM has up-to-date information on the topic
+    try:
+        has_current_info = await check_currency_async(topic, main_topic)
+    except BaseException:
+        if speculative:
+            speculative.cancel()
+        raise
+    print(f"LLM has current info on {topic}: {has_current_info}")
+
+    await _notify(on_progress, "currency_check", has_current_info=has_current_info)
 
     # If we need to crawl for additional information
-    all_content = ""
+    sources = {}
     crawled_websites = []
 
-    if not has_current_info:
-        # Find relevant websites to crawl
-        relevant_websites = find_relevant_websites(
-            topic=topic,
-            main_topic=main_topic,
-            num_results=2
-        )
-        crawled_websites = relevant_websites
+    # A speculative crawl is used even when the LLM turns out to be current: the
+    # general search below would otherwise crawl for the same topic again
+    if speculative or not has_current_info:
+        if speculative:
+            relevant_websites, scraped_data = await speculative
+            await _notify(on_progress, "search", websites=list(relevant_websites))
+        else:
+            # Find relevant websites to crawl (the search blocks, so it runs in a worker thread)
+            relevant_websites = await asyncio.to_thread(
+                find_relevant_websites,
+                topic=topic,
+                main_topic=main_topic,
+                num_results=2
+            )
+            await _notify(on_progress, "search", websites=list(relevant_websites))
+            if relevant_websites:
+                print(f"Crawling relevant websites for {topic}: {relevant_websites}")
+                # Crawl the identified websites using crawl4ai
+                scraped_data = await crawl_urls_async(relevant_websites)
+        crawled_websites = list(relevant_websites)
 
         if relevant_websites:
-            print(f"Crawling relevant websites for {topic}: {relevant_websites}")
-            # Crawl the identified websites using crawl4ai
-            scraped_data = await crawl_urls_async(relevant_websites)
-
-            # Combine content from relevant websites
+            # Collect content from relevant websites
             for url, content in scraped_data.items():
                 if isinstance(content, str) and not content.startswith("Error scraping"):
-                    all_content += f"Content from {url}:\n{content}\n\n"
+                    sources[url] = content
+
+            await _notify(on_progress, "crawl", crawled_websites=list(crawled_websites))
 
     # Also get some general search results if needed
-    if not has_current_info or len(all_content.strip()) < 500:  # If we don't have much content
-        urls = []
+    if not has_current_info or len("".join(sources.values()).strip()) < 500:  # If we don't have much content
         from googlesearch import search
         # Create a search query that combines topic and main_topic
         search_query = topic
@@ -398,10 +805,9 @@ async def generate_single_topic_mdx_async(topic: str, main_topic: str = None, nu
         if main_topic:
             search_query += f" OR {topic} in {main_topic}"
 
-        for url in search(search_query, num_results=num_results):
-            if url in crawled_websites:
-                continue  # Skip if we already crawled this URL
-            urls.append(url)
+        results = await asyncio.to_thread(lambda: list(search(search_query, num_results=num_results)))
+        # Skip URLs we already crawled
+        urls = [url for url in results if url not in crawled_websites]
 
         if urls:
             print(f"Crawling additional search results for {topic}")
@@ -411,10 +817,33 @@ async def generate_single_topic_mdx_async(topic: str, main_topic: str = None, nu
             # Add content from search results
             for url, content in scraped_data.items():
                 if isinstance(content, str) and not content.startswith("Error scraping"):
-                    all_content += f"Content from {url}:\n{content}\n\n"
+                    sources[url] = content
                     crawled_websites.append(url)
 
-    # Generate MDX using Gemini
+            await _notify(on_progress, "crawl", crawled_websites=list(crawled_websites))
+
+    # Pack the most relevant passages (or condensed notes for large inputs) into the prompt budget
+    all_content = await prepare_source_content_async(sources, topic, main_topic)
+
+    return {
+        "all_content": all_content,
+        "sources": sources,
+        "crawled_websites": crawled_websites,
+        "has_current_info": has_current_info
+    }
+
+def build_single_topic_prompt(topic: str, main_topic: str = None, all_content: str = "") -> tuple:
+    """
+    Build the final MDX generation prompt for a single topic.
+
+    Args:
+        topic: The selected topic (subtopic)
+        main_topic: The main topic that the selected topic belongs to
+        all_content: Crawled reference content (empty to use LLM knowledge)
+
+    Returns:
+        Tuple of (prompt, front_matter) where front_matter is used if the LLM omits it
+    """
     import datetime
     current_date = datetime.datetime.now().strftime('%Y-%m-%d')
 
@@ -459,36 +888,35 @@ async def generate_single_topic_mdx_async(topic: str, main_topic: str = None, nu
     - Ensure lists have a blank line before them
     """
 
-    try:
-        # Generate the MDX content
-        mdx_content = generate_content(prompt)
+    return prompt, build_front_matter(topic, description, current_date, main_topic)
 
-        # Clean and format the content
-        mdx_content = clean_markdown(mdx_content)
+async def generate_single_topic_mdx_async(topic: str, main_topic: str = None, num_results: int = 2) -> dict:
+    """
+    Generate MDX content for a single topic, checking if the LLM has up-to-date information first.
+    If not, find and crawl relevant websites for the latest information.
+    This is the async version of the function.
 
-        # Ensure the content has proper front matter
-        if not mdx_content.startswith("---"):
-            front_matter = f"""---
-title: "{topic}"
-description: "{description}"
-date: "{current_date}"
-"""
-            if main_topic:
-                front_matter += f'main_topic: "{main_topic}"\n'
-            front_matter += "---\n\n"
+    Args:
+        topic: The selected topic (subtopic) to generate content for
+        main_topic: The main topic that the selected topic belongs to (critical for proper context)
+        num_results: Number of search results to use
 
-            mdx_content = front_matter + mdx_content
+    Returns:
+        Dictionary with MDX formatted content and metadata
+    """
+    gathered = await gather_single_topic_content_async(topic, main_topic, num_results)
+    crawled_websites = gathered["crawled_websites"]
+    has_current_info = gathered["has_current_info"]
 
-        # Add a newline after the front matter if needed
-        if "---\n---" in mdx_content:
-            mdx_content = mdx_content.replace("---\n---", "---\n\n---")
+    # Generate MDX using Gemini
+    prompt, front_matter = build_single_topic_prompt(topic, main_topic, gathered["all_content"])
 
-        # Ensure there's a newline after the front matter section
-        if "---\n#" in mdx_content:
-            mdx_content = mdx_content.replace("---\n#", "---\n\n#")
+    try:
+        # Generate the MDX content
+        mdx_content = await generate_content_async(prompt, prompt_type="final_mdx")
 
-        # Ensure there's a double newline after the front matter closing
-        mdx_content = re.sub(r'---\n([^-\n])', r'---\n\n\1', mdx_content)
+        # Clean and format the content, ensuring proper front matter
+        mdx_content = finalize_mdx(mdx_content, front_matter)
 
         # Return both the MDX content and the list of crawled websites
         return {
@@ -594,7 +1022,7 @@ async def generate_mdx_from_url_async(url: str, topic: str, use_llm_knowledge: b
         """
 
         # Generate content with LLM
-        mdx_content = generate_content(prompt)
+        mdx_content = await generate_content_async(prompt, prompt_type="final_mdx")
 
         # Clean and format the content
         mdx_content = clean_markdown(mdx_content)
@@ -662,7 +1090,7 @@ date: "{current_date}"
                 """
 
                 # Generate content with LLM
-                mdx_content = generate_content(prompt)
+                mdx_content = await generate_content_async(prompt, prompt_type="fallback_mdx")
 
                 # Clean and format the content
                 mdx_content = clean_markdown(mdx_content)
@@ -709,55 +1137,28 @@ def generate_mdx_from_url(url: str, topic: str, use_llm_knowledge: bool = True)
     """
     return asyncio.run(generate_mdx_from_url_async(url, topic, use_llm_knowledge))
 
-async def generate_mdx_from_urls_async(urls: list, selected_topic: str, main_topic: str, topic: str = None, use_llm_knowledge: bool = True) -> str:
+def build_mdx_from_urls_prompt(selected_topic: str, main_topic: str, all_content: str = "") -> tuple:
     """
-    Generate MDX content from multiple URLs using crawl4ai and LLM.
-    Similar to generate_single_topic_mdx_async but for specific URLs.
+    Build the MDX generation prompt for content crawled from user-provided URLs.
 
     Args:
-        urls: List of URLs to crawl (1 to 5 URLs)
         selected_topic: The subtopic to focus on
-        main_topic: The main topic that the selected topic belongs to (critical for proper context)
-        topic: Legacy parameter, kept for backward compatibility (not used)
-        use_llm_knowledge: Whether to use the LLM's existing knowledge if crawling fails
+        main_topic: The main topic that the selected topic belongs to
+        all_content: Combined crawled content (empty to use LLM knowledge)
 
     Returns:
-        The MDX content
+        Tuple of (prompt, front_matter) where front_matter is used if the LLM omits it
     """
-    # Note: topic parameter is kept for backward compatibility but not used
-    # Disable debugger for this operation
-    os.environ["NODE_OPTIONS"] = "--no-warnings --no-deprecation"
-
-    try:
-        # Crawl all URLs
-        print(f"Crawling {len(urls)} URLs...")
-        scraped_data = await crawl_urls_async(urls)
-
-        # Combine all content
-        all_content = ""
-        for url, content in scraped_data.items():
-            if isinstance(content, str) and not content.startswith("Error scraping"):
-                all_content += f"Content from {url}:\n{content}\n\n"
-
-        # Check if we got any valid content
-        if not all_content.strip():
-            if not use_llm_knowledge:
-                return f"Error: Could not extract valid content from any of the provided URLs"
-            else:
-                print(f"No valid content extracted from URLs, using LLM knowledge instead")
-                # Continue with LLM knowledge
-
-        # Generate MDX using Gemini
-        import datetime
-        current_date = datetime.datetime.now().strftime('%Y-%m-%d')
+    import datetime
+    current_date = datetime.datetime.now().strftime('%Y-%m-%d')
 
-        # Adjust prompt based on whether we have content or need to use LLM knowledge
-        if not all_content.strip():
-            reference_text = f"Use your knowledge to create content about the selected topic: {selected_topic} which is part of the main topic: {main_topic}"
-        else:
-            reference_text = f"Use the following content as reference:\n{all_content}"
+    # Adjust prompt based on whether we have content or need to use LLM knowledge
+    if not all_content.strip():
+        reference_text = f"Use your knowledge to create content about the selected topic: {selected_topic} which is part of the main topic: {main_topic}"
+    else:
+        reference_text = f"Use the following content as reference:\n{all_content}"
 
-        prompt = f"""
+    prompt = f"""
         You are a documentation writer specializing in MDX format.
         Create a comprehensive MDX document about the selected topic: {selected_topic}
         This selected topic is part of the main topic: {main_topic}. It is CRITICAL that you focus on how {selected_topic} relates to and fits within the context of {main_topic}.
@@ -791,34 +1192,56 @@ async def generate_mdx_from_urls_async(urls: list, selected_topic: str, main_top
         - Ensure lists have a blank line before them
         """
 
-        # Generate content with LLM
-        mdx_content = generate_content(prompt)
+    front_matter = build_front_matter(
+        selected_topic,
+        f"Comprehensive guide about {selected_topic} - Part of {main_topic}",
+        current_date
+    )
+    return prompt, front_matter
 
-        # Clean and format the content
-        mdx_content = clean_markdown(mdx_content)
+async def generate_mdx_from_urls_async(urls: list, selected_topic: str, main_topic: str, topic: str = None, use_llm_knowledge: bool = True) -> str:
+    """
+    Generate MDX content from multiple URLs using crawl4ai and LLM.
+    Similar to generate_single_topic_mdx_async but for specific URLs.
 
-        # Ensure the content has proper front matter
-        if not mdx_content.startswith("---"):
-            mdx_content = f"""---
-title: "{selected_topic}"
-description: "Comprehensive guide about {selected_topic} - Part of {main_topic}"
-date: "{current_date}"
----
+    Args:
+        urls: List of URLs to crawl (1 to 5 URLs)
+        selected_topic: The subtopic to focus on
+        main_topic: The main topic that the selected topic belongs to (critical for proper context)
+        topic: Legacy parameter, kept for backward compatibility (not used)
+        use_llm_knowledge: Whether to use the LLM's existing knowledge if crawling fails
 
-{mdx_content}"""
+    Returns:
+        The MDX content
+    """
+    # Note: topic parameter is kept for backward compatibility but not used
+    # Disable debugger for this operation
+    os.environ["NODE_OPTIONS"] = "--no-warnings --no-deprecation"
 
-        # Add a newline after the front matter if needed
-        if "---\n---" in mdx_content:
-            mdx_content = mdx_content.replace("---\n---", "---\n\n---")
+    try:
+        # Crawl all URLs
+        print(f"Crawling {len(urls)} URLs...")
+        scraped_data = await crawl_urls_async(urls)
 
-        # Ensure there's a newline after the front matter section
-        if "---\n#" in mdx_content:
-            mdx_content = mdx_content.replace("---\n#", "---\n\n#")
+        # Combine the most relevant content (or condensed notes for large inputs) within the prompt budget
+        all_content = await prepare_source_content_async(scraped_data, selected_topic, main_topic)
 
-        # Ensure there's a double newline after the front matter closing
-        mdx_content = re.sub(r'---\n([^-\n])', r'---\n\n\1', mdx_content)
+        # Check if we got any valid content
+        if not all_content.strip():
+            if not use_llm_knowledge:
+                return f"Error: Could not extract valid content from any of the provided URLs"
+            else:
+                print(f"No valid content extracted from URLs, using LLM knowledge instead")
+                # Continue with LLM knowledge
 
-        return mdx_content
+        # Generate MDX using Gemini
+        prompt, front_matter = build_mdx_from_urls_prompt(selected_topic, main_topic, all_content)
+
+        # Generate content with LLM
+        mdx_content = await generate_content_async(prompt, prompt_type="final_mdx")
+
+        # Clean and format the content, ensuring proper front matter
+        return finalize_mdx(mdx_content, front_matter)
 
     except Exception as e:
         if use_llm_knowledge:
@@ -862,37 +1285,98 @@ date: "{current_date}"
                 """
 
                 # Generate content with LLM
-                mdx_content = generate_content(prompt)
+                mdx_content = await generate_content_async(prompt, prompt_type="fallback_mdx")
+
+                # Clean and format the content, ensuring proper front matter
+                front_matter = build_front_matter(
+                    selected_topic,
+                    f"Comprehensive guide about {selected_topic} - Part of {main_topic}",
+                    current_date
+                )
+                return finalize_mdx(mdx_content, front_matter)
+            except Exception as inner_e:
+                return f"Error generating MDX from URLs: {e}. Fallback also failed: {inner_e}"
+        else:
+            return f"Error generating MDX from URLs: {e}"
 
-                # Clean and format the content
-                mdx_content = clean_markdown(mdx_content)
+def build_llm_only_prompt(selected_topic: str, main_topic: str) -> tuple:
+    """
+    Build the prompt for generating MDX purely from the LLM's own knowledge.
 
-                # Ensure the content has proper front matter
-                if not mdx_content.startswith("---"):
-                    mdx_content = f"""---
-title: "{selected_topic}"
-description: "Comprehensive guide about {selected_topic} - Part of {main_topic}"
-date: "{current_date}"
----
+    Args:
+        selected_topic: The subtopic to write about
+        main_topic: The main topic that the selected topic belongs to
 
-{mdx_content}"""
+    Returns:
+        Tuple of (prompt, front_matter) where front_matter is used if the LLM omits it
+    """
+    import datetime
+    current_date = datetime.datetime.now().strftime('%Y-%m-%d')
 
-                # Add a newline after the front matter if needed
-                if "---\n---" in mdx_content:
-                    mdx_content = mdx_content.replace("---\n---", "---\n\n---")
+    prompt = f"""
+        You are a documentation writer specializing in MDX format. Create a comprehensive MDX document about the selected topic: {selected_topic}, which is part of the main topic: {main_topic}.
 
-                # Ensure there's a newline after the front matter section
-                if "---\n#" in mdx_content:
-                    mdx_content = mdx_content.replace("---\n#", "---\n\n#")
+        Use your knowledge to create content about this topic. Do not make up information.
 
-                # Ensure there's a double newline after the front matter closing
-                mdx_content = re.sub(r'---\n([^-\n])', r'---\n\n\1', mdx_content)
+        IMPORTANT: DO NOT wrap your response in ```mdx code blocks. I need the raw MDX content directly.
 
-                return mdx_content
-            except Exception as inner_e:
-                return f"Error generating MDX from URLs: {e}. Fallback also failed: {inner_e}"
-        else:
-            return f"Error generating MDX from URLs: {e}"
+        Your response MUST be valid MDX format starting with:
+        ---
+        title: "{selected_topic}"
+        description: "Comprehensive guide about {selected_topic} in {main_topic}"
+        date: "{current_date}"
+        ---
+
+        # {selected_topic}
+
+        Then continue with well-structured content about the topic. Include:
+        - Clear explanations
+        - Examples where appropriate
+        - Code snippets if relevant
+        - Proper headings and subheadings
+        - Lists and tables where they help organize information
+
+        Make sure the content is comprehensive, accurate, and well-organized.
+        """
+
+    front_matter = build_front_matter(
+        selected_topic,
+        f"Comprehensive guide about {selected_topic} in {main_topic}",
+        current_date
+    ) + f"# {selected_topic}\n\n"
+    return prompt, front_matter
+
+def finalize_llm_only_mdx(mdx_content: str, front_matter: str) -> str:
+    """
+    Clean LLM-only output, prepending front matter and heading if they are missing.
+    """
+    mdx_content = clean_markdown(mdx_content)
+
+    # Ensure the content has proper front matter
+    if not mdx_content.startswith("---"):
+        mdx_content = front_matter + mdx_content + "\n"
+
+    return mdx_content
+
+async def generate_llm_only_mdx_async(selected_topic: str, main_topic: str) -> str:
+    """
+    Generate MDX content using only the LLM's knowledge (no web crawling).
+
+    Args:
+        selected_topic: The subtopic to write about
+        main_topic: The main topic that the selected topic belongs to
+
+    Returns:
+        The MDX content
+    """
+    prompt, front_matter = build_llm_only_prompt(selected_topic, main_topic)
+
+    mdx_content = await generate_content_async(
+        prompt,
+        prompt_type="llm_only",
+        cache_intent=f"{selected_topic} | {main_topic}"
+    )
+    return finalize_llm_only_mdx(mdx_content, front_matter)
 
 def generate_mdx_from_urls(urls: list, selected_topic: str, main_topic: str, topic: str = None, use_llm_knowledge: bool = True) -> str:
     """
@@ -0,0 +1,152 @@
+"""
+Decide whether the LLM's own knowledge of a topic is current enough to skip crawling.
+
+A cheap heuristic classifier settles the obvious cases without an LLM call:
+recency keywords, version numbers and recent years mean the topic changes
+often (crawl), while well-established fundamentals are answered from the
+model's knowledge. Anything else falls back to asking Gemini. Decisions are
+memoized per (topic, main topic) for a configurable TTL.
+"""
+
+import re
+from app.config import settings
+from app.services.gemini_llm import generate_content_async
+from app.utils.lru_cache import TTLCache
+
+RECENCY_KEYWORDS = {
+    "latest", "newest", "new", "recent", "recently", "current", "currently", "today",
+    "upcoming", "release", "released", "releases", "roadmap", "news", "trend", "trends",
+    "trending", "update", "updates", "announced", "announcement", "pricing", "deprecated",
+    "deprecation", "changelog", "beta", "preview",
+}
+
+# Version numbers ("3.12", "v18", "React 19") and recent years
+VERSION_PATTERN = re.compile(r"\bv\d+\b|\b\d+\.\d+(?:\.\d+)?\b|\b20[2-9]\d\b")
+
+# Words that number parts of a course or document rather than product versions ("Part 1", "Lesson 2")
+SEQUENCE_WORDS = [
+    "part", "lesson", "chapter", "step", "unit", "module", "section", "week", "day", "level",
+    "exercise", "example", "problem", "question", "page", "phase", "stage", "round", "volume",
+    "episode", "top",
+]
+NAMED_VERSION_PATTERN = re.compile(
+    r"\b(?!(?:" + "|".join(SEQUENCE_WORDS) + r")\s)[a-z][a-z+#.-]*\s+\d{1,3}\b"
+)
+
+# Topics whose content has been stable for years
+STABLE_TOPICS = [
+    "algorithm", "data structure", "linked list", "binary search", "binary tree", "hash table",
+    "graph theory", "dynamic programming", "recursion", "sorting",
+    "big o", "time complexity", "object oriented", "oop", "design pattern", "inheritance",
+    "polymorphism", "encapsulation", "variables", "loops", "conditionals",
+    "boolean logic", "bitwise", "pointers", "memory management", "operating system",
+    "computer architecture", "networking fundamentals", "tcp/ip", "http basics", "sql basics",
+    "relational database", "normalization", "discrete math", "calculus", "linear algebra",
+    "probability", "statistics", "geometry", "trigonometry", "algebra", "physics", "chemistry",
+    "biology", "grammar", "world war", "ancient", "history of",
+]
+# Whole words or phrases only (plurals allowed), so "sorting" does not match "sortingjs"
+STABLE_PATTERN = re.compile(r"\b(?:" + "|".join(re.escape(stable) for stable in STABLE_TOPICS) + r")s?\b")
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def classify_currency(topic: str, main_topic: str = None):
+    """
+    Decide currency from the topic text alone.
+
+    Args:
+        topic: The selected topic (subtopic)
+        main_topic: The main topic that the selected topic belongs to
+
+    Recency signals are looked for in both topics (a "React 19" main topic makes
+    every subtopic time-sensitive), but only the selected topic itself can mark
+    a topic as stable: "Decorators" under "Algorithms" is left undecided.
+
+    Returns:
+        False if the topic looks time-sensitive, True if it is a known-stable
+        topic, or None if the heuristics cannot tell
+    """
+    text = _normalize(f"{topic} {main_topic or ''}")
+    words = set(re.findall(r"[a-z]+", text))
+
+    if words & RECENCY_KEYWORDS or VERSION_PATTERN.search(text) or NAMED_VERSION_PATTERN.search(text):
+        return False
+
+    if STABLE_PATTERN.search(_normalize(topic)):
+        return True
+    return None
+
+
+_memo = None
+
+
+def _get_memo() -> TTLCache:
+    global _memo
+    if _memo is None:
+        _memo = TTLCache(maxsize=settings.currency_cache_entries, ttl=settings.currency_cache_ttl_seconds)
+    return _memo
+
+
+def _build_currency_prompt(topic: str, main_topic: str = None) -> str:
+    return f"""
+    Do you have up-to-date information about the topic: "{topic}"?
+    {f"This topic is part of the broader subject: {main_topic} (this context is critical for accurate information)" if main_topic else ""}
+
+    Please respond with only "YES" if you have current information (from the last 6 months),
+    or "NO" if your information might be outdated or incomplete.
+    """
+
+
+def peek_currency(topic: str, main_topic: str = None):
+    """
+    Return the currency decision if it is available without an LLM call (memoized
+    or decided by the heuristics), otherwise None.
+    """
+    cached = _get_memo().get((_normalize(topic), _normalize(main_topic)))
+    if cached is not None:
+        return cached
+    if settings.currency_heuristics_enabled:
+        return classify_currency(topic, main_topic)
+    return None
+
+
+async def check_currency_async(topic: str, main_topic: str = None) -> bool:
+    """
+    Check whether the LLM has up-to-date information on a topic.
+
+    Uses the memoized decision if there is one, then the heuristic classifier,
+    and only asks Gemini when neither can decide.
+
+    Args:
+        topic: The selected topic (subtopic)
+        main_topic: The main topic that the selected topic belongs to
+
+    Returns:
+        True if the LLM's knowledge is current enough, False if the topic should be crawled
+    """
+    key = (_normalize(topic), _normalize(main_topic))
+    memo = _get_memo()
+    cached = memo.get(key)
+    if cached is not None:
+        print(f"Currency decision for {topic} served from cache: {cached}")
+        return cached
+
+    has_current_info = classify_currency(topic, main_topic) if settings.currency_heuristics_enabled else None
+    if has_current_info is not None:
+        print(f"Currency decision for {topic} from heuristics: {has_current_info}")
+    else:
+        try:
+            response = await generate_content_async(
+                _build_currency_prompt(topic, main_topic), prompt_type="currency_check"
+            )
+            has_current_info = "YES" in response.strip().upper()
+        except Exception as e:
+            # Don't memoize failures; assume the topic needs crawling
+            print(f"Error checking currency: {e}")
+            return False
+
+    memo.set(key, has_current_info)
+    return has_current_info
@@ -0,0 +1,161 @@
+"""
+Content-addressed cache of text embeddings.
+
+Vectors are keyed by a hash of (embedding model, normalized text), so the same
+chunk crawled again (from the same page or another one) is never re-embedded
+by the same model. Like the LLM response cache there are two tiers: an
+in-memory LRU in front of a SQLite file on disk. Vectors are stored as raw
+float16 (or float32) blobs, which halves the disk and memory footprint of the
+usual float32 vectors at a precision loss far below what similarity search
+can notice.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+from app.config import settings
+from app.utils.lru_cache import TTLCache
+
+# SQLite's default limit on host parameters per statement is 999
+_LOOKUP_CHUNK = 500
+
+
+def normalize_chunk(text: str) -> str:
+    """Normalize chunk text so formatting-only differences share a cache entry."""
+    return re.sub(r'\s+', ' ', unicodedata.normalize("NFC", text or "")).strip()
+
+
+def embedding_key(model_id: str, text: str) -> str:
+    """Return the cache key for a text embedded by a model."""
+    payload = f"{model_id}\n{normalize_chunk(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of embedding vectors.
+
+    Args:
+        path: SQLite file for the disk tier (None keeps the cache memory-only)
+        dtype: Storage precision, "float16" or "float32"
+        memory_entries: Maximum number of vectors held in memory
+        disk_entries: Maximum number of vectors kept on disk
+    """
+
+    def __init__(self, path: str = None, dtype: str = "float16", memory_entries: int = 20000,
+                 disk_entries: int = 1000000):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.disk_entries = disk_entries
+        self._memory = TTLCache(maxsize=memory_entries)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, dtype TEXT NOT NULL, vector BLOB NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get_many(self, keys: list) -> dict:
+        """
+        Look up vectors for several keys.
+
+        Returns:
+            Dictionary of key -> float32 vector for the keys that are cached
+        """
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            vector = self._memory.get(key)
+            if vector is not None:
+                found[key] = vector.astype(np.float32)
+            else:
+                missing.append(key)
+
+        if missing and self._conn is not None:
+            now = time.time()
+            with self._lock:
+                for start in range(0, len(missing), _LOOKUP_CHUNK):
+                    chunk = missing[start:start + _LOOKUP_CHUNK]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = self._conn.execute(
+                        f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                    ).fetchall()
+                    for key, dtype, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.dtype(dtype))
+                        # Promote to the memory tier
+                        self._memory.set(key, vector)
+                        found[key] = vector.astype(np.float32)
+                    if rows:
+                        self._conn.executemany(
+                            "UPDATE embeddings SET accessed_at = ? WHERE key = ?", [(now, row[0]) for row in rows]
+                        )
+                self._conn.commit()
+
+        self.hits += len(found)
+        self.misses += len(set(keys)) - len(found)
+        return found
+
+    def set_many(self, items):
+        """Store (key, vector) pairs in both tiers."""
+        rows = []
+        now = time.time()
+        for key, vector in items:
+            stored = np.ascontiguousarray(vector, dtype=self.dtype)
+            self._memory.set(key, stored)
+            rows.append((key, self.dtype.name, stored.tobytes(), now))
+
+        if not rows or self._conn is None:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dtype, vector, accessed_at) VALUES (?, ?, ?, ?)", rows
+            )
+            previous = self._writes
+            self._writes += len(rows)
+            # Enforce the size limit periodically rather than on every write
+            if self._writes // 1000 != previous // 1000:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key NOT IN "
+                    "(SELECT key FROM embeddings ORDER BY accessed_at DESC LIMIT ?)",
+                    (self.disk_entries,)
+                )
+            self._conn.commit()
+
+    def clear(self):
+        """Remove all cached vectors."""
+        self._memory.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM embeddings")
+                self._conn.commit()
+
+
+_cache = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Return the process-wide embedding cache, or None if disabled."""
+    global _cache
+    if _cache is None and settings.embedding_cache_enabled:
+        _cache = EmbeddingCache(
+            path=os.path.join(settings.cache_dir, "embeddings.sqlite3"),
+            dtype=settings.embedding_cache_dtype,
+            memory_entries=settings.embedding_cache_memory_entries,
+            disk_entries=settings.embedding_cache_disk_entries
+        )
+    return _cache
@@ -1,9 +1,307 @@
-def get_embedding(text: str) -> list[float]:
+"""
+Text embeddings.
+
+embed_many() embeds a list of texts into a (n, dimension) float32 NumPy matrix
+of unit-length rows using the backend selected by settings.embedding_backend:
+
+- "openai": any OpenAI-compatible embeddings API (settings.embedding_base_url
+  for self-hosted servers). Texts are sent in batches of embedding_batch_size.
+- "local": a sentence-transformers model loaded from settings.embedding_model_path,
+  run on the CPU.
+- "hashing": fast deterministic feature hashing over words and character
+  trigrams. No model or network needed; used for tests and the semantic cache.
+
+Vectors are looked up in the embedding cache (keyed by model and normalized
+text) first, so only texts the model has never seen reach the backend.
+
+embed_many_async() additionally batches concurrent callers: requests arriving
+within embedding_batch_wait_ms of each other are embedded in one backend call,
+so many small requests don't each pay the per-call overhead.
+"""
+
+import asyncio
+import functools
+import hashlib
+import os
+import threading
+import weakref
+import numpy as np
+from app.config import settings
+from app.services.embedding_cache import embedding_key, get_embedding_cache
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+@functools.lru_cache(maxsize=65536)
+def _hash_feature(feature: str) -> int:
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class HashingEmbedder:
+    """
+    Feature-hashing embedder over words and character trigrams.
+
+    Text split by " | " is treated as separate segments whose features never
+    collide with each other (used for "selected topic | main topic" intents).
+
+    Args:
+        dimension: Size of the embedding vectors
+    """
+
+    name = "hashing"
+
+    def __init__(self, dimension: int = 512):
+        self.dimension = dimension
+        self.model_id = f"hashing-{dimension}"
+
+    def embed_many(self, texts: list) -> np.ndarray:
+        rows, columns, weights = [], [], []
+        for row, text in enumerate(texts):
+            for index, segment in enumerate(text.split(" | ")):
+                for word in segment.split():
+                    features = [(f"{index}:w:{word}", 1.0)]
+                    padded = f"<{word}>"
+                    features += [(f"{index}:c:{padded[i:i + 3]}", 0.5) for i in range(len(padded) - 2)]
+                    for feature, weight in features:
+                        h = _hash_feature(feature)
+                        rows.append(row)
+                        columns.append(h % self.dimension)
+                        weights.append(weight if (h >> 63) & 1 else -weight)
+
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(columns, dtype=np.intp)),
+                  np.asarray(weights, dtype=np.float32))
+        return _normalize_rows(matrix)
+
+
+class OpenAIEmbedder:
+    """
+    OpenAI-compatible embeddings API.
+
+    Args:
+        model: Embedding model name
+        dimension: Vector size (requested from models that support shortening)
+        base_url: Optional API base URL for OpenAI-compatible servers
+        api_key: Optional API key (defaults to OPENAI_API_KEY)
+        batch_size: Maximum texts per API call
+    """
+
+    name = "openai"
+
+    def __init__(self, model: str, dimension: int = 1536, base_url: str = None, api_key: str = None,
+                 batch_size: int = 128):
+        self.model = model
+        self.dimension = dimension
+        self.base_url = base_url
+        self.api_key = api_key
+        self.batch_size = batch_size
+        self.model_id = f"openai:{model}:{dimension}"
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._client
+
+    def embed_many(self, texts: list) -> np.ndarray:
+        client = self._get_client()
+        extra = {"dimensions": self.dimension} if self.model.startswith("text-embedding-3") else {}
+        matrix = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            batch = [text or " " for text in texts[start:start + self.batch_size]]
+            response = client.embeddings.create(model=self.model, input=batch, **extra)
+            for item in response.data:
+                matrix[start + item.index] = item.embedding
+        return _normalize_rows(matrix)
+
+
+class LocalModelEmbedder:
+    """
+    sentence-transformers model loaded from a local path, run on the CPU.
+
+    Args:
+        model_path: Directory (or hub name) of the model
+        batch_size: Texts per forward pass
+    """
+
+    name = "local"
+
+    def __init__(self, model_path: str, batch_size: int = 64):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("The local embedding backend requires the sentence-transformers package") from e
+        if not model_path:
+            raise ValueError("embedding_model_path must be set for the local embedding backend")
+        self.model = SentenceTransformer(model_path, device="cpu")
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+        self.model_id = f"local:{os.path.basename(os.path.normpath(model_path))}:{self.dimension}"
+
+    def embed_many(self, texts: list) -> np.ndarray:
+        matrix = self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True,
+                                   normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(matrix, dtype=np.float32)
+
+
+class EmbeddingBatcher:
+    """
+    Combine concurrent embedding requests into shared backend calls.
+
+    Args:
+        embedder: Backend with an embed_many(texts) method
+        max_batch: Flush as soon as this many texts are waiting
+        max_wait: Seconds to wait for more requests before flushing
+    """
+
+    def __init__(self, embedder, max_batch: int = 128, max_wait: float = 0.005):
+        self.embedder = embedder
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending = []  # (texts, future)
+        self._pending_count = 0
+        self._timer = None
+        self._tasks = set()  # running flushes; the event loop only keeps weak references
+        self.backend_calls = 0
+
+    async def embed_many(self, texts: list) -> np.ndarray:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((list(texts), future))
+        self._pending_count += len(texts)
+        if self._pending_count >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending, self._pending_count = self._pending, [], 0
+        if pending:
+            task = asyncio.ensure_future(self._run(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pending: list):
+        texts = [text for batch, _ in pending for text in batch]
+        self.backend_calls += 1
+        try:
+            matrix = await asyncio.to_thread(self.embedder.embed_many, texts)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for batch, future in pending:
+            if not future.done():
+                future.set_result(matrix[offset:offset + len(batch)])
+            offset += len(batch)
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+_batchers = weakref.WeakKeyDictionary()  # event loop -> EmbeddingBatcher
+
+
+def get_embedder():
+    """Return the configured embedding backend."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                backend = settings.embedding_backend
+                if backend == "openai":
+                    _embedder = OpenAIEmbedder(
+                        model=settings.embedding_model,
+                        dimension=settings.embedding_dimensions,
+                        base_url=settings.embedding_base_url,
+                        api_key=settings.embedding_api_key,
+                        batch_size=settings.embedding_batch_size
+                    )
+                elif backend == "local":
+                    _embedder = LocalModelEmbedder(settings.embedding_model_path, batch_size=settings.embedding_batch_size)
+                elif backend == "hashing":
+                    _embedder = HashingEmbedder(dimension=settings.embedding_dimensions)
+                else:
+                    raise ValueError(f"Unknown embedding backend: {backend}")
+    return _embedder
+
+
+def _cache_lookup(embedder, texts: list):
     """
-    Placeholder implementation for embeddings.
+    Split texts into cached vectors and texts that still need embedding.
 
-    In a real implementation, this would use a model like sentence-transformers
-    to generate embeddings for the text.
+    Returns:
+        (keys per text, dictionary of key -> cached vector, {key: text} of the misses)
     """
-    # This is just a placeholder - not actually generating embeddings
-    return "padded_embedding"
+    keys = [embedding_key(embedder.model_id, text) for text in texts]
+    cache = get_embedding_cache()
+    found = cache.get_many(keys) if cache is not None else {}
+    missing = {key: text for key, text in zip(keys, texts) if key not in found}
+    return keys, found, missing
+
+
+def _cache_store(found: dict, missing: dict, matrix: np.ndarray):
+    cache = get_embedding_cache()
+    items = list(zip(missing, matrix))
+    if cache is not None:
+        cache.set_many(items)
+    found.update(items)
+
+
+def embed_many(texts: list) -> np.ndarray:
+    """
+    Embed texts with the configured backend, reusing cached vectors.
+
+    Args:
+        texts: Texts to embed
+
+    Returns:
+        A (len(texts), dimension) float32 matrix of unit-length rows
+    """
+    embedder = get_embedder()
+    if not texts:
+        return np.zeros((0, embedder.dimension), dtype=np.float32)
+
+    keys, found, missing = _cache_lookup(embedder, list(texts))
+    if missing:
+        _cache_store(found, missing, embedder.embed_many(list(missing.values())))
+    return np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
+
+
+async def embed_many_async(texts: list) -> np.ndarray:
+    """Embed texts without blocking the event loop, batching concurrent callers together."""
+    embedder = get_embedder()
+    if not texts:
+        return np.zeros((0, embedder.dimension), dtype=np.float32)
+
+    keys, found, missing = _cache_lookup(embedder, list(texts))
+    if missing:
+        # Batchers hold futures of one event loop; each live loop gets its own
+        loop = asyncio.get_running_loop()
+        batcher = _batchers.get(loop)
+        if batcher is None:
+            batcher = EmbeddingBatcher(
+                embedder,
+                max_batch=settings.embedding_batch_size,
+                max_wait=settings.embedding_batch_wait_ms / 1000.0
+            )
+            _batchers[loop] = batcher
+        _cache_store(found, missing, await batcher.embed_many(list(missing.values())))
+    return np.stack([found[key] for key in keys]).astype(np.float32, copy=False)
+
+
+def get_embedding(text: str) -> list[float]:
+    """Embed a single text and return the vector as a list of floats."""
+    return embed_many([text])[0].tolist()
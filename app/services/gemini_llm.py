@@ -24,36 +24,347 @@
 #         raise RuntimeError(f"Content generation failed: {e}")
 
 
-import google.generativeai as genai
+import asyncio
+import json
+import threading
+import time
 from app.config import settings
+from app.services.llm_backends import get_llm_backend
+from app.services.llm_cache import get_llm_cache, is_cacheable, make_cache_key
+from app.services.semantic_cache import get_semantic_cache, uses_semantic_cache
+from app.services.llm_governor import get_llm_governor
+from app.services.llm_hedging import hedged_call_async
+from app.services.llm_metrics import get_llm_metrics
+from app.services.context_cache import get_context_cache, uses_context_cache, context_key
+from app.utils.context_packer import estimate_tokens
 
-# Configure Gemini with your API key
-gemini_api_key = settings.gemini_api_key
-if not gemini_api_key:
-    raise ValueError("Gemini API key is not set in the environment variables.")
+# Model registry: one model per (backend, model name, generation config). The Gemini
+# backend configures the SDK on first use; models share its transport connections.
+_models = {}
+_models_lock = threading.Lock()
 
-genai.configure(api_key=gemini_api_key)
+def _generation_config_key(generation_config) -> str:
+    if not generation_config:
+        return ""
+    return json.dumps(generation_config, sort_keys=True, default=str)
 
-def generate_content(prompt: str) -> str:
+def get_model(model_name: str = None, generation_config: dict = None):
+    """
+    Return a configured model from the selected LLM backend (settings.llm_backend),
+    reusing the same instance for the process lifetime.
+
+    Args:
+        model_name: The model to use (defaults to settings.gemini_model)
+        generation_config: Optional generation config (temperature, max_output_tokens, ...)
+
+    Returns:
+        A GenerativeModel (or backend equivalent) shared by all callers with the same configuration
+    """
+    backend = get_llm_backend()
+    model_name = model_name or settings.gemini_model
+    key = (backend.name, model_name, _generation_config_key(generation_config))
+
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                model = backend.create_model(model_name, generation_config)
+                _models[key] = model
+    return model
+
+def _cache_key(prompt: str, model_name: str = None, generation_config: dict = None) -> str:
+    return make_cache_key(model_name or settings.gemini_model, prompt, generation_config)
+
+def _semantic_namespace(prompt_type: str, model_name: str = None, generation_config: dict = None) -> str:
+    return f"{prompt_type}:{model_name or settings.gemini_model}:{_generation_config_key(generation_config)}"
+
+def _get_cached_response(prompt, model_name, generation_config, prompt_type, cache_intent):
+    """
+    Look the request up in the exact-match cache, then the semantic cache.
+
+    Returns:
+        Tuple of (cached response or None, "exact"/"semantic"/"miss")
+    """
+    if is_cacheable(prompt_type):
+        cached = get_llm_cache().get(_cache_key(prompt, model_name, generation_config))
+        if cached is not None:
+            return cached, "exact"
+    return _get_semantic_response(model_name, generation_config, prompt_type, cache_intent)
+
+async def _get_cached_response_async(prompt, model_name, generation_config, prompt_type, cache_intent):
+    """
+    Async version of _get_cached_response: the memory tier is checked inline and
+    the SQLite tier is read in a worker thread, so disk I/O never blocks the event loop.
+    """
+    if is_cacheable(prompt_type):
+        cache = get_llm_cache()
+        key = _cache_key(prompt, model_name, generation_config)
+        cached = cache.get_memory(key)
+        if cached is None and cache.has_disk_tier:
+            cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached, "exact"
+    return _get_semantic_response(model_name, generation_config, prompt_type, cache_intent)
+
+def _get_semantic_response(model_name, generation_config, prompt_type, cache_intent):
+    if cache_intent and uses_semantic_cache(prompt_type):
+        namespace = _semantic_namespace(prompt_type, model_name, generation_config)
+        cached = get_semantic_cache().lookup(namespace, cache_intent)
+        if cached is not None:
+            return cached, "semantic"
+    return None, "miss"
+
+def _store_response(text, prompt, model_name, generation_config, prompt_type, cache_intent):
+    if not text:
+        return
+    if is_cacheable(prompt_type):
+        get_llm_cache().set(_cache_key(prompt, model_name, generation_config), text)
+    _store_semantic_response(text, model_name, generation_config, prompt_type, cache_intent)
+
+async def _store_response_async(text, prompt, model_name, generation_config, prompt_type, cache_intent):
+    """Async version of _store_response; the SQLite write runs in a worker thread."""
+    if not text:
+        return
+    if is_cacheable(prompt_type):
+        await asyncio.to_thread(get_llm_cache().set, _cache_key(prompt, model_name, generation_config), text)
+    _store_semantic_response(text, model_name, generation_config, prompt_type, cache_intent)
+
+def _store_semantic_response(text, model_name, generation_config, prompt_type, cache_intent):
+    if cache_intent and uses_semantic_cache(prompt_type):
+        namespace = _semantic_namespace(prompt_type, model_name, generation_config)
+        get_semantic_cache().store(namespace, cache_intent, text)
+
+def _output_tokens(response) -> int:
+    """Tokens used by a response's output, from usage metadata when available."""
+    usage = getattr(response, "usage_metadata", None)
+    count = getattr(usage, "candidates_token_count", None) if usage else None
+    if count:
+        return count
+    try:
+        return estimate_tokens(response.text)
+    except Exception:
+        return 0
+
+def _record_call(prompt_type, model_name, prompt, started_at, response=None, text=None,
+                 cache="miss", error=False):
+    """Record token usage, latency and cache status of a call in the LLM metrics."""
     try:
-        model = genai.GenerativeModel(model_name="gemini-2.0-flash")
-        response = model.generate_content(prompt)
-        return response.text
+        usage = getattr(response, "usage_metadata", None) if response is not None else None
+    except Exception:
+        usage = None
+    if cache in ("exact", "semantic"):
+        prompt_tokens = output_tokens = 0
+    else:
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+        output_tokens = getattr(usage, "candidates_token_count", None) or estimate_tokens(text or "")
+    get_llm_metrics().record(
+        prompt_type,
+        model_name or settings.gemini_model,
+        prompt_tokens=prompt_tokens,
+        output_tokens=output_tokens,
+        latency=time.monotonic() - started_at,
+        cache=cache,
+        error=error
+    )
+
+def generate_content(prompt: str, model_name: str = None, generation_config: dict = None,
+                     prompt_type: str = None, cache_intent: str = None) -> str:
+    """
+    Generate content with Gemini, serving repeated requests from the response caches.
+
+    Args:
+        prompt: The prompt to send
+        model_name: The Gemini model to use (defaults to settings.gemini_model)
+        generation_config: Optional generation config
+        prompt_type: Kind of prompt (e.g. "currency_check", "extraction", "final_mdx");
+            used to opt specific prompt types in or out of caching
+        cache_intent: Short description of what is being asked (e.g. the search query);
+            enables the semantic cache for near-identical requests of the same prompt type
+
+    Returns:
+        The generated text
+    """
+    started_at = time.monotonic()
+    cached, cache_status = _get_cached_response(prompt, model_name, generation_config, prompt_type, cache_intent)
+    if cached is not None:
+        _record_call(prompt_type, model_name, prompt, started_at, cache=cache_status)
+        return cached
+
+    try:
+        model = get_model(model_name, generation_config)
+        response = get_llm_governor().call(
+            lambda: model.generate_content(prompt),
+            tokens=estimate_tokens(prompt),
+            output_tokens=_output_tokens
+        )
+        text = response.text
     except Exception as e:
+        _record_call(prompt_type, model_name, prompt, started_at, error=True)
         raise RuntimeError(f"Content generation failed: {e}")
 
-def refine_content_with_gemini(mdx: str, question: str) -> str:
+    _record_call(prompt_type, model_name, prompt, started_at, response, text)
+    _store_response(text, prompt, model_name, generation_config, prompt_type, cache_intent)
+    return text
+
+async def _governed_call_async(prompt: str, model_name: str = None, generation_config: dict = None):
+    model = get_model(model_name, generation_config)
+    return await get_llm_governor().call_async(
+        lambda: model.generate_content_async(prompt),
+        tokens=estimate_tokens(prompt),
+        output_tokens=_output_tokens
+    )
+
+def _fallback_call(prompt: str, model_name: str = None, generation_config: dict = None):
+    """Return a callable starting the call on the fallback model, or None if there is none."""
+    fallback_model = settings.gemini_fallback_model
+    if not fallback_model or fallback_model == (model_name or settings.gemini_model):
+        return None
+    return lambda: _governed_call_async(prompt, fallback_model, generation_config)
+
+async def generate_content_async(prompt: str, model_name: str = None, generation_config: dict = None,
+                                 prompt_type: str = None, cache_intent: str = None) -> str:
     """
-    Refines MDX content based on a user question using Gemini API.
+    Async version of generate_content using the SDK's native async API,
+    so the event loop is not blocked while waiting for Gemini.
+
+    Slow calls are hedged, and fall back to settings.gemini_fallback_model when the
+    prompt type's deadline gets close (see app.services.llm_hedging).
+    """
+    started_at = time.monotonic()
+    cached, cache_status = await _get_cached_response_async(
+        prompt, model_name, generation_config, prompt_type, cache_intent
+    )
+    if cached is not None:
+        _record_call(prompt_type, model_name, prompt, started_at, cache=cache_status)
+        return cached
+
+    try:
+        response, used_fallback = await hedged_call_async(
+            prompt_type,
+            lambda: _governed_call_async(prompt, model_name, generation_config),
+            _fallback_call(prompt, model_name, generation_config)
+        )
+        text = response.text
+    except Exception as e:
+        _record_call(prompt_type, model_name, prompt, started_at, error=True)
+        raise RuntimeError(f"Content generation failed: {e}")
+
+    answered_by = settings.gemini_fallback_model if used_fallback else model_name
+    _record_call(prompt_type, answered_by, prompt, started_at, response, text)
+
+    # Answers from the lighter fallback model are not cached under the primary model's key
+    if not used_fallback:
+        await _store_response_async(text, prompt, model_name, generation_config, prompt_type, cache_intent)
+    return text
+
+async def generate_with_context_async(context: str, prompt: str, generation_config: dict = None,
+                                      prompt_type: str = None) -> str:
+    """
+    Generate content for a prompt that follows a large, reusable context (e.g. the MDX
+    document and crawled sources of a refinement session).
+
+    Large contexts are cached provider-side (see app.services.context_cache), so repeat
+    calls with the same context only send the new prompt. Small contexts, a disabled
+    context cache or a failing cache fall back to sending context + prompt in full.
 
     Args:
-        mdx: The original MDX content
-        question: The user's question or request for refinement
+        context: The reusable prefix of the prompt
+        prompt: The part of the prompt that changes between calls
+        generation_config: Optional generation config
+        prompt_type: Kind of prompt (e.g. "refine")
 
     Returns:
-        The refined MDX content
+        The generated text
+    """
+    full_prompt = context + prompt
+    if not uses_context_cache(context):
+        return await generate_content_async(full_prompt, generation_config=generation_config, prompt_type=prompt_type)
+
+    model_name = settings.context_cache_model or settings.gemini_model
+    started_at = time.monotonic()
+    cached, cache_status = await _get_cached_response_async(
+        full_prompt, model_name, generation_config, prompt_type, None
+    )
+    if cached is not None:
+        _record_call(prompt_type, model_name, full_prompt, started_at, cache=cache_status)
+        return cached
+
+    backend = get_context_cache()
+    key = context_key(model_name, context)
+    try:
+        handle = await backend.ensure_async(key, context, model_name)
+        response = await get_llm_governor().call_async(
+            lambda: backend.generate_async(handle, prompt, model_name, generation_config),
+            tokens=estimate_tokens(prompt),
+            output_tokens=_output_tokens
+        )
+        text = response.text
+    except Exception as e:
+        print(f"Context cache unavailable ({e}); sending the full prompt")
+        backend.invalidate(key)
+        return await generate_content_async(full_prompt, model_name, generation_config, prompt_type)
+
+    _record_call(prompt_type, model_name, prompt, started_at, response, text, cache="context")
+    await _store_response_async(text, full_prompt, model_name, generation_config, prompt_type, None)
+    return text
+
+async def stream_content_async(prompt: str, model_name: str = None, generation_config: dict = None,
+                               prompt_type: str = None, cache_intent: str = None):
+    """
+    Stream generated text from Gemini chunk by chunk as it arrives.
+
+    Cached responses are yielded as a single chunk. The full response is stored
+    in the caches once the stream completes.
+
+    Yields:
+        Text chunks in generation order
     """
-    prompt = f"""
+    started_at = time.monotonic()
+    cached, cache_status = await _get_cached_response_async(
+        prompt, model_name, generation_config, prompt_type, cache_intent
+    )
+    if cached is not None:
+        _record_call(prompt_type, model_name, prompt, started_at, cache=cache_status)
+        yield cached
+        return
+
+    governor = get_llm_governor()
+    model = get_model(model_name, generation_config)
+    chunks = []
+    attempt = 0
+    while True:
+        await governor.acquire_async(estimate_tokens(prompt))
+        try:
+            response = await model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. the final finish-reason chunk)
+                    continue
+                if text:
+                    chunks.append(text)
+                    yield text
+            break
+        except Exception as e:
+            # Only retry while nothing has been sent to the caller yet
+            delay = None if chunks else governor.retry_delay(e, attempt)
+            if delay is None:
+                _record_call(prompt_type, model_name, prompt, started_at, text="".join(chunks), error=True)
+                raise RuntimeError(f"Content generation failed: {e}")
+            print(f"⏳ Transient LLM error ({type(e).__name__}), retrying stream in {delay:.1f}s")
+        finally:
+            governor.release(estimate_tokens("".join(chunks)))
+        await asyncio.sleep(delay)
+        attempt += 1
+
+    # The response aggregates usage metadata once the stream has been consumed
+    _record_call(prompt_type, model_name, prompt, started_at, response, "".join(chunks))
+    await _store_response_async("".join(chunks), prompt, model_name, generation_config, prompt_type, cache_intent)
+
+def _build_refine_prompt(mdx: str, question: str) -> str:
+    return f"""
     Here is MDX content:
 
     {mdx}
@@ -64,8 +375,19 @@ def refine_content_with_gemini(mdx: str, question: str) -> str:
     Make sure to maintain proper MDX formatting in your response.
     """
 
+def refine_content_with_gemini(mdx: str, question: str) -> str:
+    """
+    Refines MDX content based on a user question using Gemini API.
+
+    Args:
+        mdx: The original MDX content
+        question: The user's question or request for refinement
+
+    Returns:
+        The refined MDX content
+    """
     try:
-        return generate_content(prompt)
+        return generate_content(_build_refine_prompt(mdx, question), prompt_type="refine")
     except Exception as e:
         print(f"❌ Error refining MDX content with Gemini: {e}")
         raise RuntimeError(f"Refinement with Gemini failed: {e}")
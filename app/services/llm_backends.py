@@ -0,0 +1,254 @@
+"""
+LLM provider backends.
+
+A backend creates model objects with the google-generativeai GenerativeModel
+call surface used by app.services.gemini_llm (generate_content,
+generate_content_async with optional stream=True, responses with .text and
+.usage_metadata). Select one with settings.llm_backend:
+
+- "gemini": Google Gemini. The SDK is configured lazily on first use, so the
+  app can be imported without an API key.
+- "stub": deterministic local model for load tests and benchmarks on machines
+  without network access or quota. Latency follows a log-normal distribution
+  for the time to first token plus a fixed output throughput; outputs are
+  canned/templated and derived from a hash of the prompt, so the same prompt
+  always gets the same answer.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from app.config import settings
+from app.utils.context_packer import estimate_tokens
+
+
+class GeminiBackend:
+    """Google Gemini via google-generativeai."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str = None, transport: str = None):
+        self.api_key = api_key
+        self.transport = transport
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def _configure(self):
+        import google.generativeai as genai
+        if not self.api_key:
+            raise ValueError("Gemini API key is not set in the environment variables.")
+        # The SDK keeps one default client (and its gRPC/HTTP channel pool) per process once
+        # configured; every model created afterwards shares those transport connections.
+        if self.transport:
+            genai.configure(api_key=self.api_key, transport=self.transport)
+        else:
+            genai.configure(api_key=self.api_key)
+        self._configured = True
+
+    def ensure_configured(self):
+        """Configure the SDK once per process."""
+        if not self._configured:
+            with self._lock:
+                if not self._configured:
+                    self._configure()
+
+    def create_model(self, model_name: str, generation_config: dict = None):
+        """Return a new GenerativeModel, configuring the SDK on first use."""
+        import google.generativeai as genai
+        self.ensure_configured()
+        return genai.GenerativeModel(model_name=model_name, generation_config=generation_config)
+
+
+class _StubChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StubStream:
+    """Async iterator over stub chunks, paced at the configured throughput."""
+
+    def __init__(self, pieces: list, seconds_per_piece: float, usage_metadata):
+        self._pieces = pieces
+        self._delay = seconds_per_piece
+        self.usage_metadata = usage_metadata
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for piece in self._pieces:
+            if self._delay:
+                await asyncio.sleep(self._delay)
+            yield _StubChunk(piece)
+
+
+class StubModel:
+    """
+    Offline stand-in for a GenerativeModel.
+
+    Args:
+        model_name: Reported model name
+        generation_config: Generation config; JSON output with a response_schema
+            produces a document matching the schema
+        backend: The StubBackend providing latency and canned responses
+    """
+
+    def __init__(self, model_name: str, generation_config: dict, backend: "StubBackend"):
+        self.model_name = model_name
+        self.generation_config = generation_config or {}
+        self.backend = backend
+
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.backend.seed}:{self.model_name}:{prompt}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "little"))
+
+    def _respond(self, prompt: str):
+        rng = self._rng(prompt)
+        text = self.backend.render(prompt, self.generation_config, rng)
+        usage = SimpleNamespace(
+            prompt_token_count=estimate_tokens(prompt),
+            candidates_token_count=estimate_tokens(text),
+            total_token_count=estimate_tokens(prompt) + estimate_tokens(text)
+        )
+        first_token = self.backend.first_token_latency(rng)
+        generation = self.backend.generation_time(usage.candidates_token_count)
+        return text, usage, first_token, generation
+
+    def generate_content(self, prompt: str):
+        text, usage, first_token, generation = self._respond(prompt)
+        time.sleep(first_token + generation)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        text, usage, first_token, generation = self._respond(prompt)
+        await asyncio.sleep(first_token)
+        if stream:
+            pieces = re.findall(r'\S+\s*|\s+', text) or [text]
+            return _StubStream(pieces, generation / len(pieces), usage)
+        await asyncio.sleep(generation)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+def _sample_from_schema(schema: dict, rng: random.Random, label: str = "item"):
+    """Build a value matching a (simplified OpenAPI) response schema."""
+    kind = str(schema.get("type", "string")).lower()
+    if kind == "object":
+        return {name: _sample_from_schema(prop, rng, name) for name, prop in schema.get("properties", {}).items()}
+    if kind == "array":
+        item_label = label[:-1] if label.endswith("s") else label
+        return [_sample_from_schema(schema.get("items", {}), rng, item_label) for _ in range(rng.randint(2, 4))]
+    if kind == "integer":
+        return rng.randint(1, 100)
+    if kind == "number":
+        return round(rng.uniform(0, 1), 3)
+    if kind == "boolean":
+        return rng.random() < 0.5
+    return f"Stub {label} {rng.randint(1, 999)}"
+
+
+DEFAULT_STUB_RESPONSES = [
+    # Currency check: answer from "knowledge" so load tests stay offline
+    {"match": r"Do you have up-to-date information", "response": "YES"},
+]
+
+
+class StubBackend:
+    """
+    Deterministic offline backend.
+
+    Args:
+        latency_median_ms: Median time to first token
+        latency_sigma: Log-normal sigma of the time to first token (0 for a fixed latency)
+        tokens_per_second: Output throughput (0 for instant output)
+        output_tokens: Approximate size of templated MDX outputs
+        responses: List of {"match": regex, "response": template} checked in order;
+            templates may use {subject} (the first quoted phrase in the prompt)
+        seed: Seed mixed into the per-prompt randomness
+    """
+
+    name = "stub"
+
+    def __init__(self, latency_median_ms: float = 400, latency_sigma: float = 0.6, tokens_per_second: float = 150,
+                 output_tokens: int = 400, responses: list = None, seed: int = 0):
+        self.latency_median = latency_median_ms / 1000.0
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.seed = seed
+        self.responses = [
+            (re.compile(item["match"], re.IGNORECASE | re.DOTALL), item["response"])
+            for item in (responses or []) + DEFAULT_STUB_RESPONSES
+        ]
+
+    def create_model(self, model_name: str, generation_config: dict = None) -> StubModel:
+        return StubModel(model_name, generation_config, self)
+
+    def first_token_latency(self, rng: random.Random) -> float:
+        if self.latency_sigma <= 0:
+            return self.latency_median
+        return rng.lognormvariate(0, self.latency_sigma) * self.latency_median
+
+    def generation_time(self, tokens: int) -> float:
+        if not self.tokens_per_second:
+            return 0.0
+        return tokens / self.tokens_per_second
+
+    def render(self, prompt: str, generation_config: dict, rng: random.Random) -> str:
+        """Produce the stub output for a prompt."""
+        quoted = re.search(r'"([^"\n]{1,80})"', prompt)
+        subject = quoted.group(1) if quoted else "the topic"
+
+        for pattern, template in self.responses:
+            if pattern.search(prompt):
+                return template.replace("{subject}", subject)
+
+        if generation_config.get("response_mime_type") == "application/json":
+            schema = generation_config.get("response_schema")
+            return json.dumps(_sample_from_schema(schema, rng) if schema else {})
+
+        # Templated MDX document of roughly output_tokens tokens
+        paragraphs = []
+        words = ["concept", "example", "detail", "pattern", "usage", "case", "step", "rule", "idea", "note"]
+        while estimate_tokens("\n\n".join(paragraphs)) < self.output_tokens:
+            sentence = " ".join(rng.choice(words) for _ in range(12))
+            paragraphs.append(f"This section explains {subject}: {sentence}.")
+        sections = "\n\n".join(f"## Part {i + 1}\n\n{p}" for i, p in enumerate(paragraphs))
+        return f"---\ntitle: {subject}\ndescription: Stub content about {subject}\n---\n\n# {subject}\n\n{sections}\n"
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _load_stub_responses(path: str) -> list:
+    if not path:
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_llm_backend():
+    """Return the configured LLM backend."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if settings.llm_backend == "gemini":
+                    _backend = GeminiBackend(api_key=settings.gemini_api_key, transport=settings.gemini_transport)
+                elif settings.llm_backend == "stub":
+                    _backend = StubBackend(
+                        latency_median_ms=settings.llm_stub_latency_median_ms,
+                        latency_sigma=settings.llm_stub_latency_sigma,
+                        tokens_per_second=settings.llm_stub_tokens_per_second,
+                        output_tokens=settings.llm_stub_output_tokens,
+                        responses=_load_stub_responses(settings.llm_stub_responses_file),
+                        seed=settings.llm_stub_seed
+                    )
+                else:
+                    raise ValueError(f"Unknown LLM backend: {settings.llm_backend}")
+    return _backend
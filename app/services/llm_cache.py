@@ -0,0 +1,161 @@
+"""
+Exact-match cache for LLM responses.
+
+Responses are keyed by a hash of (model, prompt, generation params) and kept in
+two tiers: an in-memory LRU in front of a SQLite file on disk, so hits survive
+restarts. Both tiers honour the configured TTL and size limits.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.config import settings
+from app.utils.lru_cache import TTLCache
+
+
+def make_cache_key(model_name: str, prompt: str, params: dict = None) -> str:
+    """
+    Build the cache key for an LLM call.
+
+    Args:
+        model_name: The model the prompt is sent to
+        prompt: The full prompt text
+        params: Generation parameters that affect the output
+
+    Returns:
+        A hex SHA-256 digest identifying the request
+    """
+    payload = json.dumps(
+        {"model": model_name, "prompt": prompt, "params": params or {}},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of LLM responses.
+
+    Args:
+        path: SQLite file for the disk tier (None keeps the cache memory-only)
+        ttl: Entry lifetime in seconds (None for no expiry)
+        memory_entries: Maximum number of entries held in memory
+        disk_entries: Maximum number of entries kept on disk
+    """
+
+    def __init__(self, path: str = None, ttl: float = None, memory_entries: int = 512, disk_entries: int = 10000):
+        self.path = path
+        self.ttl = ttl
+        self.disk_entries = disk_entries
+        self._memory = TTLCache(maxsize=memory_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    @property
+    def has_disk_tier(self) -> bool:
+        return self._conn is not None
+
+    def get_memory(self, key: str):
+        """Return the cached response for key from the memory tier only, or None."""
+        return self._memory.get(key)
+
+    def get(self, key: str):
+        """Return the cached response for key, or None."""
+        value = self._memory.get(key)
+        if value is not None:
+            return value
+        if self._conn is None:
+            return None
+
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+
+        # Promote to the memory tier
+        self._memory.set(key, value)
+        return value
+
+    def set(self, key: str, value: str):
+        """Store a response in both tiers."""
+        self._memory.set(key, value)
+        if self._conn is None:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._writes += 1
+            # Enforce the size limit periodically rather than on every write
+            if self._writes % 100 == 0:
+                self._prune(now)
+            self._conn.commit()
+
+    def _prune(self, now: float):
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key NOT IN "
+            "(SELECT key FROM responses ORDER BY accessed_at DESC LIMIT ?)",
+            (self.disk_entries,)
+        )
+
+    def clear(self):
+        """Remove all cached responses."""
+        self._memory.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+
+_cache = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """Return the process-wide LLM response cache."""
+    global _cache
+    if _cache is None:
+        _cache = LLMResponseCache(
+            path=os.path.join(settings.cache_dir, "llm_responses.sqlite3"),
+            ttl=settings.llm_cache_ttl_seconds,
+            memory_entries=settings.llm_cache_memory_entries,
+            disk_entries=settings.llm_cache_disk_entries
+        )
+    return _cache
+
+
+def is_cacheable(prompt_type: str = None) -> bool:
+    """Whether responses for this prompt type may be served from the cache."""
+    if not settings.llm_cache_enabled:
+        return False
+    return prompt_type not in settings.llm_cache_disabled_prompt_types
@@ -0,0 +1,226 @@
+"""
+Process-wide governor for LLM calls.
+
+Caps the number of in-flight Gemini calls and the tokens sent per minute, and
+retries transient failures (429 quota errors, 5xx, deadline exceeded) with
+exponential backoff and jitter, honouring the retry delay the API suggests.
+Near the quota, calls queue up and slow down instead of failing.
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from google.api_core import exceptions as google_exceptions
+from app.config import settings
+
+TRANSIENT_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+# "retry_delay { seconds: 37 }" (RetryInfo in the error details) or "Please retry in 37.2s"
+_RETRY_HINT_PATTERNS = [
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+(?:\.\d+)?)"),
+    re.compile(r"retry in\s*(\d+(?:\.\d+)?)\s*s", re.IGNORECASE),
+]
+
+# How often waiting callers re-check for a free slot or token budget
+_POLL_INTERVAL = 0.05
+
+
+def retry_hint(error: Exception):
+    """
+    Extract the server-suggested retry delay (seconds) from an API error, if any.
+    """
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        return float(retry_after)
+    message = str(error)
+    for pattern in _RETRY_HINT_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether an error is worth retrying."""
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class LLMGovernor:
+    """
+    Concurrency and tokens-per-minute limiter with retry/backoff for LLM calls.
+
+    The limits are shared by sync and async callers in every thread and event loop.
+
+    Args:
+        max_concurrency: Maximum in-flight calls (0 for no limit)
+        tokens_per_minute: Token budget per minute, refilled continuously (0 for no limit)
+        max_retries: Retries for transient errors before giving up
+        backoff_base: Delay in seconds before the first retry; doubled on each attempt
+        backoff_max: Upper bound for a single retry delay in seconds
+    """
+
+    def __init__(self, max_concurrency: int = 16, tokens_per_minute: int = 0, max_retries: int = 4,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._tokens = float(tokens_per_minute)
+        self._refilled_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """
+        Take a slot and charge tokens if both are available.
+
+        Returns:
+            0 if acquired, otherwise the suggested wait in seconds before trying again
+        """
+        with self._lock:
+            if self.max_concurrency and self._in_flight >= self.max_concurrency:
+                return _POLL_INTERVAL
+
+            if self.tokens_per_minute:
+                self._refill(time.monotonic())
+                # A request larger than the whole budget only needs a full bucket
+                needed = min(tokens, self.tokens_per_minute)
+                if self._tokens < needed:
+                    rate = self.tokens_per_minute / 60.0
+                    return max(_POLL_INTERVAL, (needed - self._tokens) / rate)
+                self._tokens -= tokens
+
+            self._in_flight += 1
+            return 0
+
+    def acquire(self, tokens: int = 0):
+        """Block until a slot and the token budget are available."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """Wait (without blocking the event loop) until a slot and the token budget are available."""
+        while True:
+            wait = self._try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def release(self, output_tokens: int = 0):
+        """Free a slot, charging the tokens the response used."""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if self.tokens_per_minute and output_tokens:
+                self._refill(time.monotonic())
+                # May go negative, which delays the next callers until it refills
+                self._tokens -= output_tokens
+
+    def retry_delay(self, error: Exception, attempt: int):
+        """
+        Delay before retrying a failed call.
+
+        Args:
+            error: The exception raised by the call
+            attempt: Number of retries already made
+
+        Returns:
+            Seconds to wait, or None if the error should not be retried
+        """
+        if not is_transient(error) or attempt >= self.max_retries:
+            return None
+        # Exponential backoff with "full jitter" between half and the whole step
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay *= random.uniform(0.5, 1.0)
+        hint = retry_hint(error)
+        if hint is not None:
+            delay = min(self.backoff_max, max(delay, hint + random.uniform(0, 0.5)))
+        return delay
+
+    def call(self, make_call, tokens: int = 0, output_tokens=None):
+        """
+        Run a blocking LLM call under the limits, retrying transient errors.
+
+        Args:
+            make_call: Zero-argument callable performing the call
+            tokens: Estimated prompt tokens
+            output_tokens: Optional callable returning the tokens used by the result
+
+        Returns:
+            The call's result
+        """
+        attempt = 0
+        while True:
+            self.acquire(tokens)
+            used = 0
+            try:
+                result = make_call()
+                used = output_tokens(result) if output_tokens else 0
+                return result
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                print(f"⏳ Transient LLM error ({type(e).__name__}), retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries})")
+            finally:
+                self.release(used)
+            time.sleep(delay)
+            attempt += 1
+
+    async def call_async(self, make_call, tokens: int = 0, output_tokens=None):
+        """
+        Async version of call; make_call returns the coroutine to await.
+        """
+        attempt = 0
+        while True:
+            await self.acquire_async(tokens)
+            used = 0
+            try:
+                result = await make_call()
+                used = output_tokens(result) if output_tokens else 0
+                return result
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                print(f"⏳ Transient LLM error ({type(e).__name__}), retrying in {delay:.1f}s "
+                      f"(attempt {attempt + 1}/{self.max_retries})")
+            finally:
+                self.release(used)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+_governor = None
+
+
+def get_llm_governor() -> LLMGovernor:
+    """Return the process-wide LLM governor."""
+    global _governor
+    if _governor is None:
+        _governor = LLMGovernor(
+            max_concurrency=settings.llm_max_concurrency,
+            tokens_per_minute=settings.llm_tokens_per_minute,
+            max_retries=settings.llm_max_retries,
+            backoff_base=settings.llm_backoff_base,
+            backoff_max=settings.llm_backoff_max
+        )
+    return _governor
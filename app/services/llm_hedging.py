@@ -0,0 +1,145 @@
+"""
+Tail-latency protection for LLM calls.
+
+Two techniques, both configured per prompt type:
+
+- Hedging: if a call has not finished after the prompt type's recent latency
+  percentile (e.g. p95), a second identical call is started and whichever
+  finishes first wins. Only the slowest few percent of calls are duplicated, so
+  the average cost barely changes.
+- Deadline fallback: when a stage's deadline is getting close, a call to a
+  lighter fallback model is started, timed so it can still finish in time.
+
+Latencies come from a rolling window per prompt type. Each request records its
+end-to-end latency from the primary call's start, whichever call won, so hedges
+winning do not pull the hedging percentile down.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from app.config import settings
+
+
+class LatencyTracker:
+    """
+    Rolling window of call latencies per key.
+
+    Args:
+        window: Number of recent samples kept per key
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        """Add a latency sample."""
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key: str, percentile: float, min_samples: int = 1):
+        """
+        Return the given percentile (0-100) of recent latencies, or None if there
+        are fewer than min_samples samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, int(round(percentile / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+
+_tracker = None
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """Return the process-wide latency tracker."""
+    global _tracker
+    if _tracker is None:
+        _tracker = LatencyTracker(window=settings.llm_latency_window)
+    return _tracker
+
+
+def _launch_plan(prompt_type: str, tracker: LatencyTracker, has_fallback: bool) -> list:
+    """Return [(seconds after start, "hedge"/"fallback")] in launch order."""
+    plan = []
+    if prompt_type in settings.llm_hedge_prompt_types:
+        hedge_at = tracker.percentile(prompt_type, settings.llm_hedge_percentile, settings.llm_hedge_min_samples)
+        if hedge_at is not None:
+            plan.append((hedge_at, "hedge"))
+
+    deadline = settings.llm_stage_deadlines.get(prompt_type)
+    if has_fallback and deadline:
+        # Leave the fallback model enough time to finish before the deadline
+        lead = tracker.percentile(f"{prompt_type}:fallback", 90)
+        if lead is None:
+            lead = deadline * 0.4
+        plan.append((max(0.0, deadline - lead), "fallback"))
+
+    return sorted(plan, key=lambda item: item[0])
+
+
+async def hedged_call_async(prompt_type: str, make_call, make_fallback_call=None) -> tuple:
+    """
+    Run an LLM call with hedging and deadline fallback as configured for its prompt type.
+
+    Args:
+        prompt_type: Kind of prompt, used to pick the policy and latency history
+        make_call: Zero-argument callable returning the coroutine for the primary call
+        make_fallback_call: Optional callable returning the coroutine for the fallback model
+
+    Returns:
+        Tuple of (result, used_fallback)
+    """
+    tracker = get_latency_tracker()
+    plan = _launch_plan(prompt_type, tracker, make_fallback_call is not None)
+    start = time.monotonic()
+
+    tasks = {}  # task -> (kind, started_at)
+
+    def launch(kind):
+        make = make_fallback_call if kind == "fallback" else make_call
+        tasks[asyncio.ensure_future(make())] = (kind, time.monotonic())
+        if kind != "primary":
+            print(f"⏱️ Starting {kind} call for {prompt_type} after {time.monotonic() - start:.1f}s")
+
+    launch("primary")
+    last_error = None
+    try:
+        while tasks:
+            timeout = None
+            if plan:
+                timeout = max(0.0, plan[0][0] - (time.monotonic() - start))
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                launch(plan.pop(0)[1])
+                continue
+
+            for task in done:
+                kind, started_at = tasks.pop(task)
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    continue
+                now = time.monotonic()
+                if kind == "fallback":
+                    tracker.record(f"{prompt_type}:fallback", now - started_at)
+                if kind != "fallback" or any(other != "fallback" for other, _ in tasks.values()):
+                    # End-to-end latency from the primary's start; when the fallback beats a
+                    # primary that is still running this is a lower bound on how slow it was
+                    tracker.record(prompt_type, now - start)
+                return task.result(), kind == "fallback"
+
+            if not tasks:
+                # Everything started so far failed; go straight to the fallback if there is one
+                plan = [item for item in plan if item[1] == "fallback"]
+                if plan:
+                    launch(plan.pop(0)[1])
+        raise last_error
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,193 @@
+"""
+Token and latency accounting for LLM calls.
+
+Every Gemini call made through app.services.gemini_llm is recorded with its
+prompt type, model, prompt/output token counts, latency and cache status.
+Totals are aggregated per prompt type and per route (the HTTP path of the
+request that triggered the call, tracked with a context variable set by the
+middleware in app.main), and a per-request summary is kept for recent requests.
+"""
+
+import contextvars
+import threading
+import time
+from collections import deque
+from app.config import settings
+
+# Latency samples kept per aggregate for percentiles
+_LATENCY_WINDOW = 500
+
+
+class _Stats:
+    """Running totals for one (route, prompt type) aggregate."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = {"exact": 0, "semantic": 0, "context": 0}
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.latency_total = 0.0
+        self.latencies = deque(maxlen=_LATENCY_WINDOW)
+
+    def add(self, prompt_tokens: int, output_tokens: int, latency: float, cache: str, error: bool):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        if cache in self.cache_hits:
+            self.cache_hits[cache] += 1
+        self.prompt_tokens += prompt_tokens
+        self.output_tokens += output_tokens
+        self.latency_total += latency
+        self.latencies.append(latency)
+
+    def to_dict(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def pct(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p / 100.0 * len(latencies)))], 3)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "cache_hits": dict(self.cache_hits),
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.prompt_tokens + self.output_tokens,
+            "latency_avg": round(self.latency_total / self.calls, 3) if self.calls else None,
+            "latency_p50": pct(50),
+            "latency_p95": pct(95),
+        }
+
+
+class RequestMetrics:
+    """LLM usage of a single HTTP request."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.started_at = time.time()
+        self.calls = []
+
+    def summary(self) -> dict:
+        by_type = {}
+        for call in self.calls:
+            entry = by_type.setdefault(call["prompt_type"], {"calls": 0, "prompt_tokens": 0, "output_tokens": 0,
+                                                             "latency": 0.0, "cache_hits": 0})
+            entry["calls"] += 1
+            entry["prompt_tokens"] += call["prompt_tokens"]
+            entry["output_tokens"] += call["output_tokens"]
+            entry["latency"] = round(entry["latency"] + call["latency"], 3)
+            if call["cache"] in ("exact", "semantic"):
+                entry["cache_hits"] += 1
+        return {
+            "route": self.route,
+            "started_at": self.started_at,
+            "llm_calls": len(self.calls),
+            "prompt_tokens": sum(c["prompt_tokens"] for c in self.calls),
+            "output_tokens": sum(c["output_tokens"] for c in self.calls),
+            "llm_seconds": round(sum(c["latency"] for c in self.calls), 3),
+            "by_prompt_type": by_type,
+        }
+
+
+_current_request = contextvars.ContextVar("llm_request_metrics", default=None)
+
+
+class LLMMetrics:
+    """Process-wide LLM usage aggregates."""
+
+    def __init__(self, recent_requests: int = 100):
+        self._lock = threading.Lock()
+        self._by_prompt_type = {}
+        self._by_route = {}
+        self._recent = deque(maxlen=recent_requests)
+
+    def record(self, prompt_type: str, model_name: str, prompt_tokens: int = 0, output_tokens: int = 0,
+               latency: float = 0.0, cache: str = "miss", error: bool = False):
+        """
+        Record one LLM call.
+
+        Args:
+            prompt_type: Kind of prompt (e.g. "extraction", "final_mdx")
+            model_name: The model that answered
+            prompt_tokens: Tokens in the prompt
+            output_tokens: Tokens in the response
+            latency: Seconds spent waiting for the response
+            cache: "miss", "exact", "semantic" or "context" (provider-side cached prefix)
+            error: Whether the call failed
+        """
+        prompt_type = prompt_type or "unknown"
+        request = _current_request.get()
+        route = request.route if request else "background"
+
+        with self._lock:
+            self._by_prompt_type.setdefault(prompt_type, _Stats()).add(
+                prompt_tokens, output_tokens, latency, cache, error
+            )
+            self._by_route.setdefault(route, {}).setdefault(prompt_type, _Stats()).add(
+                prompt_tokens, output_tokens, latency, cache, error
+            )
+            if request is not None:
+                request.calls.append({
+                    "prompt_type": prompt_type,
+                    "model": model_name,
+                    "prompt_tokens": prompt_tokens,
+                    "output_tokens": output_tokens,
+                    "latency": latency,
+                    "cache": cache,
+                    "error": error,
+                })
+
+    def start_request(self, route: str):
+        """
+        Start collecting LLM usage for the current request.
+
+        Returns:
+            A (request metrics, context token) pair to pass to end_request
+        """
+        request = RequestMetrics(route)
+        with self._lock:
+            # Streaming responses keep adding calls after the handler returns
+            self._recent.append(request)
+        return request, _current_request.set(request)
+
+    def end_request(self, token):
+        """Stop attributing LLM calls to the current request."""
+        _current_request.reset(token)
+
+    def snapshot(self) -> dict:
+        """Return the aggregates per prompt type and per route."""
+        with self._lock:
+            return {
+                "by_prompt_type": {pt: stats.to_dict() for pt, stats in self._by_prompt_type.items()},
+                "by_route": {
+                    route: {pt: stats.to_dict() for pt, stats in types.items()}
+                    for route, types in self._by_route.items()
+                },
+            }
+
+    def recent_requests(self) -> list:
+        """Return per-request summaries, most recent first."""
+        with self._lock:
+            requests = list(self._recent)
+        return [request.summary() for request in reversed(requests) if request.calls]
+
+    def reset(self):
+        """Clear all aggregates."""
+        with self._lock:
+            self._by_prompt_type.clear()
+            self._by_route.clear()
+            self._recent.clear()
+
+
+_metrics = None
+
+
+def get_llm_metrics() -> LLMMetrics:
+    """Return the process-wide LLM metrics."""
+    global _metrics
+    if _metrics is None:
+        _metrics = LLMMetrics(recent_requests=settings.llm_metrics_recent_requests)
+    return _metrics
@@ -0,0 +1,101 @@
+"""
+Local search provider backed by a BM25 index over previously crawled pages.
+
+Every page successfully crawled by crawl4ai is added to the index, so later
+searches for the same subject can be answered locally (and offline) before
+falling back to a web search. Pages older than settings.local_search_max_age_days
+are never returned: they are evicted when the index is loaded and whenever a
+search runs into one.
+"""
+
+import os
+import time
+from app.config import settings
+from app.utils.text_search import BM25Index
+
+_index = None
+
+
+def get_local_index() -> BM25Index:
+    """
+    Return the process-wide local search index, loading it from disk on first use.
+    """
+    global _index
+    if _index is None:
+        path = os.path.join(settings.cache_dir, "local_search_index.json")
+        try:
+            index = BM25Index(path=path)
+        except Exception as e:
+            print(f"⚠️ Could not load local search index, starting empty: {e}")
+            index = BM25Index()
+            index.path = path
+            # Replace the unreadable file, or the changes logged after it could never be loaded
+            _save(index, force=True)
+        for doc_id in index.doc_ids():
+            if _is_stale(index, doc_id):
+                index.remove_document(doc_id)
+        _save(index)
+        _index = index
+    return _index
+
+
+def _is_stale(index: BM25Index, doc_id: str) -> bool:
+    max_age = settings.local_search_max_age_days
+    if max_age <= 0:
+        return False
+    crawled_at = index.get_meta(doc_id).get("crawled_at")
+    return crawled_at is not None and crawled_at < time.time() - max_age * 86400
+
+
+def _save(index: BM25Index, force: bool = False):
+    try:
+        index.save(force=force)
+    except Exception as e:
+        print(f"⚠️ Could not persist local search index: {e}")
+
+
+def index_crawled_pages(scraped_data: dict):
+    """
+    Incrementally add crawled pages to the local search index and persist the change.
+
+    Args:
+        scraped_data: Dictionary mapping URLs to their crawled markdown content
+    """
+    if not settings.local_search_enabled:
+        return
+
+    index = get_local_index()
+    added = 0
+    for url, content in scraped_data.items():
+        if isinstance(content, str) and content.strip() and not content.startswith("Error scraping"):
+            index.add_document(url, content, meta={"crawled_at": time.time()})
+            added += 1
+
+    if added:
+        _save(index)
+
+
+def search_local(query: str, limit: int = 2) -> list:
+    """
+    Search previously crawled pages for a query.
+
+    Args:
+        query: The search query
+        limit: Maximum number of URLs to return
+
+    Returns:
+        List of matching URLs, best match first
+    """
+    if not settings.local_search_enabled:
+        return []
+
+    index = get_local_index()
+    while True:
+        results = index.search(query, limit=limit, min_coverage=settings.local_search_min_coverage)
+        stale = [result["doc_id"] for result in results if _is_stale(index, result["doc_id"])]
+        if not stale:
+            return [result["doc_id"] for result in results]
+        # Evict pages that expired while the process was running and search again
+        for doc_id in stale:
+            index.remove_document(doc_id)
+        _save(index)
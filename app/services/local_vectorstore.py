@@ -0,0 +1,411 @@
+"""
+In-process vector index, an offline alternative to Pinecone.
+
+Vectors live in a memory-mapped float32 .npy file (grown by doubling) with ids,
+namespaces and metadata in a JSON sidecar, so an index survives restarts and
+is paged in by the OS instead of being loaded up front. Upserts only append
+their rows' metadata to a log next to the sidecar; the sidecar is rewritten
+(and the log emptied) once the log has grown as large as the index, and on
+close(), so persisting an upsert costs time in the batch size rather than the
+index size. Scores are cosine similarities, matching the Pinecone index's metric.
+
+Two search strategies:
+
+- "flat": exact brute-force search, one matrix-vector product. Best for small
+  and medium corpora.
+- "ivf": approximate inverted-file search. Vectors are clustered with
+  spherical k-means and a query only scores the vectors in the nprobe
+  clusters closest to it. The clustering is retrained when the index has
+  doubled in size since it was last trained.
+
+"auto" uses flat search below ivf_threshold vectors and IVF above it.
+"""
+
+import json
+import os
+import threading
+import numpy as np
+from numpy.lib.format import open_memmap
+
+_INITIAL_CAPACITY = 1024
+_KMEANS_ITERATIONS = 10
+_KMEANS_SAMPLE = 20000
+# Smallest metadata log worth compacting into meta.json
+_COMPACT_MIN_ENTRIES = 1024
+
+
+class LocalVectorIndex:
+    """
+    Persistent local vector index with the upsert/query interface of a Pinecone index.
+
+    Args:
+        path: Directory holding the index files (None keeps the index in memory)
+        dimension: Vector size
+        kind: "flat", "ivf" or "auto"
+        ivf_threshold: Vector count above which "auto" switches to IVF
+        nlist: Number of IVF clusters (0 picks about sqrt(count))
+        nprobe: Number of clusters searched per IVF query
+    """
+
+    def __init__(self, path: str = None, dimension: int = 1536, kind: str = "auto", ivf_threshold: int = 50000,
+                 nlist: int = 0, nprobe: int = 8):
+        self.path = path
+        self.dimension = dimension
+        self.kind = kind
+        self.ivf_threshold = ivf_threshold
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+
+        self.count = 0
+        self._ids = []
+        self._namespaces = []
+        self._metadata = []
+        self._rows = {}  # (namespace, id) -> row
+        self._namespace_codes = {}
+        self._row_namespace = np.zeros(0, dtype=np.int32)
+
+        self._centroids = None
+        self._lists = None
+        self._assignments = None
+        self._trained_at = 0
+        self._log_entries = 0
+
+        self._vectors = None
+        if path and os.path.exists(os.path.join(path, "meta.json")):
+            self._load()
+        else:
+            self._allocate(_INITIAL_CAPACITY)
+            self._save()
+
+    # -- storage ---------------------------------------------------------
+
+    def _vectors_file(self) -> str:
+        return os.path.join(self.path, "vectors.npy")
+
+    def _log_file(self) -> str:
+        return os.path.join(self.path, "meta.log")
+
+    def _allocate(self, capacity: int):
+        old = self._vectors
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            tmp = self._vectors_file() + ".tmp"
+            vectors = open_memmap(tmp, mode="w+", dtype=np.float32, shape=(capacity, self.dimension))
+            if old is not None and self.count:
+                vectors[:self.count] = old[:self.count]
+            vectors.flush()
+            del old
+            self._vectors = None
+            del vectors
+            os.replace(tmp, self._vectors_file())
+            self._vectors = np.load(self._vectors_file(), mmap_mode="r+")
+        else:
+            vectors = np.zeros((capacity, self.dimension), dtype=np.float32)
+            if old is not None and self.count:
+                vectors[:self.count] = old[:self.count]
+            self._vectors = vectors
+
+        row_namespace = np.zeros(capacity, dtype=np.int32)
+        row_namespace[:self.count] = self._row_namespace[:self.count]
+        self._row_namespace = row_namespace
+        if self._assignments is not None:
+            assignments = np.zeros(capacity, dtype=np.int32)
+            assignments[:self.count] = self._assignments[:self.count]
+            self._assignments = assignments
+
+    def _load(self):
+        with open(os.path.join(self.path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["dimension"] != self.dimension:
+            raise ValueError(
+                f"Local vector index at {self.path} has dimension {meta['dimension']}, expected {self.dimension}"
+            )
+        self.count = meta["count"]
+        self._ids = meta["ids"]
+        self._namespaces = meta["namespaces"]
+        self._metadata = meta["metadata"]
+        replayed, log_complete = self._replay_log()
+        self._vectors = np.load(self._vectors_file(), mmap_mode="r+")
+
+        self._row_namespace = np.zeros(len(self._vectors), dtype=np.int32)
+        for row, (namespace, vector_id) in enumerate(zip(self._namespaces, self._ids)):
+            code = self._namespace_codes.setdefault(namespace, len(self._namespace_codes))
+            self._row_namespace[row] = code
+            self._rows[(namespace, vector_id)] = row
+
+        ivf_file = os.path.join(self.path, "ivf.npz")
+        if os.path.exists(ivf_file):
+            data = np.load(ivf_file)
+            self._centroids = data["centroids"]
+            self._trained_at = int(data["trained_at"])
+            saved = min(len(data["assignments"]), self.count)
+            self._assignments = np.zeros(len(self._vectors), dtype=np.int32)
+            self._assignments[:saved] = data["assignments"][:saved]
+            # Rows added or replaced since the clustering was saved
+            stale = np.asarray(sorted(replayed | set(range(saved, self.count))), dtype=np.intp)
+            if len(stale):
+                self._assignments[stale] = self._assign(self._vectors[stale])
+            self._rebuild_lists()
+
+        if not log_complete:
+            # Appending after a torn entry would hide everything written after it
+            self._save()
+
+    def _replay_log(self) -> tuple:
+        """
+        Apply the metadata log written since meta.json was saved.
+
+        Returns:
+            (rows the log touched, whether every entry could be applied)
+        """
+        rows = set()
+        if not os.path.exists(self._log_file()):
+            return rows, True
+        with open(self._log_file(), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    return rows, False  # A write cut short by a crash
+                row = entry["row"]
+                if row == len(self._ids):
+                    self._ids.append(entry["id"])
+                    self._namespaces.append(entry["namespace"])
+                    self._metadata.append(entry["metadata"])
+                elif row < len(self._ids):
+                    self._ids[row] = entry["id"]
+                    self._namespaces[row] = entry["namespace"]
+                    self._metadata[row] = entry["metadata"]
+                else:
+                    return rows, False
+                rows.add(row)
+                self._log_entries += 1
+                self.count = len(self._ids)
+        return rows, True
+
+    def _append_log(self, rows: list):
+        """Persist the metadata of upserted rows, compacting the log into meta.json when it gets large."""
+        if not self.path:
+            return
+        self._vectors.flush()
+        with open(self._log_file(), "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps({
+                    "row": row,
+                    "id": self._ids[row],
+                    "namespace": self._namespaces[row],
+                    "metadata": self._metadata[row],
+                }) + "\n")
+        self._log_entries += len(rows)
+        if self._log_entries >= max(_COMPACT_MIN_ENTRIES, self.count):
+            self._save()
+
+    def _save(self):
+        """Write a full snapshot of the metadata (and IVF clustering) and empty the log."""
+        if not self.path:
+            return
+        self._vectors.flush()
+        meta = {
+            "dimension": self.dimension,
+            "count": self.count,
+            "ids": self._ids,
+            "namespaces": self._namespaces,
+            "metadata": self._metadata,
+        }
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+        if self._centroids is not None:
+            tmp = os.path.join(self.path, "ivf.tmp.npz")
+            np.savez(tmp, centroids=self._centroids, assignments=self._assignments[:self.count],
+                     trained_at=self._trained_at)
+            os.replace(tmp, os.path.join(self.path, "ivf.npz"))
+
+        if os.path.exists(self._log_file()):
+            os.remove(self._log_file())
+        self._log_entries = 0
+
+    # -- IVF -------------------------------------------------------------
+
+    def _use_ivf(self) -> bool:
+        if self.kind == "ivf":
+            return self.count > 0
+        return self.kind == "auto" and self.count >= self.ivf_threshold
+
+    def _rebuild_lists(self):
+        self._lists = [[] for _ in range(len(self._centroids))]
+        for row, cluster in enumerate(self._assignments[:self.count]):
+            self._lists[cluster].append(row)
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 4096):
+            assignments[start:start + 4096] = np.argmax(vectors[start:start + 4096] @ self._centroids.T, axis=1)
+        return assignments
+
+    def _train(self):
+        """Cluster the stored vectors with spherical k-means."""
+        vectors = self._vectors[:self.count]
+        nlist = self.nlist or int(np.sqrt(self.count))
+        nlist = max(1, min(nlist, self.count))
+        rng = np.random.default_rng(0)
+        sample = vectors[np.sort(rng.choice(self.count, size=min(self.count, _KMEANS_SAMPLE), replace=False))]
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(_KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Keep the old centroid for clusters that lost all their members
+            empty = norms[:, 0] == 0
+            sums[empty] = centroids[empty]
+            norms[empty] = 1.0
+            centroids = sums / norms
+
+        self._centroids = centroids.astype(np.float32)
+        self._assignments = np.zeros(len(self._vectors), dtype=np.int32)
+        self._assignments[:self.count] = self._assign(vectors)
+        self._trained_at = self.count
+        self._rebuild_lists()
+        print(f"🧭 Trained local IVF index: {nlist} clusters over {self.count} vectors")
+
+    # -- public interface ------------------------------------------------
+
+    def upsert(self, vectors: list, namespace: str = None):
+        """
+        Insert or replace vectors.
+
+        Args:
+            vectors: List of {"id", "values", "metadata"} dictionaries
+            namespace: Namespace to store them in
+        """
+        if not vectors:
+            return
+        # A batch naming the same id twice keeps the last vector, as if upserted one by one
+        vectors = list({vector["id"]: vector for vector in vectors}.values())
+        namespace = namespace or ""
+        values = np.asarray([v["values"] for v in vectors], dtype=np.float32)
+        if values.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got {values.shape[1]}")
+        norms = np.linalg.norm(values, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        values /= norms
+
+        with self._lock:
+            code = self._namespace_codes.setdefault(namespace, len(self._namespace_codes))
+            rows = []
+            replaced = set()
+            for vector in vectors:
+                key = (namespace, vector["id"])
+                row = self._rows.get(key)
+                if row is None:
+                    if self.count == len(self._vectors):
+                        self._allocate(2 * len(self._vectors))
+                    row = self.count
+                    self.count += 1
+                    self._rows[key] = row
+                    self._ids.append(vector["id"])
+                    self._namespaces.append(namespace)
+                    self._metadata.append(vector.get("metadata") or {})
+                else:
+                    self._metadata[row] = vector.get("metadata") or {}
+                    replaced.add(row)
+                self._row_namespace[row] = code
+                rows.append(row)
+
+            rows = np.asarray(rows)
+            self._vectors[rows] = values
+
+            trained = False
+            if self._use_ivf():
+                if self._centroids is None or self.count >= 2 * self._trained_at:
+                    self._train()
+                    trained = True
+                else:
+                    assignments = self._assign(values)
+                    for row, cluster in zip(rows.tolist(), assignments):
+                        if row in replaced:
+                            self._lists[self._assignments[row]].remove(row)
+                        self._assignments[row] = cluster
+                        self._lists[cluster].append(row)
+
+            # Retraining already costs time in the index size, so snapshot the new clustering
+            if trained:
+                self._save()
+            else:
+                self._append_log(rows.tolist())
+
+    def close(self):
+        """Flush pending writes and compact the metadata log into meta.json."""
+        with self._lock:
+            if self.path and self._vectors is not None:
+                self._save()
+
+    def query(self, vector, top_k: int = 2, namespace: str = None, include_metadata: bool = True) -> dict:
+        """
+        Find the stored vectors most similar to a query vector.
+
+        Returns:
+            {"matches": [{"id", "score", "metadata"}, ...]} like a Pinecone query response
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+
+        with self._lock:
+            code = self._namespace_codes.get(namespace or "")
+            if code is None or self.count == 0:
+                return {"matches": []}
+
+            if self._use_ivf() and self._centroids is not None:
+                probe = np.argsort(-(self._centroids @ query))[:self.nprobe]
+                candidates = [np.asarray(self._lists[c], dtype=np.intp) for c in probe]
+                rows = np.concatenate(candidates) if candidates else np.zeros(0, dtype=np.intp)
+                rows = rows[self._row_namespace[rows] == code]
+            else:
+                rows = np.flatnonzero(self._row_namespace[:self.count] == code)
+            if len(rows) == 0:
+                return {"matches": []}
+
+            scores = self._vectors[rows] @ query
+            k = min(top_k, len(rows))
+            best = np.argpartition(-scores, k - 1)[:k]
+            best = best[np.argsort(-scores[best])]
+
+            matches = []
+            for i in best:
+                row = int(rows[i])
+                match = {"id": self._ids[row], "score": float(scores[i])}
+                if include_metadata:
+                    match["metadata"] = self._metadata[row]
+                matches.append(match)
+            return {"matches": matches}
+
+
+_local_index = None
+_local_index_lock = threading.Lock()
+
+
+def get_local_index() -> LocalVectorIndex:
+    """Return the process-wide local vector index."""
+    global _local_index
+    if _local_index is None:
+        with _local_index_lock:
+            if _local_index is None:
+                # Imported here so the index module stays usable without the embedding settings
+                from app.config import settings
+                from app.services.embeddings import get_embedder
+                _local_index = LocalVectorIndex(
+                    path=settings.local_vector_index_dir or os.path.join(settings.cache_dir, "vector_index"),
+                    dimension=get_embedder().dimension,
+                    kind=settings.local_vector_index_kind,
+                    ivf_threshold=settings.local_vector_ivf_threshold,
+                    nlist=settings.local_vector_ivf_lists,
+                    nprobe=settings.local_vector_ivf_probes
+                )
+    return _local_index
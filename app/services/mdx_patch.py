@@ -0,0 +1,194 @@
+"""
+Patch-based MDX refinement.
+
+Instead of sending the whole document and getting a rewritten snippet back, the
+selected text is located in the MDX, only its enclosing section and a compact
+outline of the rest of the document are sent, and Gemini returns a structured
+patch (the replacement for the selected span) that is applied server-side.
+Output tokens then scale with the size of the edit, not the document.
+"""
+
+import json
+import re
+from app.services.gemini_llm import generate_content_async
+
+PATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "replacement": {"type": "string"},
+    },
+    "required": ["replacement"],
+}
+
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": PATCH_SCHEMA,
+}
+
+_HEADING = re.compile(r'^(#{1,6})\s+(.*)$')
+
+
+def locate_selection(mdx: str, selected_text: str, occurrence: int = None):
+    """
+    Find the selected text in the document.
+
+    Differences in whitespace are ignored (selections copied from rendered
+    output often lose line breaks). Text that appears more than once is only
+    located when the caller says which occurrence was selected; patching the
+    first one by guess would edit the wrong place.
+
+    Args:
+        mdx: The full MDX document
+        selected_text: The text the user selected
+        occurrence: Optional 0-based index of the selected occurrence
+
+    Returns:
+        (start, end) character offsets, or None if the selection is not found,
+        is ambiguous, or the occurrence does not exist
+    """
+    selected_text = (selected_text or "").strip()
+    if not selected_text:
+        return None
+
+    pattern = r'\s+'.join(re.escape(word) for word in selected_text.split())
+    spans = [match.span() for match in re.finditer(pattern, mdx)]
+    if occurrence is None:
+        return spans[0] if len(spans) == 1 else None
+    if 0 <= occurrence < len(spans):
+        return spans[occurrence]
+    return None
+
+
+def split_sections(mdx: str) -> list:
+    """
+    Split a document into sections at markdown headings (ignoring code fences).
+
+    Returns:
+        List of (start, end, heading) tuples covering the whole document; text
+        before the first heading (e.g. front matter) has the heading ""
+    """
+    boundaries = [(0, "")]
+    in_fence = False
+    offset = 0
+    for line in mdx.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            in_fence = not in_fence
+        elif not in_fence:
+            match = _HEADING.match(stripped)
+            if match and offset > 0:
+                boundaries.append((offset, stripped))
+            elif match:
+                boundaries[0] = (0, stripped)
+        offset += len(line)
+
+    sections = []
+    for i, (start, heading) in enumerate(boundaries):
+        end = boundaries[i + 1][0] if i + 1 < len(boundaries) else len(mdx)
+        sections.append((start, end, heading))
+    return sections
+
+
+def build_outline(sections: list, current: int) -> str:
+    """Compact outline of the document's headings, marking the section being edited."""
+    lines = []
+    for i, (_, _, heading) in enumerate(sections):
+        if not heading:
+            continue
+        marker = "  <-- section being edited" if i == current else ""
+        lines.append(f"{heading}{marker}")
+    return "\n".join(lines)
+
+
+def apply_patch(mdx: str, start: int, end: int, replacement: str) -> str:
+    """Replace mdx[start:end] with the replacement text."""
+    return mdx[:start] + replacement + mdx[end:]
+
+
+def _parse_patch(text: str) -> str:
+    data = json.loads(text)
+    if not isinstance(data, dict) or not isinstance(data.get("replacement"), str):
+        raise ValueError("The patch has no replacement text")
+    return data["replacement"]
+
+
+async def refine_with_patch_async(mdx: str, selected_text: str, question: str, topic: str, main_topic: str,
+                                  reference_content: str = None, occurrence: int = None):
+    """
+    Refine only the selected span of an MDX document.
+
+    Args:
+        mdx: The full MDX document
+        selected_text: The text the user selected
+        question: The user's question or request
+        topic: The selected topic the document is about
+        main_topic: The main topic that the selected topic belongs to
+        reference_content: Optional crawled content to base the edit on
+        occurrence: Optional 0-based index of the selected occurrence, for
+            selections that appear more than once
+
+    Returns:
+        Dictionary with the updated document ("mdx") and the applied patch
+        ("patch": start, end, original, replacement), or None if the selection
+        cannot be located unambiguously in the document
+
+    Raises:
+        ValueError: If the LLM does not return a valid patch
+    """
+    span = locate_selection(mdx, selected_text, occurrence)
+    if span is None:
+        return None
+    start, end = span
+
+    sections = split_sections(mdx)
+    current = next(i for i, (s_start, s_end, _) in enumerate(sections) if s_start <= start < s_end)
+    section_start, section_end, _ = sections[current]
+    # A selection spanning several sections takes all of them
+    while section_end < end and current + 1 < len(sections):
+        section_end = sections[current + 1][1]
+        current += 1
+    section = mdx[section_start:section_end]
+    original = mdx[start:end]
+
+    reference = ""
+    if reference_content:
+        reference = f"""
+Additional information gathered for this edit:
+
+{reference_content}
+"""
+
+    prompt = f"""You are editing one part of an MDX document about "{topic}", which is part of the main topic "{main_topic}".
+
+Outline of the whole document:
+{build_outline(sections, current)}
+
+The section being edited:
+<section>
+{section}
+</section>
+
+The user selected this exact text inside the section:
+<selection>
+{original}
+</selection>
+
+User asks: {question}
+{reference}
+Return JSON with "replacement": the new text that replaces the selected text exactly (not the whole section).
+Keep the surrounding section's style, keep proper MDX formatting, and make sure the edit fits how
+"{topic}" relates to the main topic "{main_topic}". Do not wrap the replacement in code fences unless
+the selection itself is a code block."""
+
+    text = await generate_content_async(prompt, generation_config=GENERATION_CONFIG, prompt_type="refine")
+    replacement = _parse_patch(text)
+
+    return {
+        "mdx": apply_patch(mdx, start, end, replacement),
+        "patch": {
+            "start": start,
+            "end": end,
+            "original": original,
+            "replacement": replacement,
+        },
+    }
@@ -0,0 +1,190 @@
+"""
+Streaming variants of the MDX generation pipelines.
+
+Each generator yields (event, data) tuples:
+
+- ("progress", {"stage": ..., ...}) after each pipeline stage (currency check,
+  search, crawl) and when generation starts
+- ("token", {"text": ...}) for every completed piece of the cleaned MDX as Gemini
+  streams it; the tokens add up to the final document
+- ("done", {"mdx_content": ..., ...}) with the fully cleaned document and metadata
+- ("error", {"message": ...}) when the request cannot be completed
+
+The routers turn these into Server-Sent Events or a plain-text stream.
+"""
+
+import asyncio
+import os
+from app.services.gemini_llm import stream_content_async
+from app.services.crawler import (
+    MDXStreamCleaner, finalize_mdx, finalize_llm_only_mdx,
+    gather_single_topic_content_async, build_single_topic_prompt,
+    build_mdx_from_urls_prompt, build_llm_only_prompt,
+    crawl_urls_async, prepare_source_content_async
+)
+
+
+async def _with_progress(make_coro):
+    """
+    Run a coroutine that reports progress through a callback, yielding each
+    progress event as it happens and finally ("result", value).
+
+    Args:
+        make_coro: Callable taking the on_progress callback and returning the coroutine
+    """
+    queue = asyncio.Queue()
+
+    async def on_progress(stage, data):
+        await queue.put({"stage": stage, **data})
+
+    task = asyncio.create_task(make_coro(on_progress))
+    task.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            yield "progress", item
+        yield "result", task.result()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def _stable_prefix(text: str) -> str:
+    """
+    Return the part of a finalized partial document that later text can no longer
+    change: everything before its last blank line (the cleanup rules only look at
+    the text around a line break).
+    """
+    cut = text.rfind("\n\n")
+    return text[:cut] if cut > 0 else ""
+
+
+async def _stream_mdx(prompt: str, front_matter: str, prompt_type: str, done_data: dict,
+                      cache_intent: str = None, finalize=finalize_mdx):
+    """
+    Stream MDX tokens from Gemini, then emit the fully cleaned document.
+
+    The streamed text is the finalized document itself: the text cleaned so far is
+    run through the finalizer and only its completed paragraphs are emitted, and the
+    rest of the finalized document follows once the stream ends. The concatenated
+    tokens therefore equal the "done" document (and the non-streaming endpoints' output).
+    """
+    yield "progress", {"stage": "generating"}
+
+    cleaner = MDXStreamCleaner()
+    raw_chunks = []
+    cleaned = ""
+    sent = ""
+
+    async for chunk in stream_content_async(prompt, prompt_type=prompt_type, cache_intent=cache_intent):
+        raw_chunks.append(chunk)
+        text = cleaner.feed(chunk)
+        if not text:
+            continue
+        cleaned += text
+        ready = _stable_prefix(finalize(cleaned, front_matter))
+        if len(ready) > len(sent) and ready.startswith(sent):
+            yield "token", {"text": ready[len(sent):]}
+            sent = ready
+
+    mdx_content = finalize("".join(raw_chunks), front_matter)
+    if mdx_content.startswith(sent):
+        if len(mdx_content) > len(sent):
+            yield "token", {"text": mdx_content[len(sent):]}
+    else:
+        print("⚠️ Streamed MDX diverged from the finalized document; the done event has the correct text")
+    yield "done", {"mdx_content": mdx_content, **done_data}
+
+
+async def stream_single_topic_mdx(topic: str, main_topic: str = None, num_results: int = 2):
+    """
+    Streaming version of generate_single_topic_mdx_async.
+
+    Args:
+        topic: The selected topic (subtopic) to generate content for
+        main_topic: The main topic that the selected topic belongs to
+        num_results: Number of search results to use
+    """
+    gathered = None
+    async for event, data in _with_progress(
+        lambda on_progress: gather_single_topic_content_async(topic, main_topic, num_results, on_progress=on_progress)
+    ):
+        if event == "result":
+            gathered = data
+        else:
+            yield event, data
+
+    prompt, front_matter = build_single_topic_prompt(topic, main_topic, gathered["all_content"])
+    done_data = {
+        "selected_topic": topic,
+        "main_topic": main_topic,
+        "crawled_websites": gathered["crawled_websites"],
+        "used_llm_knowledge": gathered["has_current_info"]
+    }
+    async for item in _stream_mdx(prompt, front_matter, "final_mdx", done_data):
+        yield item
+
+
+async def stream_mdx_from_urls(urls: list, selected_topic: str, main_topic: str, use_llm_knowledge: bool = True):
+    """
+    Streaming version of generate_mdx_from_urls_async.
+
+    Args:
+        urls: List of URLs to crawl (1 to 5 URLs)
+        selected_topic: The subtopic to focus on
+        main_topic: The main topic that the selected topic belongs to
+        use_llm_knowledge: Whether to use the LLM's existing knowledge if crawling fails
+    """
+    os.environ["NODE_OPTIONS"] = "--no-warnings --no-deprecation"
+
+    yield "progress", {"stage": "crawl_started", "urls": urls}
+    scraped_data = await crawl_urls_async(urls)
+
+    crawled_websites = [
+        url for url, content in scraped_data.items()
+        if isinstance(content, str) and not content.startswith("Error scraping")
+    ]
+    yield "progress", {"stage": "crawl", "crawled_websites": crawled_websites}
+    all_content = await prepare_source_content_async(scraped_data, selected_topic, main_topic)
+
+    if not all_content.strip() and not use_llm_knowledge:
+        yield "error", {"message": "Could not extract valid content from any of the provided URLs"}
+        return
+
+    prompt, front_matter = build_mdx_from_urls_prompt(selected_topic, main_topic, all_content)
+    done_data = {
+        "urls": urls,
+        "selected_topic": selected_topic,
+        "main_topic": main_topic,
+        "crawled_websites": crawled_websites,
+        "used_llm_knowledge": use_llm_knowledge
+    }
+    async for item in _stream_mdx(prompt, front_matter, "final_mdx", done_data):
+        yield item
+
+
+async def stream_llm_only_mdx(selected_topic: str, main_topic: str):
+    """
+    Streaming version of generate_llm_only_mdx_async.
+
+    Args:
+        selected_topic: The subtopic to write about
+        main_topic: The main topic that the selected topic belongs to
+    """
+    prompt, front_matter = build_llm_only_prompt(selected_topic, main_topic)
+    done_data = {
+        "selected_topic": selected_topic,
+        "main_topic": main_topic,
+        "used_llm_knowledge": True
+    }
+    async for item in _stream_mdx(
+        prompt,
+        front_matter,
+        "llm_only",
+        done_data,
+        cache_intent=f"{selected_topic} | {main_topic}",
+        finalize=finalize_llm_only_mdx
+    ):
+        yield item
@@ -0,0 +1,187 @@
+"""
+Semantic cache for near-identical LLM requests.
+
+Callers describe the intent of a request with a short string (for example the
+search query, or "selected topic | main topic"). The first segment says what
+the content is about, so it must have the same terms: case, stopwords,
+punctuation, simple plurals and word order are ignored ("Lists in Python" and
+"Python list" match), except across directional connectives such as "to" and
+"for" ("SQL to NoSQL" is not "NoSQL to SQL", "Java for Python developers" is
+not "Python for Java developers"). The remaining segments (the main topic) only
+have to be similar: a previous response is reused when their embeddings are
+more similar than the configured threshold. Vectors live in a small in-memory NumPy matrix per prompt type,
+searched by brute force.
+"""
+
+import re
+import threading
+import time
+import numpy as np
+from app.config import settings
+from app.services.embeddings import HashingEmbedder
+from app.utils.text_search import tokenize
+
+EMBEDDING_DIM = 512
+
+# Connectives that give a phrase a direction; the terms on either side must not be swapped
+_DIRECTIONAL = re.compile(r"\b(to|for|from|into|vs|versus|than|over)\b")
+
+
+def _normalize_terms(segment: str) -> list:
+    terms = []
+    for term in tokenize(segment):
+        if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+def _head_key(segment: str) -> str:
+    # Terms are sorted within each stretch between directional connectives, which stay in place
+    parts = _DIRECTIONAL.split(segment.lower())
+    keys = [part if i % 2 else " ".join(sorted(set(_normalize_terms(part)))) for i, part in enumerate(parts)]
+    return " ".join(key for key in keys if key)
+
+
+def split_intent(text: str):
+    """
+    Split an intent into its term-matched head and its similarity-matched rest.
+
+    Returns:
+        (head, rest): the first segment's normalized terms, sorted except across
+        directional connectives ("sql to nosql"), and the remaining segments
+        normalized with normalize_intent ("" when the intent has a single segment)
+    """
+    head, _, rest = (text or "").partition("|")
+    return _head_key(head), normalize_intent(rest) if rest else ""
+
+
+def normalize_intent(text: str) -> str:
+    """
+    Normalize a request intent so trivial rewordings compare equal.
+
+    Lowercases, drops stopwords and punctuation, reduces simple plurals and sorts
+    the remaining terms ("Lists in Python" and "Python list" both become "list python").
+    Segments separated by "|" (e.g. selected topic | main topic) are normalized
+    independently so they are never mixed.
+    """
+    segments = []
+    for segment in (text or "").split("|"):
+        segments.append(" ".join(sorted(set(_normalize_terms(segment)))))
+    return " | ".join(segments)
+
+
+_intent_embedder = HashingEmbedder(dimension=EMBEDDING_DIM)
+
+
+def embed_intent(intent: str) -> np.ndarray:
+    """
+    Embed a normalized intent with feature hashing over words and character trigrams.
+
+    Returns:
+        A unit-length float32 vector
+    """
+    return _intent_embedder.embed_many([intent])[0]
+
+
+class SemanticCache:
+    """
+    Per-namespace nearest-neighbour cache of LLM responses.
+
+    Args:
+        threshold: Minimum cosine similarity for a hit
+        max_entries: Maximum entries kept per namespace (oldest are evicted)
+        ttl: Entry lifetime in seconds (None for no expiry)
+    """
+
+    def __init__(self, threshold: float = 0.9, max_entries: int = 1000, ttl: float = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # namespace -> {"heads": list, "vectors": ndarray, "responses": list, "times": list}
+        self._spaces = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _embed_rest(rest: str) -> np.ndarray:
+        # Single-segment intents have nothing to compare beyond the head
+        if not rest:
+            return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+        return embed_intent(rest)
+
+    def lookup(self, namespace: str, intent: str):
+        """
+        Find a cached response for an intent.
+
+        Returns:
+            The cached response, or None if no entry has the same head and a
+            similar enough rest
+        """
+        head, rest = split_intent(intent)
+        query = self._embed_rest(rest)
+        with self._lock:
+            space = self._spaces.get(namespace)
+            if not space or not space["responses"]:
+                return None
+
+            candidates = np.flatnonzero(np.asarray(space["heads"], dtype=object) == head)
+            if len(candidates) == 0:
+                return None
+            vectors = space["vectors"][candidates]
+            if rest:
+                scores = vectors @ query
+            else:
+                scores = np.where(vectors.any(axis=1), -1.0, 1.0)
+            if self.ttl is not None:
+                expired = np.asarray(space["times"])[candidates] < time.time() - self.ttl
+                scores[expired] = -1.0
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return space["responses"][candidates[best]]
+        return None
+
+    def store(self, namespace: str, intent: str, response: str):
+        """Add a response for an intent."""
+        head, rest = split_intent(intent)
+        vector = self._embed_rest(rest)
+        with self._lock:
+            space = self._spaces.setdefault(
+                namespace,
+                {"heads": [], "vectors": np.zeros((0, EMBEDDING_DIM), dtype=np.float32), "responses": [], "times": []}
+            )
+            space["heads"].append(head)
+            space["vectors"] = np.vstack([space["vectors"], vector[np.newaxis, :]])
+            space["responses"].append(response)
+            space["times"].append(time.time())
+
+            overflow = len(space["responses"]) - self.max_entries
+            if overflow > 0:
+                del space["heads"][:overflow]
+                space["vectors"] = space["vectors"][overflow:]
+                del space["responses"][:overflow]
+                del space["times"][:overflow]
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._spaces.clear()
+
+
+_cache = None
+
+
+def get_semantic_cache() -> SemanticCache:
+    """Return the process-wide semantic cache."""
+    global _cache
+    if _cache is None:
+        _cache = SemanticCache(
+            threshold=settings.semantic_cache_threshold,
+            max_entries=settings.semantic_cache_max_entries,
+            ttl=settings.llm_cache_ttl_seconds
+        )
+    return _cache
+
+
+def uses_semantic_cache(prompt_type: str = None) -> bool:
+    """Whether the semantic cache is enabled for this prompt type."""
+    return settings.semantic_cache_enabled and prompt_type in settings.semantic_cache_prompt_types
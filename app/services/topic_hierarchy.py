@@ -0,0 +1,100 @@
+"""
+Topic hierarchy generation for /search-topics.
+
+Gemini is asked for schema-constrained JSON (a list of {"topic", "subtopics"}
+objects), the response is parsed into a TopicHierarchyResponse, and parsed
+hierarchies are cached by query so trivially different spellings such as
+"Python lists" and "python  Lists " are answered without another LLM call (keys
+from app.utils.keys). Word order is kept in the key: "Java for Python developers"
+and "Python for Java developers" need different lesson plans. The semantic LLM
+cache keeps them apart too, since its keys keep terms on either side of
+directional words like "for" and "to" separate.
+"""
+
+import json
+from app.config import settings
+from app.models.schemas import TopicHierarchyResponse
+from app.services.gemini_llm import generate_content_async
+from app.utils.keys import make_key
+from app.utils.lru_cache import TTLCache
+
+TOPIC_HIERARCHY_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "topic": {"type": "string"},
+            "subtopics": {"type": "array", "items": {"type": "string"}},
+        },
+        "required": ["topic", "subtopics"],
+    },
+}
+
+GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": TOPIC_HIERARCHY_SCHEMA,
+}
+
+_hierarchies = None
+
+
+def _get_hierarchy_cache() -> TTLCache:
+    global _hierarchies
+    if _hierarchies is None:
+        _hierarchies = TTLCache(
+            maxsize=settings.topic_hierarchy_cache_entries,
+            ttl=settings.topic_hierarchy_cache_ttl_seconds
+        )
+    return _hierarchies
+
+
+def parse_topic_hierarchy(text: str) -> TopicHierarchyResponse:
+    """
+    Parse the LLM's JSON output into a TopicHierarchyResponse.
+
+    Accepts either a bare list of topics or an object with a "topics" list.
+
+    Raises:
+        ValueError: If the output is not a valid topic hierarchy
+    """
+    data = json.loads(text)
+    if isinstance(data, list):
+        data = {"topics": data}
+    hierarchy = TopicHierarchyResponse.model_validate(data)
+    # Drop empty entries the model occasionally emits
+    hierarchy.topics = [item for item in hierarchy.topics if item.topic.strip()]
+    if not hierarchy.topics:
+        raise ValueError("The topic hierarchy is empty")
+    return hierarchy
+
+
+async def generate_topic_hierarchy_async(query: str) -> TopicHierarchyResponse:
+    """
+    Generate (or fetch from the cache) the lesson-plan topic hierarchy for a query.
+
+    Args:
+        query: The user's search query
+
+    Returns:
+        The parsed topic hierarchy
+    """
+    key = make_key("topic_hierarchy", query)
+    cache = _get_hierarchy_cache()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached.model_copy(deep=True)
+
+    prompt = f"""
+    Given the following query: "{query}", generate a structured list of main topics and their respective subtopics suitable for a lesson plan.
+
+    Return a JSON list of objects, each with a "topic" (the main topic) and "subtopics" (a list of subtopic names).
+    """
+    text = await generate_content_async(
+        prompt,
+        generation_config=GENERATION_CONFIG,
+        prompt_type="topic_hierarchy",
+        cache_intent=query
+    )
+    hierarchy = parse_topic_hierarchy(text)
+    cache.set(key, hierarchy)
+    return hierarchy.model_copy(deep=True)
@@ -1,60 +1,150 @@
+import pinecone
 from pinecone import Pinecone, ServerlessSpec
+from pinecone.exceptions import NotFoundException, PineconeProtocolError
+from urllib3.exceptions import HTTPError as TransportError
 from app.config import settings
 # from langchain.vectorstores import Pinecone as PineconeStore
 # from langchain.embeddings.openai import OpenAIEmbeddings
 # from langchain_pinecone import PineconeVectorStore
 # from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Pinecone as PineconeStore
+# from langchain_community.vectorstores import Pinecone as PineconeStore
 # from langchain_community.embeddings import OpenAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
-
+# from langchain_openai import OpenAIEmbeddings
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.services.embeddings import embed_many, get_embedder
+from app.services.local_vectorstore import get_local_index
 
-# Instantiate Pinecone client
-pc = Pinecone(api_key=settings.pinecone_api_key)
 
+# Long-lived handles, created once per process (at startup or on first use) and
+# closed on shutdown: the Pinecone client with its connection pool, the index
+# handle and the index description, so ingestion calls make no setup round-trips.
+_pc = None
 _index = None
+_index_metadata = None
+_init_lock = threading.Lock()
+
+def _get_pinecone_client() -> Pinecone:
+    """Create the Pinecone client on first use, so the local backend works without Pinecone settings."""
+    global _pc
+    if _pc is None:
+        if not settings.pinecone_api_key:
+            raise ValueError("Pinecone API key is not set in the environment variables.")
+        _pc = Pinecone(api_key=settings.pinecone_api_key)
+    return _pc
+
+def init_vector_index():
+    """
+    Open the vector index selected by settings.vector_backend ("pinecone" or "local").
+
+    Safe to call more than once: the index is only opened the first time.
+    """
+    global _index, _index_metadata
+    with _init_lock:
+        if _index is not None:
+            return _index
+        if settings.vector_backend == "local":
+            _index = get_local_index()
+            _index_metadata = {"name": "local", "path": _index.path, "dimension": _index.dimension, "metric": "cosine"}
+        elif settings.vector_backend == "pinecone":
+            init_pinecone()
+        else:
+            raise ValueError(f"Unknown vector backend: {settings.vector_backend}")
+    return _index
+
+def get_vector_index():
+    """Return the open vector index, opening it on first use."""
+    return _index if _index is not None else init_vector_index()
+
+def get_index_metadata() -> dict:
+    """Return the cached description of the vector index (name, host, dimension, metric)."""
+    get_vector_index()
+    return dict(_index_metadata or {})
 
 def init_pinecone():
-    global _index
+    global _index, _index_metadata
+    pc = _get_pinecone_client()
     index_name = settings.pinecone_index_name
+    embedding_dimension = get_embedder().dimension
 
+    # One describe call both checks that the index exists and gives its host, so the
+    # index handle does not have to look it up again
     try:
-        # Check if index already exists
-        existing_indexes = [index.name for index in pc.list_indexes()]
-        if index_name not in existing_indexes:
+        description = pc.describe_index(index_name)
+    except NotFoundException:
+        try:
             pc.create_index(
                 name=index_name,
-                dimension=1536,  # ✅ Update this to match your actual embedding dimension
+                dimension=embedding_dimension,  # must match the configured embedding backend
                 metric="cosine",
                 spec=ServerlessSpec(
                     cloud="aws",
                     region="us-east-1"
                 )
             )
-    except Exception as e:
-        # Check if it's an "already exists" error (status code 409)
-        if hasattr(e, 'status') and e.status != 409:
-            raise  # Re-raise if it's not an "already exists" error
-        elif not hasattr(e, 'status'):
-            raise  # Re-raise if it doesn't have a status attribute
-
-    # Get the index using the new API
-    _index = pc.Index(index_name)
-
-
-
-def embed_and_store(chunks, namespace: str = "default"):
-    init_pinecone()
-    embeddings = OpenAIEmbeddings()
-    PineconeStore.from_texts(
-        chunks,
-        embedding=embeddings,
-        index_name=settings.pinecone_index_name,
-        namespace=namespace,
-    )
-    print("✅ Stored in Pinecone.")
+        except Exception as e:
+            # Check if it's an "already exists" error (status code 409)
+            if getattr(e, 'status', None) != 409:
+                raise
+        description = pc.describe_index(index_name)
+
+    _index_metadata = {
+        "name": index_name,
+        "host": description.host,
+        "dimension": description.dimension,
+        "metric": description.metric,
+    }
+    if description.dimension != embedding_dimension:
+        print(f"⚠️ Pinecone index {index_name} has dimension {description.dimension}, "
+              f"but the {settings.embedding_backend} embeddings have {embedding_dimension}")
 
-def upsert_embeddings(vectors: list[dict]):
+    _index = pc.Index(host=description.host)
+
+def close_vector_index():
+    """Release the vector index handles (called on application shutdown)."""
+    global _pc, _index, _index_metadata
+    with _init_lock:
+        if _index is not None:
+            close = getattr(_index, "close", None)
+            if close is not None:
+                close()
+        _pc = None
+        _index = None
+        _index_metadata = None
+
+
+def embed_and_store(chunks, namespace: str = "default", metadata: dict = None):
+    """
+    Embed text chunks in batches and upsert them into the vector index.
+
+    Returns:
+        Upsert throughput stats (see upsert_embeddings_batched)
+
+    Chunk ids are derived from the text, so storing the same chunk twice overwrites it.
+
+    Args:
+        chunks: Texts to store
+        namespace: Pinecone namespace
+        metadata: Optional metadata added to every chunk (e.g. source_url)
+    """
+    chunks = [chunk for chunk in chunks if chunk and chunk.strip()]
+    matrix = embed_many(chunks)
+    vectors = [
+        {
+            "id": hashlib.sha1(chunk.encode("utf-8")).hexdigest(),
+            "values": row.tolist(),
+            "metadata": {**(metadata or {}), "text": chunk},
+        }
+        for chunk, row in zip(chunks, matrix)
+    ]
+    stats = upsert_embeddings_batched(vectors, namespace=namespace)
+    print(f"✅ Stored {len(vectors)} chunks in the {settings.vector_backend} vector index.")
+    return stats
+
+def upsert_embeddings(vectors: list[dict], namespace: str = None):
     """
     vectors: list of dicts like:
     {
@@ -63,22 +153,138 @@ def upsert_embeddings(vectors: list[dict]):
         'metadata': { 'text': str, 'source_url': str, ... }
     }
     """
-    if not _index:
-        raise RuntimeError("Pinecone index not initialized.")
-    _index.upsert(vectors=vectors)
+    index = get_vector_index()
+    if namespace:
+        index.upsert(vectors=vectors, namespace=namespace)
+    else:
+        index.upsert(vectors=vectors)
+
+def _vector_size(vector: dict) -> int:
+    """Approximate size of a vector in an upsert request body, in bytes."""
+    return len(json.dumps(vector, separators=(",", ":"), default=str))
+
+def batch_vectors(vectors: list[dict], max_count: int, max_bytes: int):
+    """
+    Split vectors into batches of at most max_count vectors and about max_bytes of payload.
+
+    A single vector larger than max_bytes gets a batch of its own.
+    """
+    batch, batch_bytes = [], 0
+    for vector in vectors:
+        size = _vector_size(vector)
+        if batch and (len(batch) >= max_count or batch_bytes + size > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(vector)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+# Failures worth retrying besides 408/429/5xx responses: timeouts, dropped connections and
+# transport errors (older Pinecone clients raise urllib3 errors, newer ones their own)
+_TRANSIENT_ERRORS = (TimeoutError, ConnectionError, PineconeProtocolError, TransportError) + tuple(
+    error for error in (getattr(pinecone, "PineconeConnectionError", None),) if error is not None
+)
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a failed upsert may succeed if retried (rate limits, server errors, timeouts)."""
+    if isinstance(error, _TRANSIENT_ERRORS):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and (status in (408, 429) or status >= 500)
+
+def _upsert_with_retry(batch: list[dict], namespace: str, max_retries: int, backoff_base: float) -> int:
+    """
+    Upsert one batch, retrying transient failures with exponential backoff. Other
+    errors (e.g. invalid vectors or credentials) are raised immediately.
+    Returns the number of retries.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            upsert_embeddings(batch, namespace=namespace)
+            return attempt
+        except Exception as e:
+            if attempt == max_retries or not _is_transient(e):
+                raise
+            delay = backoff_base * (2 ** attempt)
+            print(f"⚠️ Upsert of {len(batch)} vectors failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
 
-def query_similar(vector: list[float], top_k: int = 2):
+def upsert_embeddings_batched(vectors: list[dict], namespace: str = None, batch_size: int = None,
+                              max_batch_bytes: int = None, parallelism: int = None) -> dict:
+    """
+    Upsert vectors in size-limited batches sent concurrently.
+
+    Batches stay under the index's request limits (settings.vector_upsert_batch_size
+    vectors and settings.vector_upsert_max_bytes of payload), up to
+    settings.vector_upsert_parallelism batches are in flight at once, and batches
+    that fail transiently (rate limits, server errors, timeouts) are retried with
+    exponential backoff.
+
+    Args:
+        vectors: Vectors in the upsert_embeddings format
+        namespace: Namespace to upsert into
+        batch_size: Override for the maximum vectors per batch
+        max_batch_bytes: Override for the maximum payload per batch
+        parallelism: Override for the number of concurrent batches
+
+    Returns:
+        Dictionary with the number of vectors, batches and retries, the elapsed
+        seconds and the throughput in vectors per second
+
+    Raises:
+        Exception: The last error of a batch that still failed after all retries
+    """
+    started_at = time.perf_counter()
+    batch_size = batch_size or settings.vector_upsert_batch_size
+    max_batch_bytes = max_batch_bytes or settings.vector_upsert_max_bytes
+    parallelism = parallelism or settings.vector_upsert_parallelism
+    # The local index is in-process and serializes writes, so one call is fastest
+    if settings.vector_backend == "local":
+        batch_size, max_batch_bytes, parallelism = len(vectors) or 1, float("inf"), 1
+
+    batches = list(batch_vectors(vectors, batch_size, max_batch_bytes))
+    retries = 0
+    if len(batches) == 1 or parallelism == 1:
+        for batch in batches:
+            retries += _upsert_with_retry(batch, namespace, settings.vector_upsert_max_retries,
+                                          settings.vector_upsert_backoff_base)
+    elif batches:
+        with ThreadPoolExecutor(max_workers=min(parallelism, len(batches))) as executor:
+            futures = [
+                executor.submit(_upsert_with_retry, batch, namespace, settings.vector_upsert_max_retries,
+                                settings.vector_upsert_backoff_base)
+                for batch in batches
+            ]
+            retries = sum(future.result() for future in futures)
+
+    elapsed = time.perf_counter() - started_at
+    stats = {
+        "vectors": len(vectors),
+        "batches": len(batches),
+        "retries": retries,
+        "seconds": round(elapsed, 3),
+        "vectors_per_second": round(len(vectors) / elapsed, 1) if elapsed > 0 else None,
+    }
+    if vectors:
+        print(f"📤 Upserted {stats['vectors']} vectors in {stats['batches']} batches "
+              f"({stats['vectors_per_second']} vectors/s, {retries} retries)")
+    return stats
+
+def query_similar(vector: list[float], top_k: int = 2, namespace: str = None):
     """
     Returns top_k most similar items to the input vector.
     Each result has: id, text (from metadata), score.
     """
-    if not _index:
-        raise RuntimeError("Pinecone index not initialized.")
-
-    res = _index.query(
+    index = get_vector_index()
+    query_args = {"namespace": namespace} if namespace else {}
+    res = index.query(
         vector=vector,
         top_k=top_k,
-        include_metadata=True
+        include_metadata=True,
+        **query_args
     )
 
     return [
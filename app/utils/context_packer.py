@@ -0,0 +1,163 @@
+"""
+Token-budgeted prompt context assembly.
+
+Crawled sources are split into passages, ranked against the topic/question with
+BM25, and the best passages are packed into a fixed token budget with a cap per
+source. Selected passages are emitted in their original order so the context
+still reads naturally.
+"""
+
+import re
+from app.utils.text_search import BM25Index
+
+# Rough average for English prose and markdown with Gemini/GPT-style tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a piece of text."""
+    if not text:
+        return 0
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_passages(text: str, max_tokens: int = 300) -> list:
+    """
+    Split text into passages of roughly max_tokens tokens.
+
+    Paragraphs (separated by blank lines) are merged until the passage size is
+    reached; paragraphs larger than that are split on sentence boundaries, and
+    as a last resort cut by length.
+
+    Args:
+        text: The text to split
+        max_tokens: Target maximum tokens per passage
+
+    Returns:
+        List of passages in document order
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for paragraph in re.split(r'\n\s*\n', text or ""):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+            while len(sentence) > max_chars:
+                pieces.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if sentence:
+                pieces.append(sentence)
+
+    passages = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def _rank(passages: list, query: str) -> list:
+    """
+    Return passage indexes, best match for the query first.
+
+    Passages that do not match the query at all keep their document order after
+    the matching ones, so the beginning of each source is preferred.
+    """
+    index = BM25Index()
+    for i, (_, text) in enumerate(passages):
+        index.add_document(i, text)
+    scores = {r["doc_id"]: r["score"] for r in index.search(query, limit=len(passages))}
+    return sorted(range(len(passages)), key=lambda i: (-scores.get(i, 0.0), i))
+
+
+def _select(sources: dict, query: str, budget_tokens: int, source_cap_tokens: int, passage_tokens: int) -> dict:
+    """
+    Choose passages greedily by relevance within the budget and per-source cap.
+
+    Returns:
+        Dictionary mapping each source to its selected passages in document order
+    """
+    passages = []  # (source, text)
+    for name, text in sources.items():
+        for passage in split_passages(text, passage_tokens):
+            passages.append((name, passage))
+
+    used = 0
+    used_per_source = {}
+    selected = []
+    for i in _rank(passages, query):
+        name, text = passages[i]
+        tokens = estimate_tokens(text)
+        if used + tokens > budget_tokens or used_per_source.get(name, 0) + tokens > source_cap_tokens:
+            continue
+        selected.append(i)
+        used += tokens
+        used_per_source[name] = used_per_source.get(name, 0) + tokens
+
+    # Restore source and document order
+    by_source = {name: [] for name in sources}
+    for i in sorted(selected):
+        name, text = passages[i]
+        by_source[name].append(text)
+    return by_source
+
+
+def pack_context(sources: dict, query: str, budget_tokens: int, source_cap_tokens: int = None,
+                 passage_tokens: int = 300) -> str:
+    """
+    Pack the most relevant passages from several sources into a token budget.
+
+    Args:
+        sources: Dictionary mapping source names (URLs) to their text
+        query: The topic/question the passages are ranked against
+        budget_tokens: Maximum tokens for the whole context
+        source_cap_tokens: Maximum tokens taken from any single source
+        passage_tokens: Target passage size used when splitting sources
+
+    Returns:
+        The packed context, formatted as "Content from {source}:\n..." blocks
+    """
+    sources = {name: text for name, text in sources.items() if text and text.strip()}
+    if not sources:
+        return ""
+    source_cap_tokens = source_cap_tokens or budget_tokens
+
+    # Fast path: everything already fits
+    sizes = {name: estimate_tokens(text) for name, text in sources.items()}
+    if sum(sizes.values()) <= budget_tokens and max(sizes.values()) <= source_cap_tokens:
+        return "".join(f"Content from {name}:\n{text}\n\n" for name, text in sources.items())
+
+    by_source = _select(sources, query, budget_tokens, source_cap_tokens, passage_tokens)
+    return "".join(
+        f"Content from {name}:\n" + "\n\n".join(texts) + "\n\n"
+        for name, texts in by_source.items()
+        if texts
+    )
+
+
+def select_passages(text: str, query: str, budget_tokens: int, passage_tokens: int = 300) -> str:
+    """
+    Trim a single text to its most relevant passages within a token budget.
+
+    Args:
+        text: The text to trim
+        query: The topic/question the passages are ranked against
+        budget_tokens: Maximum tokens to keep
+        passage_tokens: Target passage size used when splitting
+
+    Returns:
+        The selected passages in document order (the text unchanged if it fits)
+    """
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    by_source = _select({"text": text}, query, budget_tokens, budget_tokens, passage_tokens)
+    return "\n\n".join(by_source["text"])
@@ -0,0 +1,22 @@
+"""
+Normalized keys for caching and coalescing requests.
+
+Strings are case-folded and whitespace-collapsed so trivially different payloads
+("Python Lists " vs "python lists") map to the same key. Word order is kept.
+"""
+
+import re
+
+
+def normalize_text(text: str) -> str:
+    """Case-fold a string and collapse its whitespace."""
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+
+def make_key(kind: str, *parts) -> tuple:
+    """
+    Build a key from a request kind (e.g. an endpoint family) and its payload.
+
+    String parts are normalized with normalize_text; other parts are kept as is.
+    """
+    return (kind, *(normalize_text(part) if isinstance(part, str) else part for part in parts))
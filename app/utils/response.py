@@ -1,6 +1,7 @@
 # app/utils/response.py
 
-from fastapi.responses import JSONResponse
+import json
+from fastapi.responses import JSONResponse, StreamingResponse
 
 def success_response(data=None, message="Success"):
     return JSONResponse(
@@ -21,3 +22,46 @@ def error_response(message="An error occurred", status_code=400, details=None):
             "details": details,
         },
     )
+
+def sse_event(event: str, data) -> str:
+    """Format a single Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    """
+    Stream (event, data) tuples from an async generator as Server-Sent Events.
+    Exceptions raised by the generator are sent as a final "error" event.
+    """
+    async def body():
+        try:
+            async for event, data in events:
+                yield sse_event(event, data)
+        except Exception as e:
+            yield sse_event("error", {"message": str(e)})
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def raw_stream_response(events):
+    """
+    Stream only the MDX tokens from an async generator of (event, data) tuples
+    as plain text. Errors are written to the stream as "Error: ..." text.
+    """
+    async def body():
+        try:
+            async for event, data in events:
+                if event == "token":
+                    yield data["text"]
+                elif event == "error":
+                    yield f"Error: {data['message']}"
+        except Exception as e:
+            yield f"Error: {e}"
+
+    return StreamingResponse(
+        body(),
+        media_type="text/plain",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,264 @@
+"""
+Lightweight lexical search helpers (tokenizer + BM25 inverted index).
+
+These helpers are pure Python and have no dependency on the app settings, so
+they can be used both for the persistent local search index over crawled pages
+and for ranking passages in memory.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+# Smallest change log worth compacting into the index file
+_COMPACT_MIN_ENTRIES = 256
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#._-]*")
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have how in into is it its of on or
+that the their this to was were what when where which why with within
+""".split())
+
+
+def tokenize(text: str) -> list:
+    """
+    Split text into lowercase search terms, dropping stopwords.
+
+    Args:
+        text: The text to tokenize
+
+    Returns:
+        List of terms in document order
+    """
+    if not text:
+        return []
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        token = token.strip("._-")
+        if token and token not in STOPWORDS:
+            terms.append(token)
+    return terms
+
+
+class BM25Index:
+    """
+    Incremental BM25 inverted index keyed by document id (e.g. a URL).
+
+    Documents can be added, replaced and removed at any time; the postings and
+    corpus statistics are updated in place. When a path is given the index can
+    be persisted to and reloaded from a JSON file. Changes are saved by
+    appending them to a log next to the file ({path}.log), which is compacted
+    into the file once it has as many entries as the index has documents, so
+    saving costs time in the size of the change rather than the corpus.
+    """
+
+    def __init__(self, path: str = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._docs = {}      # doc_id -> {"length": int, "terms": {term: tf}, "meta": dict}
+        self._postings = {}  # term -> {doc_id: tf}
+        self._total_length = 0
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._pending = []  # changes not yet written to the log
+        self._log_entries = 0
+
+        if path and (os.path.exists(path) or os.path.exists(self._log_path())):
+            self.load()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._docs
+
+    def _log_path(self) -> str:
+        return f"{self.path}.log"
+
+    def doc_ids(self) -> list:
+        """Return the ids of all indexed documents."""
+        with self._lock:
+            return list(self._docs)
+
+    def add_document(self, doc_id: str, text: str, meta: dict = None):
+        """
+        Add or replace a document in the index.
+
+        Args:
+            doc_id: Unique identifier of the document
+            text: The document text
+            meta: Optional metadata stored alongside the document
+        """
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove(doc_id)
+            if not terms:
+                self._log({"op": "remove", "id": doc_id})
+                return
+            doc = {"length": sum(terms.values()), "terms": dict(terms), "meta": meta or {}}
+            self._insert(doc_id, doc)
+            self._log({"op": "add", "id": doc_id, "doc": doc})
+            self._dirty = True
+
+    def _insert(self, doc_id, doc):
+        self._docs[doc_id] = doc
+        for term, tf in doc["terms"].items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._total_length += doc["length"]
+
+    def remove_document(self, doc_id: str):
+        """Remove a document from the index if present."""
+        with self._lock:
+            if doc_id in self._docs:
+                self._remove(doc_id)
+                self._log({"op": "remove", "id": doc_id})
+
+    def _log(self, entry: dict):
+        # Only persistent indexes keep a record of their changes
+        if self.path:
+            self._pending.append(entry)
+
+    def _remove(self, doc_id):
+        doc = self._docs.pop(doc_id, None)
+        if not doc:
+            return
+        for term in doc["terms"]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= doc["length"]
+        self._dirty = True
+
+    def get_meta(self, doc_id: str) -> dict:
+        """Return the metadata stored for a document (empty dict if unknown)."""
+        doc = self._docs.get(doc_id)
+        return dict(doc["meta"]) if doc else {}
+
+    def search(self, query: str, limit: int = 5, min_coverage: float = 0.0) -> list:
+        """
+        Rank documents against a query using BM25.
+
+        Args:
+            query: The search query
+            limit: Maximum number of results to return
+            min_coverage: Minimum fraction of distinct query terms a document must contain
+
+        Returns:
+            List of dicts with doc_id, score and coverage, best match first
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self._docs)
+            if not n_docs:
+                return []
+            avg_length = self._total_length / n_docs
+
+            scores = {}
+            matched = Counter()
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc_id, tf in postings.items():
+                    length = self._docs[doc_id]["length"]
+                    norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * norm
+                    matched[doc_id] += 1
+
+        results = []
+        for doc_id, score in scores.items():
+            coverage = matched[doc_id] / len(query_terms)
+            if coverage >= min_coverage:
+                results.append({"doc_id": doc_id, "score": score, "coverage": coverage})
+
+        results.sort(key=lambda r: r["score"], reverse=True)
+        return results[:limit]
+
+    def save(self, force: bool = False):
+        """
+        Persist changes made since the last save (no-op if nothing changed).
+
+        Changes are appended to the log; the full index is written instead when
+        force is set, the file does not exist yet or the log has grown as large
+        as the index. The full file
+        is written to a temporary path and then atomically renamed so a crash
+        never leaves a truncated index behind.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if not (self._dirty or force):
+                return
+            # Without the index file there is no base for the log (e.g. a path set after indexing)
+            compact = force or not os.path.exists(self.path)
+            if compact or self._log_entries + len(self._pending) >= max(_COMPACT_MIN_ENTRIES, len(self._docs)):
+                self._compact()
+                return
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self._log_path(), "a", encoding="utf-8") as f:
+                for entry in self._pending:
+                    f.write(json.dumps(entry) + "\n")
+            self._log_entries += len(self._pending)
+            self._pending = []
+            self._dirty = False
+
+    def _compact(self):
+        data = {"k1": self.k1, "b": self.b, "docs": self._docs}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self._log_path()):
+            os.remove(self._log_path())
+        self._pending = []
+        self._log_entries = 0
+        self._dirty = False
+
+    def load(self):
+        """Load the index from its JSON file and change log, rebuilding the postings."""
+        data = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        with self._lock:
+            self.k1 = data.get("k1", self.k1)
+            self.b = data.get("b", self.b)
+            self._docs = {}
+            self._postings = {}
+            self._total_length = 0
+            for doc_id, doc in data.get("docs", {}).items():
+                self._insert(doc_id, doc)
+            self._pending = []
+            self._log_entries = 0
+            self._dirty = False
+
+            complete = True
+            if os.path.exists(self._log_path()):
+                with open(self._log_path(), "r", encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            complete = False  # A write cut short by a crash
+                            break
+                        self._remove(entry["id"])
+                        if entry["op"] == "add":
+                            self._insert(entry["id"], entry["doc"])
+                        self._log_entries += 1
+            self._dirty = False
+            if not complete:
+                # Appending after a torn entry would hide everything written after it
+                self._compact()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Unit tests for coalescing identical in-flight requests.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.coalescer import RequestCoalescer
+from app.utils.keys import make_key
+
+
+class TestRequestCoalescer(unittest.TestCase):
+    """Test cases for the request coalescer."""
+
+    def test_identical_requests_share_one_run(self):
+        """Concurrent identical requests run the computation once."""
+        coalescer = RequestCoalescer()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"mdx_content": "# Lists"}
+
+        async def main():
+            keys = [make_key("single_topic", "Python Lists", "Python", 2),
+                    make_key("single_topic", " python  lists", "python", 2)]
+            return await asyncio.gather(*[coalescer.run(keys[i % 2], work) for i in range(10)])
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r == {"mdx_content": "# Lists"} for r in results))
+        self.assertEqual(coalescer.stats()["coalesced"], 9)
+        self.assertEqual(coalescer.stats()["in_flight"], 0)
+
+    def test_cancelled_waiter_does_not_cancel_shared_work(self):
+        """A disconnecting client leaves the computation running for the others."""
+        coalescer = RequestCoalescer()
+
+        async def work():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        async def main():
+            first = asyncio.ensure_future(coalescer.run("k", work))
+            second = asyncio.ensure_future(coalescer.run("k", work))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        self.assertEqual(asyncio.run(main()), "done")
+
+    def test_errors_propagate_and_are_not_cached(self):
+        """Failures reach every waiter and the next request retries."""
+        coalescer = RequestCoalescer(result_ttl=60)
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await asyncio.sleep(0)
+            raise RuntimeError("boom")
+
+        async def main():
+            results = await asyncio.gather(coalescer.run("k", failing), coalescer.run("k", failing),
+                                           return_exceptions=True)
+            self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+            self.assertEqual(len(calls), 1)
+            return await coalescer.run("k", lambda: asyncio.sleep(0, result="ok"))
+
+        self.assertEqual(asyncio.run(main()), "ok")
+        self.assertEqual(asyncio.run(coalescer.run("k", failing)), "ok")
+
+    def test_result_cache_respects_predicate(self):
+        """Results rejected by cache_result are not kept."""
+        coalescer = RequestCoalescer(result_ttl=60)
+        is_ok = lambda result: "error" not in result
+        asyncio.run(coalescer.run("bad", lambda: asyncio.sleep(0, result={"error": "x"}), is_ok))
+        asyncio.run(coalescer.run("good", lambda: asyncio.sleep(0, result={"mdx_content": "y"}), is_ok))
+        self.assertEqual(coalescer.stats()["started"], 2)
+        asyncio.run(coalescer.run("bad", lambda: asyncio.sleep(0, result={"error": "x"}), is_ok))
+        asyncio.run(coalescer.run("good", lambda: asyncio.sleep(0, result={"mdx_content": "y"}), is_ok))
+        self.assertEqual(coalescer.stats()["started"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Unit tests for context caching of refinement prompts (local stand-in backend).
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config import settings
+from app.services import context_cache, gemini_llm
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+class _Model:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_content_async(self, prompt):
+        self.prompts.append(prompt)
+        return _Response(f"answer {len(self.prompts)}")
+
+
+class TestContextCache(unittest.TestCase):
+    """Test cases for reusing a cached context across refinement turns."""
+
+    def setUp(self):
+        self.model = _Model()
+        self.patches = [
+            patch.object(settings, "context_cache_backend", "local"),
+            patch.object(settings, "context_cache_min_tokens", 10),
+            patch.object(settings, "llm_cache_enabled", False),
+            patch.object(context_cache, "_backend", None),
+            patch.object(gemini_llm, "get_model", lambda *args, **kwargs: self.model),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def test_context_is_reused_across_turns(self):
+        """The second question on the same document reuses the cached context."""
+        document = "# Lists\n\n" + "Lists are ordered collections. " * 20
+
+        async def run():
+            first = await gemini_llm.generate_with_context_async(document, "Question 1", prompt_type="refine")
+            second = await gemini_llm.generate_with_context_async(document, "Question 2", prompt_type="refine")
+            return first, second
+
+        self.assertEqual(asyncio.run(run()), ("answer 1", "answer 2"))
+        backend = context_cache.get_context_cache()
+        self.assertEqual((backend.created, backend.hits), (1, 1))
+        self.assertEqual(self.model.prompts[1], document + "Question 2")
+
+    def test_crawled_sources_do_not_fork_the_context(self):
+        """Refining with crawling caches only the document; each turn's crawled passages go in the prompt."""
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.routers import rag
+
+        pages = iter(["Decorators wrap functions.", "Closures capture variables."])
+
+        async def fake_crawl(urls):
+            return {url: next(pages) for url in urls}
+
+        document = "# Lists\n\n" + "Lists are ordered collections. " * 20
+        client = TestClient(app)
+        with patch.object(rag, "find_relevant_websites", lambda **kwargs: ["https://example.com/page"]), \
+                patch.object(rag, "crawl_urls_async", fake_crawl):
+            for question in ("What about decorators?", "And closures?"):
+                response = client.post("/rag/refine-with-crawling", json={
+                    "mdx": document, "selected_text": "Lists", "selected_topic": "Lists",
+                    "main_topic": "Python", "question": question
+                })
+                self.assertEqual(response.json()["status"], "success")
+
+        backend = context_cache.get_context_cache()
+        self.assertEqual((backend.created, backend.hits), (1, 1))
+        self.assertIn("Closures capture variables.", self.model.prompts[1])
+
+    def test_small_context_is_sent_in_full(self):
+        """Contexts below the minimum size bypass the context cache."""
+        answer = asyncio.run(gemini_llm.generate_with_context_async("tiny", " question", prompt_type="refine"))
+        self.assertEqual(answer, "answer 1")
+        self.assertEqual(self.model.prompts, ["tiny question"])
+        self.assertIsNone(context_cache._backend)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Unit tests for token-budgeted prompt context packing.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.utils.context_packer import estimate_tokens, pack_context, select_passages, split_passages
+
+
+def _paragraphs(prefix, count, words=60):
+    return "\n\n".join(f"{prefix} paragraph {i}. " + " ".join(["filler"] * words) for i in range(count))
+
+
+class TestContextPacker(unittest.TestCase):
+    """Test cases for passage splitting and packing."""
+
+    def test_small_sources_are_kept_verbatim(self):
+        """Sources that fit the budget use the original format unchanged."""
+        packed = pack_context({"a": "alpha text", "b": "beta text"}, "alpha", budget_tokens=1000)
+        self.assertEqual(packed, "Content from a:\nalpha text\n\nContent from b:\nbeta text\n\n")
+
+    def test_split_respects_passage_size(self):
+        """Passages stay within the requested size."""
+        passages = split_passages(_paragraphs("x", 20), max_tokens=100)
+        self.assertGreater(len(passages), 1)
+        for passage in passages:
+            self.assertLessEqual(len(passage), 400)
+
+    def test_budget_and_relevance(self):
+        """Packing stays within budget and prefers passages matching the query."""
+        text = _paragraphs("generic", 30) + "\n\nDecorators wrap functions in Python.\n\n" + _paragraphs("more", 30)
+        packed = pack_context({"https://example.com": text}, "python decorators", budget_tokens=300,
+                              passage_tokens=100)
+        self.assertLessEqual(estimate_tokens(packed), 320)
+        self.assertIn("Decorators wrap functions", packed)
+        self.assertTrue(packed.startswith("Content from https://example.com:\n"))
+
+    def test_per_source_cap(self):
+        """No single source takes more than its cap."""
+        sources = {"a": _paragraphs("a", 40), "b": _paragraphs("b", 40)}
+        packed = pack_context(sources, "paragraph", budget_tokens=2000, source_cap_tokens=500, passage_tokens=100)
+        self.assertIn("Content from a:", packed)
+        self.assertIn("Content from b:", packed)
+        self.assertLessEqual(estimate_tokens(packed), 1050)
+
+    def test_select_passages_keeps_order(self):
+        """Selected passages keep their document order."""
+        text = "first topic alpha\n\n" + _paragraphs("noise", 20) + "\n\nsecond topic alpha"
+        selected = select_passages(text, "alpha", budget_tokens=50, passage_tokens=20)
+        self.assertLess(selected.index("first"), selected.index("second"))
+
+
+if __name__ == "__main__":
+    unittest.main()
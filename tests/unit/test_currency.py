@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the currency-check heuristics and memoization.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import AsyncMock, patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services import currency
+
+
+class TestCurrency(unittest.TestCase):
+    """Test cases for deciding whether a topic needs crawling."""
+
+    def setUp(self):
+        currency._memo = None
+
+    def test_heuristics(self):
+        """Recency signals mean crawl, stable fundamentals do not, others are undecided."""
+        self.assertFalse(currency.classify_currency("Latest features", "Python"))
+        self.assertFalse(currency.classify_currency("What's in 3.12", "Python"))
+        self.assertFalse(currency.classify_currency("Hooks", "React 19"))
+        self.assertTrue(currency.classify_currency("Binary search", "Algorithms"))
+        self.assertIsNone(currency.classify_currency("Decorators", "Python"))
+
+    def test_course_numbering_is_not_a_version(self):
+        """"Part 1", "Lesson 2" and the like do not look like product versions."""
+        self.assertIsNone(currency.classify_currency("Part 1: Decorators", "Python"))
+        self.assertIsNone(currency.classify_currency("Lesson 2", "Python"))
+        self.assertIsNone(currency.classify_currency("Chapter 3 - Closures", "JavaScript"))
+        self.assertIsNone(currency.classify_currency("Step 4", "Django"))
+        self.assertFalse(currency.classify_currency("Part 1", "Angular 17"))
+
+    def test_stable_topics_match_whole_words_of_the_subtopic(self):
+        """Only the selected topic, matched on word boundaries, can mark a topic stable."""
+        self.assertTrue(currency.classify_currency("Sorting", "Python"))
+        self.assertTrue(currency.classify_currency("Hash tables", "Python"))
+        self.assertIsNone(currency.classify_currency("Decorators", "Algorithms"))
+        self.assertIsNone(currency.classify_currency("Server actions", "Design patterns in Next.js"))
+        self.assertIsNone(currency.classify_currency("Sortingjs", "JavaScript"))
+        self.assertIsNone(currency.classify_currency("Ancientdb client", "Databases"))
+
+    def test_llm_decision_is_memoized(self):
+        """Undecided topics ask the LLM once per (topic, main topic)."""
+        llm = AsyncMock(return_value="YES")
+        with patch.object(currency, "generate_content_async", llm):
+            self.assertTrue(asyncio.run(currency.check_currency_async("Decorators", "Python")))
+            self.assertTrue(asyncio.run(currency.check_currency_async("decorators", "python")))
+        self.assertEqual(llm.await_count, 1)
+
+    def test_heuristic_skips_llm(self):
+        """Topics the heuristics can decide never reach the LLM."""
+        llm = AsyncMock(return_value="YES")
+        with patch.object(currency, "generate_content_async", llm):
+            self.assertFalse(asyncio.run(currency.check_currency_async("Latest release", "Django")))
+        llm.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the content-hash embedding cache.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services import embeddings
+from app.services.embedding_cache import EmbeddingCache, embedding_key
+from app.services.embeddings import HashingEmbedder
+
+
+class CountingEmbedder(HashingEmbedder):
+    """Hashing embedder that records every text it embeds."""
+
+    def __init__(self):
+        super().__init__(dimension=64)
+        self.seen = []
+
+    def embed_many(self, texts):
+        self.seen.extend(texts)
+        return super().embed_many(texts)
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    """Test cases for the two-tier embedding cache."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "embeddings.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_normalizes_text_and_depends_on_model(self):
+        """Whitespace differences share a key; different models do not."""
+        self.assertEqual(embedding_key("m", "Python  lists\n"), embedding_key("m", "Python lists"))
+        self.assertNotEqual(embedding_key("m", "Python lists"), embedding_key("n", "Python lists"))
+
+    def test_vectors_survive_restart_as_float16(self):
+        """Vectors are read back from disk by a new cache instance."""
+        vector = np.random.default_rng(0).standard_normal(64).astype(np.float32)
+        EmbeddingCache(self.path).set_many([("k", vector)])
+
+        found = EmbeddingCache(self.path).get_many(["k", "missing"])
+        self.assertEqual(list(found), ["k"])
+        self.assertEqual(found["k"].dtype, np.float32)
+        np.testing.assert_allclose(found["k"], vector, atol=1e-2)
+
+    def test_embed_many_only_embeds_misses(self):
+        """Cached chunks (and duplicates within a call) never reach the backend."""
+        embedder = CountingEmbedder()
+        cache = EmbeddingCache(self.path)
+        with patch.object(embeddings, "get_embedder", return_value=embedder), \
+                patch.object(embeddings, "get_embedding_cache", return_value=cache):
+            first = embeddings.embed_many(["alpha chunk", "beta chunk", "alpha chunk"])
+            second = embeddings.embed_many(["beta  chunk", "gamma chunk"])
+
+        self.assertEqual(embedder.seen, ["alpha chunk", "beta chunk", "gamma chunk"])
+        self.assertEqual(first.shape, (3, 64))
+        np.testing.assert_allclose(first[1], second[0], atol=1e-2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the embedding service.
+"""
+
+import asyncio
+import gc
+import os
+import sys
+import unittest
+import weakref
+from unittest.mock import patch
+
+import numpy as np
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config import settings
+from app.services import embedding_cache, embeddings
+from app.services.embeddings import EmbeddingBatcher, HashingEmbedder
+
+
+class CountingEmbedder(HashingEmbedder):
+    """Hashing embedder that records the size of every backend call."""
+
+    def __init__(self):
+        super().__init__(dimension=64)
+        self.calls = []
+
+    def embed_many(self, texts):
+        self.calls.append(len(texts))
+        return super().embed_many(texts)
+
+
+class TestEmbeddings(unittest.TestCase):
+    """Test cases for embedding backends and batching."""
+
+    def test_hashing_embedder(self):
+        """Hashing embeddings are deterministic, unit-length and similarity-preserving."""
+        embedder = HashingEmbedder(dimension=256)
+        matrix = embedder.embed_many(["python list comprehension", "python list comprehensions", "kubernetes pods", ""])
+        self.assertEqual(matrix.shape, (4, 256))
+        self.assertEqual(matrix.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(matrix[:3], axis=1), 1.0, rtol=1e-5)
+        self.assertFalse(matrix[3].any())
+        self.assertGreater(matrix[0] @ matrix[1], matrix[0] @ matrix[2])
+        np.testing.assert_array_equal(matrix[0], embedder.embed_many(["python list comprehension"])[0])
+
+    def test_batcher_combines_concurrent_requests(self):
+        """Concurrent requests share backend calls and get their own rows back."""
+        embedder = CountingEmbedder()
+        batcher = EmbeddingBatcher(embedder, max_batch=100, max_wait=0.01)
+        texts = [[f"text {i}", f"other {i}"] for i in range(10)]
+
+        async def main():
+            return await asyncio.gather(*[batcher.embed_many(t) for t in texts])
+
+        results = asyncio.run(main())
+        self.assertEqual(embedder.calls, [20])
+        for batch, result in zip(texts, results):
+            np.testing.assert_allclose(result, embedder.embed_many(batch))
+
+    def test_batcher_flushes_full_batches(self):
+        """Reaching max_batch flushes without waiting for the timer."""
+        embedder = CountingEmbedder()
+        batcher = EmbeddingBatcher(embedder, max_batch=4, max_wait=10)
+
+        async def main():
+            return await asyncio.wait_for(
+                asyncio.gather(*[batcher.embed_many([f"t{i}", f"u{i}"]) for i in range(4)]), timeout=5
+            )
+
+        asyncio.run(main())
+        self.assertEqual(embedder.calls, [4, 4])
+
+    def test_batcher_keeps_flush_tasks_until_done(self):
+        """Running flushes are referenced by the batcher and released once they finish."""
+        batcher = EmbeddingBatcher(CountingEmbedder(), max_batch=1, max_wait=10)
+
+        async def main():
+            request = asyncio.ensure_future(batcher.embed_many(["text"]))
+            await asyncio.sleep(0)
+            running = len(batcher._tasks)
+            await request
+            await asyncio.sleep(0)
+            return running
+
+        self.assertEqual(asyncio.run(main()), 1)
+        self.assertEqual(batcher._tasks, set())
+
+    def test_each_event_loop_gets_its_own_batcher(self):
+        """A new event loop does not discard the batchers of loops that are still alive."""
+        first, second = asyncio.new_event_loop(), asyncio.new_event_loop()
+        with patch.object(embeddings, "_embedder", CountingEmbedder()), \
+                patch.object(embeddings, "_batchers", weakref.WeakKeyDictionary()), \
+                patch.object(embedding_cache, "_cache", None), \
+                patch.object(settings, "embedding_cache_enabled", False):
+            for loop in (first, second):
+                loop.run_until_complete(embeddings.embed_many_async(["text"]))
+            self.assertEqual(len(embeddings._batchers), 2)
+            self.assertIsNot(embeddings._batchers[first], embeddings._batchers[second])
+
+            first.close()
+            del first
+            gc.collect()
+            self.assertEqual(list(embeddings._batchers.keys()), [second])
+            second.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the deterministic stub LLM backend.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import unittest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.llm_backends import StubBackend
+from app.services.topic_hierarchy import GENERATION_CONFIG, parse_topic_hierarchy
+
+
+class TestStubBackend(unittest.TestCase):
+    """Test cases for the stub backend."""
+
+    def setUp(self):
+        self.backend = StubBackend(latency_median_ms=0, latency_sigma=0, tokens_per_second=0, output_tokens=100)
+
+    def test_outputs_are_deterministic(self):
+        """The same prompt always gets the same answer."""
+        model = self.backend.create_model("stub-model")
+        first = model.generate_content('Write about "Python lists"').text
+        second = model.generate_content('Write about "Python lists"').text
+        self.assertEqual(first, second)
+        self.assertIn("Python lists", first)
+        self.assertGreaterEqual(len(first) // 4, 100)
+
+    def test_json_follows_response_schema(self):
+        """Schema-constrained prompts get JSON matching the schema."""
+        model = self.backend.create_model("stub-model", GENERATION_CONFIG)
+        response = model.generate_content("topics for python")
+        self.assertTrue(parse_topic_hierarchy(response.text).topics)
+        self.assertGreater(response.usage_metadata.candidates_token_count, 0)
+
+    def test_canned_responses_and_streaming(self):
+        """Canned responses match by regex and stream in chunks."""
+        backend = StubBackend(latency_median_ms=0, latency_sigma=0, tokens_per_second=0,
+                              responses=[{"match": "summarize", "response": "Summary of {subject}"}])
+        model = backend.create_model("stub-model")
+
+        async def collect():
+            stream = await model.generate_content_async('Please summarize "Decorators"', stream=True)
+            return [chunk.text async for chunk in stream]
+
+        chunks = asyncio.run(collect())
+        self.assertEqual("".join(chunks), "Summary of Decorators")
+        self.assertGreater(len(chunks), 1)
+
+    def test_latency_distribution(self):
+        """Time to first token is log-normal around the median and seeded per prompt."""
+        backend = StubBackend(latency_median_ms=200, latency_sigma=0.5)
+        model = backend.create_model("stub-model")
+        samples = sorted(backend.first_token_latency(model._rng(f"prompt {i}")) for i in range(201))
+        self.assertAlmostEqual(samples[100], 0.2, delta=0.05)
+        self.assertEqual(backend.first_token_latency(model._rng("x")), backend.first_token_latency(model._rng("x")))
+
+
+if __name__ == "__main__":
+    unittest.main()
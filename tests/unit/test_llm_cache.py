@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the exact-match LLM response cache.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config import settings
+from app.services.llm_cache import LLMResponseCache, is_cacheable, make_cache_key
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    """Test cases for the two-tier LLM response cache."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cache.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_depends_on_model_prompt_and_params(self):
+        """Changing any part of the request changes the key."""
+        key = make_cache_key("gemini-2.0-flash", "prompt", {"temperature": 0})
+        self.assertEqual(key, make_cache_key("gemini-2.0-flash", "prompt", {"temperature": 0}))
+        self.assertNotEqual(key, make_cache_key("gemini-2.0-flash-lite", "prompt", {"temperature": 0}))
+        self.assertNotEqual(key, make_cache_key("gemini-2.0-flash", "prompt 2", {"temperature": 0}))
+        self.assertNotEqual(key, make_cache_key("gemini-2.0-flash", "prompt", {"temperature": 1}))
+
+    def test_disk_tier_survives_new_instance(self):
+        """Responses written by one instance are read back by another."""
+        LLMResponseCache(path=self.path).set("k", "cached answer")
+        self.assertEqual(LLMResponseCache(path=self.path).get("k"), "cached answer")
+
+    def test_ttl_expires_entries(self):
+        """Expired entries are not returned from either tier."""
+        cache = LLMResponseCache(path=self.path, ttl=0.05)
+        cache.set("k", "value")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("k"))
+
+    def test_memory_only_cache_evicts_lru(self):
+        """The memory tier keeps only the most recently used entries."""
+        cache = LLMResponseCache(memory_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+
+    def test_currency_checks_are_not_cached_by_default(self):
+        """Currency answers stay out of the week-long cache; the currency memo owns their TTL."""
+        with patch.object(settings, "llm_cache_enabled", True):
+            self.assertFalse(is_cacheable("currency_check"))
+            self.assertTrue(is_cacheable("final_mdx"))
+
+    def test_async_path_reads_disk_tier_in_a_thread(self):
+        """Async generation serves disk-tier hits without touching SQLite on the event loop."""
+        from app.services import gemini_llm
+
+        LLMResponseCache(path=self.path).set(gemini_llm._cache_key("prompt", "model"), "from disk")
+        cache = LLMResponseCache(path=self.path)
+        threaded = []
+
+        async def to_thread(func, *args):
+            threaded.append(func.__name__)
+            return func(*args)
+
+        with patch.object(gemini_llm, "get_llm_cache", return_value=cache), \
+                patch.object(gemini_llm, "is_cacheable", return_value=True), \
+                patch.object(gemini_llm.asyncio, "to_thread", to_thread):
+            text = asyncio.run(gemini_llm.generate_content_async("prompt", "model", prompt_type="final_mdx"))
+            # A memory-tier hit needs no thread at all
+            asyncio.run(gemini_llm.generate_content_async("prompt", "model", prompt_type="final_mdx"))
+
+        self.assertEqual(text, "from disk")
+        self.assertEqual(threaded, ["get"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the LLM governor (limits and retries).
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from google.api_core import exceptions as google_exceptions
+from app.services.llm_governor import LLMGovernor, retry_hint
+
+
+class TestLLMGovernor(unittest.TestCase):
+    """Test cases for concurrency limiting and transient-error retries."""
+
+    def test_retries_transient_errors(self):
+        """Quota errors are retried until the call succeeds."""
+        governor = LLMGovernor(backoff_base=0.01)
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise google_exceptions.ResourceExhausted("quota")
+            return "ok"
+
+        self.assertEqual(governor.call(flaky), "ok")
+        self.assertEqual(len(attempts), 3)
+
+    def test_does_not_retry_other_errors(self):
+        """Non-transient errors are raised immediately."""
+        governor = LLMGovernor(backoff_base=0.01)
+        attempts = []
+
+        def broken():
+            attempts.append(1)
+            raise google_exceptions.InvalidArgument("bad prompt")
+
+        with self.assertRaises(google_exceptions.InvalidArgument):
+            governor.call(broken)
+        self.assertEqual(len(attempts), 1)
+
+    def test_caps_concurrency(self):
+        """No more than max_concurrency calls run at once."""
+        governor = LLMGovernor(max_concurrency=2)
+        state = {"running": 0, "peak": 0}
+
+        async def call():
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+            await asyncio.sleep(0.02)
+            state["running"] -= 1
+
+        async def main():
+            await asyncio.gather(*(governor.call_async(call) for _ in range(6)))
+
+        asyncio.run(main())
+        self.assertEqual(state["peak"], 2)
+
+    def test_retry_hint(self):
+        """Server-suggested retry delays are parsed from the error."""
+        self.assertEqual(retry_hint(Exception("429 quota. retry_delay {\n  seconds: 37\n}")), 37.0)
+        self.assertEqual(retry_hint(Exception("Please retry in 2.5s.")), 2.5)
+        self.assertIsNone(retry_hint(Exception("boom")))
+
+
+if __name__ == "__main__":
+    unittest.main()
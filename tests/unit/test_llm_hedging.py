@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Unit tests for hedged LLM calls.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config import settings
+from app.services import llm_hedging
+from app.services.llm_hedging import LatencyTracker, hedged_call_async
+
+
+class TestLLMHedging(unittest.TestCase):
+    """Test cases for latency percentiles and hedging."""
+
+    def setUp(self):
+        llm_hedging._tracker = LatencyTracker()
+
+    def test_percentile_needs_samples(self):
+        """Percentiles are only reported once enough samples exist."""
+        tracker = LatencyTracker(window=10)
+        self.assertIsNone(tracker.percentile("x", 95, min_samples=1))
+        for i in range(20):
+            tracker.record("x", float(i))
+        self.assertEqual(tracker.percentile("x", 100), 19.0)
+        self.assertEqual(tracker.percentile("x", 0), 10.0)
+
+    def test_slow_call_is_hedged(self):
+        """A call slower than the recent percentile is raced by a second one."""
+        for _ in range(30):
+            llm_hedging._tracker.record("extraction", 0.01)
+        delays = [1.0, 0.01]
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(delays[len(calls) - 1])
+            return len(calls)
+
+        _, used_fallback = asyncio.run(hedged_call_async("extraction", call))
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(used_fallback)
+
+    def test_hedge_wins_keep_threshold_stable(self):
+        """Requests won by a hedge record their end-to-end latency, not the hedge's own."""
+        tracker = llm_hedging._tracker = LatencyTracker(window=10)
+        for _ in range(10):
+            tracker.record("extraction", 0.05)
+
+        async def run():
+            for _ in range(10):
+                calls = []
+
+                async def call():
+                    calls.append(1)
+                    await asyncio.sleep(1.0 if len(calls) == 1 else 0.01)
+
+                await hedged_call_async("extraction", call)
+
+        with patch.object(settings, "llm_hedge_min_samples", 5):
+            asyncio.run(run())
+        self.assertGreaterEqual(tracker.percentile("extraction", 0), 0.05)
+
+    def test_fallback_win_records_primary_lower_bound(self):
+        """A primary that loses to the fallback still counts with at least the time it ran."""
+        async def slow():
+            await asyncio.sleep(1.0)
+
+        async def fallback():
+            return "light"
+
+        with patch.dict(settings.llm_stage_deadlines, {"final_mdx": 0.1}):
+            self.assertEqual(asyncio.run(hedged_call_async("final_mdx", slow, fallback)), ("light", True))
+        self.assertGreaterEqual(llm_hedging._tracker.percentile("final_mdx", 0), 0.05)
+        self.assertIsNotNone(llm_hedging._tracker.percentile("final_mdx:fallback", 0))
+
+    def test_failure_goes_to_fallback(self):
+        """If the primary call fails, the fallback model answers."""
+        async def failing():
+            raise RuntimeError("boom")
+
+        async def fallback():
+            return "light"
+
+        self.assertEqual(asyncio.run(hedged_call_async("final_mdx", failing, fallback)), ("light", True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Unit tests for LLM usage metrics: per-request attribution, the X-LLM-Usage
+header and the /metrics/llm endpoints.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config import settings
+from app.services import gemini_llm, llm_backends, llm_metrics
+from app.services.llm_backends import StubBackend
+from app.services.llm_metrics import LLMMetrics
+
+
+class TestLLMMetrics(unittest.TestCase):
+    """Test cases for recording and attributing LLM calls."""
+
+    def test_calls_are_attributed_to_the_current_request(self):
+        """Calls made inside a request are attributed to its route; others count as background."""
+        metrics = LLMMetrics()
+        metrics.record("currency_check", "model", prompt_tokens=5, output_tokens=1, latency=0.1)
+
+        request, token = metrics.start_request("/rag/single-topic")
+        metrics.record("final_mdx", "model", prompt_tokens=100, output_tokens=50, latency=0.5)
+        metrics.record("final_mdx", "model", latency=0.01, cache="exact")
+        metrics.end_request(token)
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["by_route"]["background"]["currency_check"]["calls"], 1)
+        route = snapshot["by_route"]["/rag/single-topic"]["final_mdx"]
+        self.assertEqual(route["calls"], 2)
+        self.assertEqual(route["total_tokens"], 150)
+        self.assertEqual(route["cache_hits"]["exact"], 1)
+
+        summary = request.summary()
+        self.assertEqual(summary["llm_calls"], 2)
+        self.assertEqual(summary["by_prompt_type"]["final_mdx"]["cache_hits"], 1)
+        self.assertEqual(metrics.recent_requests(), [summary])
+
+    def test_concurrent_requests_do_not_mix(self):
+        """Each asyncio task sees only the request it started, even while interleaved."""
+        metrics = LLMMetrics()
+
+        async def handle(route, calls):
+            request, token = metrics.start_request(route)
+            try:
+                for _ in range(calls):
+                    await asyncio.sleep(0)
+                    metrics.record("extraction", "model", prompt_tokens=10, output_tokens=1)
+            finally:
+                metrics.end_request(token)
+            return request
+
+        async def run():
+            return await asyncio.gather(handle("/a", 3), handle("/b", 5))
+
+        first, second = asyncio.run(run())
+        self.assertEqual(len(first.calls), 3)
+        self.assertEqual(len(second.calls), 5)
+        self.assertNotIn("background", metrics.snapshot()["by_route"])
+
+
+class TestLLMMetricsEndpoints(unittest.TestCase):
+    """Test cases for the usage header and metrics routes, using the stub LLM backend."""
+
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        backend = StubBackend(latency_median_ms=0, latency_sigma=0, tokens_per_second=0, output_tokens=50)
+        self.patches = [
+            patch.object(llm_backends, "_backend", backend),
+            patch.dict(gemini_llm._models, clear=True),
+            patch.object(llm_metrics, "_metrics", LLMMetrics()),
+            patch.object(settings, "llm_cache_enabled", False),
+            patch.object(settings, "semantic_cache_enabled", False),
+            patch.object(settings, "coalescing_enabled", False),
+        ]
+        for p in self.patches:
+            p.start()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def test_usage_header_and_metrics_routes(self):
+        """LLM work shows up in the response header, the aggregates and the per-request list."""
+        route = "/rag/generate-mdx-llm-only"
+        response = self.client.post(route, json={"selected_topic": "Lists", "main_topic": "Python"})
+        self.assertEqual(response.json()["status"], "success")
+        usage = json.loads(response.headers["X-LLM-Usage"])
+        self.assertEqual(usage["calls"], 1)
+        self.assertGreater(usage["prompt_tokens"], 0)
+        self.assertGreater(usage["output_tokens"], 0)
+
+        data = self.client.get("/metrics/llm").json()["data"]
+        by_type = data["by_route"][route]
+        self.assertEqual(sum(stats["calls"] for stats in by_type.values()), 1)
+        self.assertEqual(sum(stats["prompt_tokens"] for stats in by_type.values()), usage["prompt_tokens"])
+
+        requests = self.client.get("/metrics/llm/requests").json()["data"]
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0]["route"], route)
+        self.assertEqual(requests[0]["llm_calls"], 1)
+
+        # Requests without LLM calls get no header and are left out of the list
+        self.assertNotIn("X-LLM-Usage", self.client.get("/").headers)
+        self.assertEqual(len(self.client.get("/metrics/llm/requests").json()["data"]), 1)
+
+    def test_reset(self):
+        """DELETE /metrics/llm clears the aggregates and the per-request summaries."""
+        self.client.post("/rag/generate-mdx-llm-only", json={"selected_topic": "Lists", "main_topic": "Python"})
+        self.assertEqual(self.client.delete("/metrics/llm").status_code, 200)
+
+        data = self.client.get("/metrics/llm").json()["data"]
+        self.assertEqual(data, {"by_prompt_type": {}, "by_route": {}})
+        self.assertEqual(self.client.get("/metrics/llm/requests").json()["data"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the local search provider over previously crawled pages.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config import settings
+from app.services import local_search
+from app.utils.text_search import BM25Index
+
+PAGE = "Python decorators wrap functions to extend their behaviour."
+
+
+class TestLocalSearch(unittest.TestCase):
+    """Test cases for indexing crawled pages and expiring old ones."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patches = [
+            patch.object(local_search, "_index", None),
+            patch.object(settings, "cache_dir", self.tmp.name),
+            patch.object(settings, "local_search_enabled", True),
+            patch.object(settings, "local_search_max_age_days", 30),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmp.cleanup()
+
+    def test_crawled_pages_are_found_and_persisted(self):
+        """Indexed pages are searchable, and survive a reload through the change log."""
+        local_search.index_crawled_pages({"https://a": PAGE, "https://b": "Error scraping https://b"})
+        self.assertEqual(local_search.search_local("python decorators"), ["https://a"])
+
+        local_search._index = None
+        self.assertEqual(local_search.search_local("python decorators"), ["https://a"])
+
+    def test_stale_pages_are_ignored_and_evicted(self):
+        """Pages older than the maximum age are never returned and are removed from the index."""
+        index = local_search.get_local_index()
+        index.add_document("https://old", PAGE, meta={"crawled_at": time.time() - 40 * 86400})
+        index.add_document("https://new", PAGE + " Decorators again.", meta={"crawled_at": time.time()})
+
+        self.assertEqual(local_search.search_local("python decorators", limit=5), ["https://new"])
+        self.assertNotIn("https://old", index)
+
+        with patch.object(settings, "local_search_max_age_days", 0):
+            index.add_document("https://old", PAGE, meta={"crawled_at": time.time() - 40 * 86400})
+            self.assertIn("https://old", local_search.search_local("python decorators", limit=5))
+
+    def test_stale_pages_are_evicted_on_load(self):
+        """Loading the index drops pages that expired while the app was not running."""
+        path = os.path.join(self.tmp.name, "local_search_index.json")
+        index = BM25Index(path=path)
+        index.add_document("https://old", PAGE, meta={"crawled_at": time.time() - 40 * 86400})
+        index.add_document("https://new", PAGE, meta={"crawled_at": time.time()})
+        index.save()
+
+        self.assertEqual(local_search.get_local_index().doc_ids(), ["https://new"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the in-process vector index.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.local_vectorstore import LocalVectorIndex
+
+
+def _vectors(matrix, prefix="v"):
+    return [{"id": f"{prefix}{i}", "values": row.tolist(), "metadata": {"text": f"chunk {i}"}}
+            for i, row in enumerate(matrix)]
+
+
+class TestLocalVectorIndex(unittest.TestCase):
+    """Test cases for flat and IVF search, namespaces and persistence."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_flat_search_is_exact_and_persistent(self):
+        """Flat search finds the exact neighbours and survives a reload."""
+        path = os.path.join(self.tmp.name, "index")
+        matrix = self.rng.standard_normal((3000, 32)).astype(np.float32)
+        index = LocalVectorIndex(path, dimension=32, kind="flat")
+        index.upsert(_vectors(matrix), namespace="docs")
+
+        query = matrix[42] + 0.01 * self.rng.standard_normal(32).astype(np.float32)
+        result = LocalVectorIndex(path, dimension=32, kind="flat").query(query, top_k=3, namespace="docs")
+        self.assertEqual(result["matches"][0]["id"], "v42")
+        self.assertEqual(result["matches"][0]["metadata"], {"text": "chunk 42"})
+        self.assertEqual(len(result["matches"]), 3)
+        self.assertGreaterEqual(result["matches"][0]["score"], result["matches"][1]["score"])
+
+    def test_upsert_replaces_and_namespaces_are_separate(self):
+        """Re-upserting an id replaces it; namespaces never mix."""
+        index = LocalVectorIndex(None, dimension=4, kind="flat")
+        index.upsert([{"id": "a", "values": [1, 0, 0, 0], "metadata": {"text": "old"}}], namespace="one")
+        index.upsert([{"id": "a", "values": [0, 1, 0, 0], "metadata": {"text": "new"}}], namespace="one")
+        index.upsert([{"id": "b", "values": [0, 1, 0, 0], "metadata": {"text": "other"}}], namespace="two")
+
+        self.assertEqual(index.count, 2)
+        matches = index.query([0, 1, 0, 0], top_k=5, namespace="one")["matches"]
+        self.assertEqual([(m["id"], m["metadata"]["text"]) for m in matches], [("a", "new")])
+        self.assertEqual(index.query([0, 1, 0, 0], namespace="missing")["matches"], [])
+
+    def test_duplicate_ids_in_one_batch(self):
+        """A batch naming a new id twice stores it once, with the last vector (flat and IVF)."""
+        for kind in ("flat", "ivf"):
+            index = LocalVectorIndex(None, dimension=8, kind=kind)
+            index.upsert(_vectors(self.rng.standard_normal((20, 8)).astype(np.float32)))
+            index.upsert([
+                {"id": "dup", "values": [1, 0, 0, 0, 0, 0, 0, 0], "metadata": {"text": "first"}},
+                {"id": "dup", "values": [0, 0, 0, 0, 0, 0, 0, 1], "metadata": {"text": "last"}},
+            ])
+
+            self.assertEqual(index.count, 21, kind)
+            match = index.query([0, 0, 0, 0, 0, 0, 0, 1], top_k=1)["matches"][0]
+            self.assertEqual((match["id"], match["metadata"]["text"]), ("dup", "last"), kind)
+            self.assertAlmostEqual(match["score"], 1.0, places=5)
+
+    def test_upserts_append_metadata_until_close(self):
+        """Small upserts only append to the metadata log; reloads replay it and close() compacts it."""
+        path = os.path.join(self.tmp.name, "log")
+        meta_file, log_file = os.path.join(path, "meta.json"), os.path.join(path, "meta.log")
+        index = LocalVectorIndex(path, dimension=8, kind="flat")
+        snapshot = os.path.getmtime(meta_file), os.path.getsize(meta_file)
+        for batch in range(5):
+            index.upsert(_vectors(self.rng.standard_normal((10, 8)).astype(np.float32), prefix=f"b{batch}-"))
+        index.upsert([{"id": "b0-3", "values": [1, 0, 0, 0, 0, 0, 0, 0], "metadata": {"text": "replaced"}}])
+
+        self.assertEqual((os.path.getmtime(meta_file), os.path.getsize(meta_file)), snapshot)
+        with open(log_file, "r", encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 51)
+
+        # Without close() (e.g. after a crash) the log is replayed on load
+        reloaded = LocalVectorIndex(path, dimension=8, kind="flat")
+        self.assertEqual(reloaded.count, 50)
+        match = reloaded.query([1, 0, 0, 0, 0, 0, 0, 0], top_k=1)["matches"][0]
+        self.assertEqual((match["id"], match["metadata"]["text"]), ("b0-3", "replaced"))
+
+        index.close()
+        self.assertFalse(os.path.exists(log_file))
+        reloaded = LocalVectorIndex(path, dimension=8, kind="flat")
+        self.assertEqual(reloaded.count, 50)
+        self.assertEqual(reloaded.query([1, 0, 0, 0, 0, 0, 0, 0], top_k=1)["matches"][0]["id"], "b0-3")
+
+    def test_torn_log_entry_is_dropped(self):
+        """A log entry cut short by a crash is ignored and the log is compacted on load."""
+        path = os.path.join(self.tmp.name, "torn")
+        index = LocalVectorIndex(path, dimension=4, kind="flat")
+        index.upsert([{"id": "a", "values": [1, 0, 0, 0], "metadata": {"text": "a"}}])
+        with open(os.path.join(path, "meta.log"), "a", encoding="utf-8") as f:
+            f.write('{"row": 1, "id": "b", "names')
+
+        reloaded = LocalVectorIndex(path, dimension=4, kind="flat")
+        self.assertEqual(reloaded.count, 1)
+        self.assertFalse(os.path.exists(os.path.join(path, "meta.log")))
+        reloaded.upsert([{"id": "c", "values": [0, 1, 0, 0], "metadata": {"text": "c"}}])
+        self.assertEqual(LocalVectorIndex(path, dimension=4, kind="flat").count, 2)
+
+    def test_ivf_reload_assigns_rows_added_since_training(self):
+        """Rows upserted after the clustering was saved are searchable after a reload."""
+        path = os.path.join(self.tmp.name, "ivf-log")
+        index = LocalVectorIndex(path, dimension=8, kind="ivf", nprobe=1)
+        index.upsert(_vectors(self.rng.standard_normal((100, 8)).astype(np.float32)))
+        index.upsert([{"id": "late", "values": [0, 0, 0, 1, 0, 0, 0, 0], "metadata": {"text": "late"}}])
+
+        reloaded = LocalVectorIndex(path, dimension=8, kind="ivf", nprobe=1)
+        self.assertEqual(reloaded.count, 101)
+        self.assertEqual(reloaded.query([0, 0, 0, 1, 0, 0, 0, 0], top_k=1)["matches"][0]["id"], "late")
+
+    def test_ivf_recall(self):
+        """IVF search finds the true nearest neighbour for clustered data."""
+        centers = self.rng.standard_normal((20, 32)).astype(np.float32)
+        matrix = centers[self.rng.integers(0, 20, 4000)] + 0.3 * self.rng.standard_normal((4000, 32)).astype(np.float32)
+        path = os.path.join(self.tmp.name, "ivf")
+        index = LocalVectorIndex(path, dimension=32, kind="ivf", nprobe=4)
+        index.upsert(_vectors(matrix[:1000]))
+        index.upsert(_vectors(matrix[1000:], prefix="w"))
+
+        index = LocalVectorIndex(path, dimension=32, kind="ivf", nprobe=4)
+        normalized = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+        hits = 0
+        for i in range(0, 4000, 40):
+            expected = int(np.argmax(normalized @ normalized[i]))
+            expected_id = f"v{expected}" if expected < 1000 else f"w{expected - 1000}"
+            hits += index.query(matrix[i], top_k=1)["matches"][0]["id"] == expected_id
+        self.assertGreaterEqual(hits, 90)
+
+
+if __name__ == "__main__":
+    unittest.main()
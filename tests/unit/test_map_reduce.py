@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Unit tests for preparing crawled sources for the final MDX prompt, including
+map-reduce condensing of oversized inputs.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config import settings
+from app.services import crawler
+from app.services.llm_backends import StubBackend
+
+PAGE_A = "\n\n".join(f"Decorators wrap functions, fact {i}." for i in range(60))
+PAGE_B = "\n\n".join(f"Closures capture variables, fact {i}." for i in range(60))
+SOURCES = {
+    "https://a.example/decorators": PAGE_A,
+    "https://b.example/closures": PAGE_B,
+    "https://c.example/broken": "Error scraping https://c.example/broken: timeout",
+}
+
+
+class TestPrepareSourceContent(unittest.TestCase):
+    """Test cases for packing or condensing crawled pages."""
+
+    def setUp(self):
+        self.calls = []
+        self.failing_url = None
+        backend = StubBackend(latency_median_ms=0, latency_sigma=0, tokens_per_second=0,
+                              responses=[{"match": "Condense the following page", "response": "Condensed notes."}])
+
+        async def generate(prompt, model_name=None, generation_config=None, prompt_type=None, cache_intent=None):
+            self.calls.append((prompt_type, model_name, prompt))
+            if self.failing_url and self.failing_url in prompt:
+                raise RuntimeError("Content generation failed: quota exceeded")
+            response = await backend.create_model("stub-model", generation_config).generate_content_async(prompt)
+            return response.text
+
+        self.patches = [
+            patch.object(crawler, "generate_content_async", generate),
+            patch.object(settings, "map_reduce_enabled", True),
+            patch.object(settings, "map_reduce_threshold_tokens", 200),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def _prepare(self, sources=SOURCES):
+        return asyncio.run(crawler.prepare_source_content_async(sources, "Decorators", "Python"))
+
+    def test_small_inputs_are_packed_without_llm_calls(self):
+        """Pages under the threshold are packed directly; error pages are dropped."""
+        with patch.object(settings, "map_reduce_threshold_tokens", 100000):
+            content = self._prepare()
+
+        self.assertEqual(self.calls, [])
+        self.assertIn("Content from https://a.example/decorators:", content)
+        self.assertIn("Decorators wrap functions", content)
+        self.assertNotIn("c.example", content)
+
+    def test_large_inputs_are_condensed_per_page(self):
+        """Above the threshold each page is condensed with the map-reduce model and the notes are packed."""
+        content = self._prepare()
+
+        self.assertEqual(len(self.calls), 2)
+        for prompt_type, model_name, _ in self.calls:
+            self.assertEqual(prompt_type, "condense")
+            self.assertEqual(model_name, settings.map_reduce_model)
+        self.assertIn("Content from https://a.example/decorators:", content)
+        self.assertIn("Content from https://b.example/closures:", content)
+        self.assertEqual(content.count("Condensed notes."), 2)
+        self.assertNotIn("Decorators wrap functions", content)
+
+    def test_failed_condensing_falls_back_to_relevant_passages(self):
+        """A page whose condensing fails contributes its most relevant passages instead."""
+        self.failing_url = "https://b.example/closures"
+        content = self._prepare()
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(content.count("Condensed notes."), 1)
+        self.assertIn("Closures capture variables", content)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Unit tests for patch-based MDX refinement.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import AsyncMock, patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services import mdx_patch
+from app.services.mdx_patch import locate_selection, split_sections
+
+MDX = """---
+title: Lists
+---
+
+# Lists
+
+Lists are ordered,
+mutable sequences.
+
+## Slicing
+
+```python
+# not a heading
+items[1:3]
+```
+
+## Sorting
+
+Use sorted() to get a new list.
+"""
+
+
+class TestMDXPatch(unittest.TestCase):
+    """Test cases for locating, sectioning and patching MDX."""
+
+    def test_locate_selection_ignores_whitespace(self):
+        """Selections copied without line breaks are still found."""
+        start, end = locate_selection(MDX, "Lists are ordered, mutable sequences.")
+        self.assertEqual(MDX[start:end], "Lists are ordered,\nmutable sequences.")
+        self.assertIsNone(locate_selection(MDX, "not in the document at all"))
+
+    def test_repeated_selection_needs_an_occurrence(self):
+        """Text that appears more than once is only located with an explicit occurrence."""
+        mdx = "# A\n\nSee the example.\n\n# B\n\nSee the\nexample.\n"
+        self.assertIsNone(locate_selection(mdx, "See the example."))
+
+        first = locate_selection(mdx, "See the example.", occurrence=0)
+        second = locate_selection(mdx, "See the example.", occurrence=1)
+        self.assertEqual(mdx[first[0]:first[1]], "See the example.")
+        self.assertEqual(mdx[second[0]:second[1]], "See the\nexample.")
+        self.assertGreater(second[0], first[1])
+        self.assertIsNone(locate_selection(mdx, "See the example.", occurrence=2))
+
+    def test_split_sections_skips_code_fences(self):
+        """Headings inside code blocks do not start a section."""
+        headings = [heading for _, _, heading in split_sections(MDX)]
+        self.assertEqual(headings, ["", "# Lists", "## Slicing", "## Sorting"])
+
+    def test_only_the_section_is_sent_and_patch_is_applied(self):
+        """The prompt contains the enclosing section only and the replacement is applied in place."""
+        llm = AsyncMock(return_value='{"replacement": "Use sorted() or list.sort()."}')
+        with patch.object(mdx_patch, "generate_content_async", llm):
+            result = asyncio.run(mdx_patch.refine_with_patch_async(
+                MDX, "Use sorted() to get a new list.", "Mention list.sort()", "Lists", "Python"
+            ))
+
+        prompt = llm.await_args.args[0]
+        self.assertIn("## Sorting", prompt)
+        self.assertNotIn("items[1:3]", prompt)
+        self.assertIn("Use sorted() or list.sort().", result["mdx"])
+        self.assertNotIn("to get a new list", result["mdx"])
+        self.assertTrue(result["mdx"].startswith("---\ntitle: Lists"))
+
+    def test_patch_targets_the_selected_occurrence(self):
+        """With an occurrence index, the matching repeat is patched and the others are left alone."""
+        mdx = "# A\n\nSee the example.\n\n# B\n\nSee the example.\n"
+        llm = AsyncMock(return_value='{"replacement": "See the second example."}')
+        with patch.object(mdx_patch, "generate_content_async", llm):
+            ambiguous = asyncio.run(mdx_patch.refine_with_patch_async(mdx, "See the example.", "q", "A", "B"))
+            result = asyncio.run(mdx_patch.refine_with_patch_async(
+                mdx, "See the example.", "q", "A", "B", occurrence=1
+            ))
+
+        self.assertIsNone(ambiguous)
+        self.assertEqual(llm.await_count, 1)
+        self.assertEqual(result["mdx"], "# A\n\nSee the example.\n\n# B\n\nSee the second example.\n")
+
+
+class TestPatchRefineEndpoint(unittest.TestCase):
+    """Test cases for falling back from patch mode to snippet refinement."""
+
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.routers import rag
+
+        self.snippet = AsyncMock(return_value="Rewritten snippet.")
+        self.patches = [
+            patch.object(rag, "generate_with_context_async", self.snippet),
+            patch.object(mdx_patch, "generate_content_async", AsyncMock(return_value='{"text": "no replacement"}')),
+        ]
+        for p in self.patches:
+            p.start()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def _refine(self, **extra):
+        payload = {
+            "mdx": MDX, "selected_text": "Use sorted() to get a new list.", "selected_topic": "Lists",
+            "main_topic": "Python", "question": "Mention list.sort()", "response_mode": "patch",
+        }
+        payload.update(extra)
+        return self.client.post("/rag/refine-with-selection", json=payload)
+
+    def test_invalid_patch_falls_back_to_snippet(self):
+        """A response without a replacement is not a 500; the snippet answer is returned instead."""
+        response = self._refine()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["data"], {"answer": "Rewritten snippet."})
+        self.snippet.assert_awaited_once()
+
+    def test_ambiguous_selection_falls_back_to_snippet(self):
+        """A repeated selection without an occurrence is refined as a snippet."""
+        response = self._refine(mdx=MDX + "\nUse sorted() to get a new list.\n")
+        self.assertEqual(response.json()["data"]["answer"], "Rewritten snippet.")
+        mdx_patch.generate_content_async.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
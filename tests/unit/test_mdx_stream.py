@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Unit tests for streaming MDX generation: the incremental cleaner, SSE framing
+and progress/error events.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config import settings
+from app.services import crawler, mdx_stream
+from app.services.crawler import MDXStreamCleaner
+from app.utils.response import raw_stream_response, sse_event, sse_response
+
+RAW_MDX = '```mdx\n---\ntitle: \\"Lists\\"\n---\n\n\n\n# Lists\\nText here.\n## Next\nMore\n```\ntrailing junk'
+OUTPUT_CHUNKS = ["```mdx\n---\ntitle: Lists\n---\n\n# Lists\n", "Lists are ordered.\nThey ",
+                 "are mutable.\n- Append", " items\n- Sort them\n\n## More\n", "Slicing works too.\n```"]
+CLEAN_MDX = '---\ntitle: "Lists"\n---\n\n# Lists\nText here.\n\n## Next\nMore\n'
+
+
+async def _collect(iterator):
+    return [item async for item in iterator]
+
+
+def _body(response) -> str:
+    return "".join(asyncio.run(_collect(response.body_iterator)))
+
+
+class TestMDXStreamCleaner(unittest.TestCase):
+    """Test cases for cleaning MDX while it streams."""
+
+    def test_chunk_boundaries_do_not_change_output(self):
+        """Escapes, fences and blank lines split across chunks clean the same as one chunk."""
+        for size in (1, 2, 3, 7, len(RAW_MDX)):
+            cleaner = MDXStreamCleaner()
+            chunks = [RAW_MDX[i:i + size] for i in range(0, len(RAW_MDX), size)]
+            output = "".join(cleaner.feed(chunk) for chunk in chunks) + cleaner.finish()
+            self.assertEqual(output, CLEAN_MDX, f"chunk size {size}")
+
+    def test_escaped_newline_split_after_backslash(self):
+        """A backslash at the end of a chunk is held until the next chunk arrives."""
+        cleaner = MDXStreamCleaner()
+        self.assertEqual(cleaner.feed("# Title\\"), "")
+        self.assertEqual(cleaner.feed("nBody"), "# Title\n")
+        self.assertEqual(cleaner.finish(), "Body")
+
+    def test_code_blocks_keep_blank_lines(self):
+        """Blank lines inside code blocks are preserved."""
+        cleaner = MDXStreamCleaner()
+        text = "Intro\n```python\na = 1\n\n\nb = 2\n```\nOutro"
+        output = cleaner.feed(text) + cleaner.finish()
+        self.assertIn("a = 1\n\n\nb = 2", output)
+
+
+class TestStreamingResponses(unittest.TestCase):
+    """Test cases for SSE and plain-text framing."""
+
+    def test_sse_event_framing(self):
+        """Events are framed as event/data lines with JSON data and a blank line."""
+        self.assertEqual(sse_event("token", {"text": "a\nb"}), 'event: token\ndata: {"text": "a\\nb"}\n\n')
+
+    def test_sse_response_ends_with_error_event(self):
+        """An exception in the generator becomes a final error event."""
+        async def events():
+            yield "progress", {"stage": "crawling"}
+            raise RuntimeError("crawl failed")
+
+        response = sse_response(events())
+        self.assertEqual(response.media_type, "text/event-stream")
+        self.assertEqual(_body(response), sse_event("progress", {"stage": "crawling"}) +
+                         sse_event("error", {"message": "crawl failed"}))
+
+    def test_raw_stream_only_sends_tokens(self):
+        """The plain-text stream contains tokens and errors only."""
+        async def events():
+            yield "progress", {"stage": "generating"}
+            yield "token", {"text": "# Title\n"}
+            yield "done", {"mdx_content": "# Title"}
+            yield "error", {"message": "late failure"}
+
+        self.assertEqual(_body(raw_stream_response(events())), "# Title\nError: late failure")
+
+
+class TestProgressEvents(unittest.TestCase):
+    """Test cases for progress reporting and generation events."""
+
+    def test_progress_events_then_result(self):
+        """Progress reported by the pipeline is yielded in order, followed by its result."""
+        async def pipeline(on_progress):
+            await on_progress("currency_check", {"has_current_info": False})
+            await asyncio.sleep(0)
+            await on_progress("crawling", {"urls": ["https://example.com"]})
+            return {"all_content": "text"}
+
+        events = asyncio.run(_collect(mdx_stream._with_progress(pipeline)))
+        self.assertEqual(events, [
+            ("progress", {"stage": "currency_check", "has_current_info": False}),
+            ("progress", {"stage": "crawling", "urls": ["https://example.com"]}),
+            ("result", {"all_content": "text"}),
+        ])
+
+    def test_pipeline_error_is_raised_after_progress(self):
+        """A failing pipeline raises after the progress it reported, so the router sends an error event."""
+        async def pipeline(on_progress):
+            await on_progress("searching", {})
+            raise ValueError("no results")
+
+        async def run():
+            seen = []
+            with self.assertRaises(ValueError):
+                async for event, data in mdx_stream._with_progress(pipeline):
+                    seen.append((event, data))
+            return seen
+
+        self.assertEqual(asyncio.run(run()), [("progress", {"stage": "searching"})])
+
+    def test_stream_mdx_emits_tokens_and_done(self):
+        """Generation streams the finalized document paragraph by paragraph and ends with the whole of it."""
+        async def fake_stream(prompt, prompt_type=None, cache_intent=None):
+            for chunk in ["# Lists\nItems ", "are ordered.\n\nMore ", "items.\n"]:
+                yield chunk
+
+        front_matter = "---\ntitle: Lists\n---\n\n"
+        with patch.object(mdx_stream, "stream_content_async", fake_stream):
+            events = asyncio.run(_collect(mdx_stream._stream_mdx(
+                "prompt", front_matter, "final_mdx", {"selected_topic": "Lists"},
+                finalize=lambda raw, fm: fm + raw.strip()
+            )))
+
+        document = front_matter + "# Lists\nItems are ordered.\n\nMore items."
+        self.assertEqual(events[0], ("progress", {"stage": "generating"}))
+        tokens = [data["text"] for event, data in events if event == "token"]
+        self.assertEqual(tokens[:2], ["---\ntitle: Lists\n---", "\n\n# Lists\nItems are ordered."])
+        self.assertEqual("".join(tokens), document)
+        self.assertEqual(events[-1], ("done", {"mdx_content": document, "selected_topic": "Lists"}))
+
+
+class TestStreamingEndpoints(unittest.TestCase):
+    """Test cases for the LLM-only streaming routes."""
+
+    def setUp(self):
+        from fastapi.testclient import TestClient
+        from app.main import app
+
+        async def fake_stream(prompt, prompt_type=None, cache_intent=None):
+            for chunk in OUTPUT_CHUNKS:
+                yield chunk
+
+        async def fake_generate(prompt, model_name=None, generation_config=None, prompt_type=None, cache_intent=None):
+            return "".join(OUTPUT_CHUNKS)
+
+        self.patches = [
+            patch.object(mdx_stream, "stream_content_async", fake_stream),
+            patch.object(crawler, "generate_content_async", fake_generate),
+            patch.object(settings, "coalescing_enabled", False),
+        ]
+        for p in self.patches:
+            p.start()
+        self.client = TestClient(app)
+        self.payload = {"selected_topic": "Lists", "main_topic": "Python"}
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def test_sse_endpoint(self):
+        """The SSE route streams progress, token and done events."""
+        response = self.client.post("/rag/generate-mdx-llm-only-stream", json=self.payload)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/event-stream"))
+        events = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+        self.assertEqual(events[0], "event: progress")
+        self.assertIn("event: token", events)
+        self.assertEqual(events[-1], "event: done")
+
+    def test_raw_endpoint_and_validation(self):
+        """The raw route streams plain MDX; empty topics are rejected before streaming."""
+        response = self.client.post("/rag/generate-mdx-llm-only-raw-stream", json=self.payload)
+        self.assertTrue(response.text.startswith("---\ntitle: Lists\n---"))
+        self.assertIn("Lists are ordered.", response.text)
+
+        response = self.client.post("/rag/generate-mdx-llm-only-stream",
+                                    json={"selected_topic": " ", "main_topic": "Python"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_raw_stream_matches_raw_endpoint(self):
+        """For the same model output the raw stream adds up to the non-streaming raw document."""
+        streamed = self.client.post("/rag/generate-mdx-llm-only-raw-stream", json=self.payload).text
+        document = self.client.post("/rag/generate-mdx-llm-only-raw", json=self.payload).text
+        self.assertEqual(streamed, document)
+        self.assertIn("\n\n- Append", document)  # list spacing applied by the final cleanup
+
+
+if __name__ == "__main__":
+    unittest.main()
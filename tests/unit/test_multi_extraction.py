@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Unit tests for single-pass extraction of all subtopics from a crawled page and
+its fallback to per-subtopic extraction.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config import settings
+from app.services import crawler
+from app.services.llm_backends import StubBackend
+
+SUBTOPICS = [("Python", "Lists"), ("Python", "Dictionaries")]
+PAGE = "# Python\n\nLists hold ordered items.\n\nDictionaries map keys to values.\n"
+
+
+def _stub_generate(responses: list, prompts: list = None):
+    """Return a generate_content_async replacement answering from stub backend canned responses."""
+    backend = StubBackend(latency_median_ms=0, latency_sigma=0, tokens_per_second=0, responses=responses)
+
+    async def generate(prompt, model_name=None, generation_config=None, prompt_type=None, cache_intent=None):
+        if prompts is not None:
+            prompts.append((prompt_type, prompt))
+        model = backend.create_model("stub-model", generation_config)
+        response = await model.generate_content_async(prompt)
+        return response.text
+
+    return generate
+
+
+def _extract(responses: list):
+    with patch.object(crawler, "generate_content_async", _stub_generate(responses)):
+        return asyncio.run(crawler._extract_page_for_all_subtopics_async(
+            "https://example.com/python", PAGE, SUBTOPICS, asyncio.Semaphore(1)
+        ))
+
+
+class TestParseJSONResponse(unittest.TestCase):
+    """Test cases for parsing JSON LLM responses."""
+
+    def test_plain_and_fenced_json(self):
+        """Bare JSON and JSON wrapped in a ```json block parse the same."""
+        self.assertEqual(crawler._parse_json_response(' {"1": ["a"]} '), {"1": ["a"]})
+        self.assertEqual(crawler._parse_json_response('```json\n{"1": ["a"]}\n```'), {"1": ["a"]})
+        self.assertEqual(crawler._parse_json_response('Here you go:\n```\n[1, 2]\n```'), [1, 2])
+
+    def test_invalid_json_raises(self):
+        """Malformed JSON raises instead of returning partial data."""
+        with self.assertRaises(ValueError):
+            crawler._parse_json_response('{"1": ["a"')
+
+
+class TestSinglePassExtraction(unittest.TestCase):
+    """Test cases for extracting every subtopic from a page in one LLM call."""
+
+    def test_valid_json_maps_passages_to_subtopics(self):
+        """Numbered passages are assigned to their (topic, subtopic) pairs in order."""
+        response = json.dumps({"1": ["Lists hold ordered items.", "They are mutable."], "2": "Dictionaries map keys."})
+        extracted = _extract([{"match": "each of the following subtopics", "response": response}])
+
+        self.assertEqual(set(extracted), set(SUBTOPICS))
+        self.assertIn("Lists hold ordered items.", extracted[("Python", "Lists")])
+        self.assertIn("They are mutable.", extracted[("Python", "Lists")])
+        self.assertIn("Dictionaries map keys.", extracted[("Python", "Dictionaries")])
+
+    def test_missing_and_empty_keys_give_empty_content(self):
+        """Subtopics missing from the response (or with no passages) get empty content."""
+        extracted = _extract([{"match": "each of the following subtopics", "response": '{"1": []}'}])
+        self.assertEqual(extracted, {("Python", "Lists"): "", ("Python", "Dictionaries"): ""})
+
+        extracted = _extract([{"match": "each of the following subtopics", "response": '{"2": ["Keys."]}'}])
+        self.assertEqual(extracted[("Python", "Lists")], "")
+        self.assertIn("Keys.", extracted[("Python", "Dictionaries")])
+
+    def test_bad_json_or_non_object_returns_none(self):
+        """Unusable responses return None so callers extract per subtopic instead."""
+        self.assertIsNone(_extract([{"match": "each of the following subtopics", "response": '{"1": ["Lists'}]))
+        self.assertIsNone(_extract([{"match": "each of the following subtopics", "response": '["Lists"]'}]))
+
+    def test_document_falls_back_to_per_subtopic_extraction(self):
+        """A page whose single-pass response is malformed is extracted once per subtopic."""
+        prompts = []
+        responses = [
+            {"match": "each of the following subtopics", "response": "not json"},
+            {"match": "Extract content relevant to the subtopic", "response": "Passage about {subject}."},
+            {"match": "Relevant content to use", "response": "# Section\n\nGenerated section."},
+        ]
+        urls = ["https://example.com/python"]
+
+        async def fake_crawl(urls):
+            return {url: PAGE for url in urls}
+
+        with patch.object(crawler, "generate_content_async", _stub_generate(responses, prompts)), \
+                patch.object(crawler, "crawl_urls_async", fake_crawl), \
+                patch.object(settings, "extraction_mode", "per_page"):
+            document = asyncio.run(crawler.generate_mdx_document_async(
+                urls, [{"topic": "Python", "subtopics": ["Lists", "Dictionaries"]}]
+            ))
+
+        prompt_types = [prompt_type for prompt_type, _ in prompts]
+        self.assertEqual(prompt_types.count("extraction"), 3)  # one failed single pass + one per subtopic
+        self.assertEqual(prompt_types.count("final_mdx"), 2)
+        self.assertNotIn("fallback_mdx", prompt_types)
+        self.assertEqual(document.count("Generated section."), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the semantic LLM response cache.
+"""
+
+import os
+import sys
+import unittest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services.semantic_cache import SemanticCache, normalize_intent, split_intent
+
+NEAR_MISSES = [
+    ("Binary search | Data Structures and Algorithms", "Binary search trees | Data Structures and Algorithms"),
+    ("Python 3.12 new features | Python programming language",
+     "Python 3.13 new features | Python programming language"),
+    ("Data cleaning | Python for data science with pandas", "Data cleaning | Python for data science with numpy"),
+    ("Data science with pandas | Python", "Data science with numpy | Python"),
+    ("Java for Python developers", "Python for Java developers"),
+    ("SQL to NoSQL", "NoSQL to SQL"),
+    ("Migrating from SQL to NoSQL | Databases", "Migrating from NoSQL to SQL | Databases"),
+]
+
+REWORDINGS = [
+    ("Python lists | Python programming language", "python list | the Python programming languages"),
+    ("Binary search | Data Structures and Algorithms", "Binary Search | data structures & algorithms"),
+    ("Sorting algorithms", "sorting algorithm"),
+    ("Python lists | Python", "Lists in Python | Python"),
+    ("Python lists", "lists in python"),
+    ("Python for Java developers", "python for java developer"),
+]
+
+
+class TestSemanticCache(unittest.TestCase):
+    """Test cases for intent normalization and lookups."""
+
+    def test_split_intent_keeps_direction(self):
+        """Head terms are sorted except across directional connectives; the rest is normalized."""
+        self.assertEqual(split_intent("Lists in Python | Python Basics"), ("list python", "basic python"))
+        self.assertEqual(split_intent("Python for Java developers"), ("python for developer java", ""))
+        self.assertEqual(split_intent("SQL to NoSQL"), ("sql to nosql", ""))
+        self.assertEqual(normalize_intent("Lists in Python"), "list python")
+
+    def test_near_misses_are_not_served(self):
+        """Different lessons that share most of their words never get each other's content."""
+        for stored, asked in NEAR_MISSES:
+            cache = SemanticCache(threshold=0.9)
+            cache.store("llm_only", stored, "content for " + stored)
+            self.assertIsNone(cache.lookup("llm_only", asked), f"{asked!r} was served {stored!r}")
+
+    def test_rewordings_are_served(self):
+        """Case, plural, stopword and punctuation differences still hit."""
+        for stored, asked in REWORDINGS:
+            cache = SemanticCache(threshold=0.9)
+            cache.store("llm_only", stored, "cached")
+            self.assertEqual(cache.lookup("llm_only", asked), "cached", f"{asked!r} missed {stored!r}")
+
+    def test_namespaces_and_eviction(self):
+        """Namespaces are separate and the oldest entries are evicted."""
+        cache = SemanticCache(threshold=0.9, max_entries=2)
+        cache.store("a", "Sorting | Algorithms", "1")
+        cache.store("a", "Hashing | Algorithms", "2")
+        cache.store("a", "Graphs | Algorithms", "3")
+        self.assertIsNone(cache.lookup("b", "Graphs | Algorithms"))
+        self.assertIsNone(cache.lookup("a", "Sorting | Algorithms"))
+        self.assertEqual(cache.lookup("a", "Graphs | Algorithms"), "3")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Unit tests for gathering crawled content for a single topic: the speculative
+crawl and keeping the blocking searches off the event loop.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import AsyncMock, patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config import settings
+from app.services import crawler
+
+PAGE = "Python decorators wrap functions. " * 40
+
+
+class TestGatherSingleTopicContent(unittest.TestCase):
+    """Test cases for searching and crawling around the currency check."""
+
+    def setUp(self):
+        self.crawled = []
+        self.search_threads = []
+
+        async def fake_crawl(urls):
+            self.crawled.append(list(urls))
+            return {url: PAGE for url in urls}
+
+        def fake_find(topic, main_topic=None, question=None, num_results=2):
+            self.search_threads.append(threading.current_thread())
+            return ["https://example.com/decorators"]
+
+        def fake_search(query, num_results=2):
+            self.search_threads.append(threading.current_thread())
+            return ["https://example.com/decorators", "https://example.com/other"]
+
+        async def fake_prepare(sources, topic, main_topic=None):
+            return "".join(sources.values())
+
+        self.patches = [
+            patch.object(crawler, "crawl_urls_async", fake_crawl),
+            patch.object(crawler, "find_relevant_websites", fake_find),
+            patch.object(crawler, "prepare_source_content_async", fake_prepare),
+            patch("googlesearch.search", fake_search),
+            patch.object(settings, "speculative_crawl_enabled", True),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def _gather(self, has_current_info: bool, peeked=None):
+        with patch.object(crawler, "check_currency_async", AsyncMock(return_value=has_current_info)), \
+                patch.object(crawler, "peek_currency", return_value=peeked):
+            return asyncio.run(crawler.gather_single_topic_content_async("Decorators", "Python"))
+
+    def test_speculative_crawl_is_reused_when_llm_is_current(self):
+        """A YES from the currency check keeps the speculative pages instead of crawling again."""
+        result = self._gather(has_current_info=True)
+
+        self.assertEqual(self.crawled, [["https://example.com/decorators"]])
+        self.assertTrue(result["has_current_info"])
+        self.assertEqual(result["crawled_websites"], ["https://example.com/decorators"])
+        self.assertIn("https://example.com/decorators", result["sources"])
+
+    def test_general_search_skips_already_crawled_urls(self):
+        """A NO crawls the speculative results once and only new general search results after them."""
+        result = self._gather(has_current_info=False)
+
+        self.assertEqual(self.crawled, [["https://example.com/decorators"], ["https://example.com/other"]])
+        self.assertEqual(result["crawled_websites"], ["https://example.com/decorators", "https://example.com/other"])
+
+    def test_searches_run_off_the_event_loop(self):
+        """Without a speculative crawl the blocking searches still run in worker threads."""
+        self._gather(has_current_info=False, peeked=False)
+
+        self.assertEqual(len(self.search_threads), 2)
+        for thread in self.search_threads:
+            self.assertIsNot(thread, threading.main_thread())
+
+
+if __name__ == "__main__":
+    unittest.main()
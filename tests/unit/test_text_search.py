@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the BM25 index used by the local search provider.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.utils.text_search import BM25Index, tokenize
+
+
+class TestBM25Index(unittest.TestCase):
+    """Test cases for the BM25 inverted index."""
+
+    def setUp(self):
+        self.index = BM25Index()
+        self.index.add_document("https://a", "Python lists are mutable sequences. Lists support slicing.")
+        self.index.add_document("https://b", "Dynamic programming solves problems with overlapping subproblems.")
+        self.index.add_document("https://c", "Python dictionaries map keys to values.")
+
+    def test_tokenize_drops_stopwords(self):
+        """Stopwords are removed and terms are lowercased."""
+        self.assertEqual(tokenize("Lists in Python"), ["lists", "python"])
+
+    def test_search_ranks_best_match_first(self):
+        """The page mentioning all query terms ranks first."""
+        results = self.index.search("python lists", limit=2)
+        self.assertEqual(results[0]["doc_id"], "https://a")
+        self.assertEqual(results[0]["coverage"], 1.0)
+
+    def test_min_coverage_filters_partial_matches(self):
+        """Documents that only match part of the query are filtered out."""
+        results = self.index.search("python lists", min_coverage=1.0)
+        self.assertEqual([r["doc_id"] for r in results], ["https://a"])
+
+    def test_incremental_replace_and_remove(self):
+        """Re-adding a document replaces its postings; removing drops it."""
+        self.index.add_document("https://a", "Completely different content about graphs.")
+        self.assertEqual(self.index.search("python lists", min_coverage=1.0), [])
+        self.index.remove_document("https://c")
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.search("dictionaries"), [])
+
+    def test_save_and_reload(self):
+        """The index round-trips through its JSON file."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.json")
+            self.index.path = path
+            self.index.save()
+
+            reloaded = BM25Index(path=path)
+            self.assertEqual(len(reloaded), 3)
+            self.assertEqual(reloaded.search("overlapping subproblems")[0]["doc_id"], "https://b")
+
+    def test_saves_append_changes_until_compaction(self):
+        """Saves append to the change log; reloads replay it and a forced save compacts it."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.json")
+            self.index.path = path
+            self.index.save(force=True)
+            snapshot = os.path.getsize(path)
+
+            self.index.add_document("https://a", "Graphs have vertices and edges.")
+            self.index.remove_document("https://c")
+            self.index.save()
+            self.assertEqual(os.path.getsize(path), snapshot)
+            with open(f"{path}.log", "r", encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), 2)
+
+            reloaded = BM25Index(path=path)
+            self.assertEqual(len(reloaded), 2)
+            self.assertEqual(reloaded.search("graphs vertices")[0]["doc_id"], "https://a")
+            self.assertEqual(reloaded.search("python lists", min_coverage=1.0), [])
+
+            reloaded.save(force=True)
+            self.assertFalse(os.path.exists(f"{path}.log"))
+            self.assertEqual(len(BM25Index(path=path)), 2)
+
+    def test_torn_log_entry_is_dropped(self):
+        """A log entry cut short by a crash is ignored and the log is compacted on load."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "index.json")
+            self.index.path = path
+            self.index.save()
+            with open(f"{path}.log", "a", encoding="utf-8") as f:
+                f.write('{"op": "add", "id": "https://d", "do')
+
+            reloaded = BM25Index(path=path)
+            self.assertEqual(len(reloaded), 3)
+            self.assertFalse(os.path.exists(f"{path}.log"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Unit tests for parsing and caching /search-topics hierarchies.
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import AsyncMock, patch
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.config import settings
+from app.services import gemini_llm, llm_backends, semantic_cache, topic_hierarchy
+from app.services.llm_backends import StubBackend
+from app.services.topic_hierarchy import parse_topic_hierarchy
+
+HIERARCHY_JSON = '[{"topic": "Python Basics", "subtopics": ["Lists", "Dictionaries"]}]'
+
+
+class TestTopicHierarchy(unittest.TestCase):
+    """Test cases for topic hierarchy parsing and caching."""
+
+    def setUp(self):
+        topic_hierarchy._hierarchies = None
+
+    def test_parse_list_and_object(self):
+        """Both a bare list and a {"topics": [...]} object are accepted."""
+        for text in (HIERARCHY_JSON, '{"topics": %s}' % HIERARCHY_JSON):
+            hierarchy = parse_topic_hierarchy(text)
+            self.assertEqual(hierarchy.topics[0].topic, "Python Basics")
+            self.assertEqual(hierarchy.topics[0].subtopics, ["Lists", "Dictionaries"])
+
+    def test_parse_rejects_invalid_output(self):
+        """Malformed or wrongly shaped output raises ValueError."""
+        for text in ("not json", '[{"name": "x"}]', "[]"):
+            with self.assertRaises(ValueError):
+                parse_topic_hierarchy(text)
+
+    def test_cached_by_normalized_query(self):
+        """Case and whitespace variants of the same query are served from the cache."""
+        llm = AsyncMock(return_value=HIERARCHY_JSON)
+        with patch.object(topic_hierarchy, "generate_content_async", llm):
+            first = asyncio.run(topic_hierarchy.generate_topic_hierarchy_async("Python lists"))
+            second = asyncio.run(topic_hierarchy.generate_topic_hierarchy_async("  python   Lists "))
+        self.assertEqual(first, second)
+        self.assertEqual(llm.await_count, 1)
+
+    def test_word_order_is_part_of_the_key(self):
+        """Queries with the same words in a different order are not served from the cache."""
+        llm = AsyncMock(return_value=HIERARCHY_JSON)
+        with patch.object(topic_hierarchy, "generate_content_async", llm):
+            for query in ("Java for Python developers", "Python for Java developers",
+                          "SQL to NoSQL", "NoSQL to SQL"):
+                asyncio.run(topic_hierarchy.generate_topic_hierarchy_async(query))
+        self.assertEqual(llm.await_count, 4)
+
+    def test_semantic_cache_keeps_word_order(self):
+        """The semantic LLM cache serves rewordings but never the reversed query."""
+        backend = StubBackend(latency_median_ms=0, latency_sigma=0, tokens_per_second=0, responses=[
+            {"match": "NoSQL to SQL", "response": '[{"topic": "Relational modeling", "subtopics": ["Joins"]}]'},
+            {"match": "SQL to NoSQL", "response": '[{"topic": "Document modeling", "subtopics": ["Embedding"]}]'},
+        ])
+        with patch.object(llm_backends, "_backend", backend), \
+                patch.dict(gemini_llm._models, clear=True), \
+                patch.object(semantic_cache, "_cache", None), \
+                patch.object(settings, "llm_cache_enabled", False), \
+                patch.object(settings, "semantic_cache_enabled", True):
+            first = asyncio.run(topic_hierarchy.generate_topic_hierarchy_async("SQL to NoSQL"))
+            topic_hierarchy._hierarchies = None  # only the LLM caches below this point
+            reworded = asyncio.run(topic_hierarchy.generate_topic_hierarchy_async("sql  to nosql!"))
+            swapped = asyncio.run(topic_hierarchy.generate_topic_hierarchy_async("NoSQL to SQL"))
+
+        self.assertEqual(first.topics[0].topic, "Document modeling")
+        self.assertEqual(reworded, first)  # the stub would answer the rewording differently
+        self.assertEqual(swapped.topics[0].topic, "Relational modeling")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Unit tests for batched, parallel vector upserts and the long-lived index handles.
+"""
+
+import os
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+
+# Add the project root to the path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+
+from app.services import vectorstore
+from app.services.vectorstore import batch_vectors, upsert_embeddings_batched
+
+
+class FakeAPIError(Exception):
+    """HTTP error response from the index API."""
+
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class FakeIndex:
+    """Records upserted batches and fails the first `failures` calls with `error`."""
+
+    def __init__(self, failures: int = 0, error: Exception = None):
+        self.failures = failures
+        self.error = error or FakeAPIError(503)
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, namespace=None):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                raise self.error
+            self.batches.append((namespace, [v["id"] for v in vectors]))
+
+
+def _vectors(count: int, text: str = "chunk"):
+    return [{"id": f"v{i}", "values": [0.1] * 8, "metadata": {"text": text}} for i in range(count)]
+
+
+class TestBatchedUpserts(unittest.TestCase):
+    """Test cases for upsert_embeddings_batched."""
+
+    def test_batches_respect_count_and_size_limits(self):
+        """Batches never exceed the vector count or payload size limits."""
+        vectors = _vectors(10, text="x" * 100)
+        by_count = list(batch_vectors(vectors, max_count=4, max_bytes=10 ** 6))
+        self.assertEqual([len(b) for b in by_count], [4, 4, 2])
+
+        size = vectorstore._vector_size(vectors[0])
+        by_size = list(batch_vectors(vectors, max_count=100, max_bytes=3 * size))
+        self.assertEqual([len(b) for b in by_size], [3, 3, 3, 1])
+
+    def test_parallel_upsert_with_retry(self):
+        """All vectors arrive once in the namespace even when batches fail transiently."""
+        index = FakeIndex(failures=2)
+        with patch.object(vectorstore, "_index", index), \
+                patch.object(vectorstore.settings, "vector_backend", "pinecone"), \
+                patch.object(vectorstore.settings, "vector_upsert_backoff_base", 0.001):
+            stats = upsert_embeddings_batched(_vectors(250), namespace="docs", batch_size=50, parallelism=4)
+
+        ids = sorted(i for _, batch in index.batches for i in batch)
+        self.assertEqual(ids, sorted(f"v{i}" for i in range(250)))
+        self.assertTrue(all(namespace == "docs" for namespace, _ in index.batches))
+        self.assertEqual(stats["batches"], 5)
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(stats["vectors"], 250)
+
+    def test_persistent_failure_is_raised(self):
+        """A batch that keeps failing raises after the configured retries."""
+        index = FakeIndex(failures=100)
+        with patch.object(vectorstore, "_index", index), \
+                patch.object(vectorstore.settings, "vector_backend", "pinecone"), \
+                patch.object(vectorstore.settings, "vector_upsert_max_retries", 2), \
+                patch.object(vectorstore.settings, "vector_upsert_backoff_base", 0.001):
+            with self.assertRaises(FakeAPIError):
+                upsert_embeddings_batched(_vectors(5))
+        self.assertEqual(index.failures, 97)
+
+    def test_only_transient_failures_are_retried(self):
+        """Rate limits, timeouts and dropped connections are retried; client errors are raised at once."""
+        for error, retried in ((FakeAPIError(429), True), (TimeoutError("read timed out"), True),
+                               (ConnectionResetError("connection reset"), True),
+                               (FakeAPIError(400), False), (ValueError("dimension mismatch"), False)):
+            index = FakeIndex(failures=1, error=error)
+            with patch.object(vectorstore, "_index", index), \
+                    patch.object(vectorstore.settings, "vector_backend", "pinecone"), \
+                    patch.object(vectorstore.settings, "vector_upsert_backoff_base", 0.001):
+                if retried:
+                    self.assertEqual(upsert_embeddings_batched(_vectors(5))["retries"], 1)
+                else:
+                    with self.assertRaises(type(error)):
+                        upsert_embeddings_batched(_vectors(5))
+                    self.assertEqual(index.batches, [])
+
+
+class FakePinecone:
+    """Pinecone client stand-in counting control-plane calls."""
+
+    def __init__(self):
+        self.describe_calls = 0
+        self.created = False
+        self.index = FakeIndex()
+
+    def describe_index(self, name):
+        self.describe_calls += 1
+        if not self.created:
+            raise vectorstore.NotFoundException()
+        return SimpleNamespace(host="fake-host", dimension=8, metric="cosine")
+
+    def create_index(self, **kwargs):
+        self.created = True
+
+    def Index(self, host):
+        return self.index
+
+
+class TestLongLivedHandles(unittest.TestCase):
+    """Test cases for reusing the Pinecone client and index handle."""
+
+    def tearDown(self):
+        vectorstore.close_vector_index()
+
+    def test_index_is_opened_once(self):
+        """Repeated ingestions reuse the index handle and cached description."""
+        client = FakePinecone()
+        vectorstore.close_vector_index()
+        with patch.object(vectorstore, "_get_pinecone_client", return_value=client), \
+                patch.object(vectorstore, "get_embedder", return_value=SimpleNamespace(dimension=8)), \
+                patch.object(vectorstore, "embed_many", side_effect=lambda chunks: np.ones((len(chunks), 8))), \
+                patch.object(vectorstore.settings, "vector_backend", "pinecone"):
+            vectorstore.embed_and_store(["first chunk"])
+            vectorstore.embed_and_store(["second chunk", "third chunk"], namespace="docs")
+            metadata = vectorstore.get_index_metadata()
+
+        self.assertEqual(client.describe_calls, 2)  # not found, then describe after creation
+        self.assertEqual(len(client.index.batches), 2)
+        self.assertEqual(metadata, {"name": vectorstore.settings.pinecone_index_name, "host": "fake-host",
+                                    "dimension": 8, "metric": "cosine"})
+
+
+if __name__ == "__main__":
+    unittest.main()